@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder
+from django.db.models import Q
+from .avatars import clear_avatar, set_avatar
+from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder, AuthToken
+from .search import fts_available, match_expression, matching_note_ids
 
 # Register your models here.
 
@@ -9,10 +12,23 @@ from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder
 
 admin.site.unregister(User)
 
+
+def store_avatar(form):
+    """Route an avatar uploaded through the admin through app/avatars.py."""
+    if 'avatar' not in form.changed_data:
+        return
+    profile = form.instance
+    if profile.avatar:
+        set_avatar(profile, profile.avatar.file, save=False)
+    else:
+        clear_avatar(profile, save=False)
+
+
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
     can_delete = False
     verbose_name_plural = 'Profile'
+    readonly_fields = ('avatar_variants',)
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -28,11 +44,22 @@ class CustomUserAdmin(UserAdmin):
         if not hasattr(obj, 'profile'):
             UserProfile.objects.create(user=obj)
 
+    def save_formset(self, request, form, formset, change):
+        if formset.model is UserProfile:
+            for profile_form in formset.forms:
+                store_avatar(profile_form)
+        super().save_formset(request, form, formset, change)
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'location', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('user__username', 'user__email')
+    readonly_fields = ('avatar_variants',)
+
+    def save_model(self, request, obj, form, change):
+        store_avatar(form)
+        super().save_model(request, obj, form, change)
 
 
 @admin.register(Note)
@@ -42,6 +69,16 @@ class NoteAdmin(admin.ModelAdmin):
     search_fields = ('title', 'content', 'user__username')
     list_editable = ('is_pinned',)
 
+    def get_search_results(self, request, queryset, search_term):
+        match = match_expression(search_term)
+        if not match or not fts_available():
+            return super().get_search_results(request, queryset, search_term)
+        # Title/content go through the FTS5 index instead of LIKE '%term%'.
+        queryset = queryset.filter(
+            Q(pk__in=matching_note_ids(match)) | Q(user__username__icontains=search_term)
+        )
+        return queryset, False
+
 
 @admin.register(DailyPlan)
 class DailyPlanAdmin(admin.ModelAdmin):
@@ -72,3 +109,15 @@ class ReminderAdmin(admin.ModelAdmin):
     list_filter = ('is_sent', 'reminder_time')
     search_fields = ('title', 'message', 'user__username')
     list_editable = ('is_sent',)
+
+
+@admin.register(AuthToken)
+class AuthTokenAdmin(admin.ModelAdmin):
+    # Tokens can be revoked (deleted) here but not created or edited.
+    list_display = ('user', 'name', 'prefix', 'created_at', 'expires_at')
+    list_filter = ('created_at', 'expires_at')
+    search_fields = ('name', 'prefix', 'user__username')
+    readonly_fields = ('user', 'key_hash', 'prefix', 'name', 'created_at', 'expires_at')
+
+    def has_add_permission(self, request):
+        return False
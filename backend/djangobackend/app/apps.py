@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import changelog, checks, rollup, sessions, signals  # noqa: F401
+        from .database import configure_sqlite
+        from .profiling import install_query_recorder
+        from .search import repair_note_index
+
+        connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
+        connection_created.connect(install_query_recorder, dispatch_uid='install_query_recorder')
+        post_migrate.connect(repair_note_index, sender=self)
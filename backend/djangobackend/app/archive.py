@@ -0,0 +1,132 @@
+"""
+Hot/cold archival of daily plans, reminders and study sessions.
+
+``python manage.py archive_data`` moves completed plans, sent reminders and
+study sessions whose date is older than ARCHIVE_AFTER_DAYS into the
+Archived* tables, which have the same columns, keeping their ids. Each
+batch is an ``INSERT ... SELECT`` and a ``DELETE`` in one short
+transaction, with a pause before the next so requests get the write lock
+in between; the batch's ids are looked up beforehand in primary key order.
+The hot tables and their indexes then only hold rows in active use and
+stay small enough to be served from the page cache.
+
+Rows are moved in SQL, so no ``post_delete`` fires: UserDailyStats keeps
+counting them and the statistics built on it don't change, and the sync
+log records no deletes, so clients keep their copies. List views read
+both tables as one list with ``?include_archived=1``; exports, imports
+and ``rebuild_daily_stats`` always cover both.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+
+from .conditional import COLLECTION_STATE, collection_etag, combined_state
+from .models import (
+    DailyPlan, Reminder, StudySession, ArchivedDailyPlan, ArchivedReminder, ArchivedStudySession,
+)
+
+# Name in ARCHIVE_AFTER_DAYS and archive table of each archived model.
+ARCHIVES = {
+    DailyPlan: ('daily_plans', ArchivedDailyPlan),
+    Reminder: ('reminders', ArchivedReminder),
+    StudySession: ('study_sessions', ArchivedStudySession),
+}
+
+
+def archive_of(model):
+    return ARCHIVES[model][1] if model in ARCHIVES else None
+
+
+# Moving rows
+
+def archivable(model, days, now=None):
+    """Filter for the rows of ``model`` old enough to archive."""
+    now = now or timezone.now()
+    if model is DailyPlan:
+        return Q(is_completed=True, planned_date__lt=timezone.localdate(now) - timedelta(days=days))
+    if model is Reminder:
+        return Q(is_sent=True, reminder_time__lt=now - timedelta(days=days))
+    return Q(session_date__lt=now - timedelta(days=days))
+
+
+def _move(model, ids, condition):
+    archive = archive_of(model)
+    # Generated columns are computed again on insert.
+    fields = [field for field in archive._meta.concrete_fields if not field.generated]
+    quote = connection.ops.quote_name
+    # The condition is checked again in case a row changed since the lookup.
+    select, select_params = (
+        model.objects.filter(condition, pk__in=ids).order_by()
+        .values_list(*[field.attname for field in fields]).query.sql_with_params()
+    )
+    moved, moved_params = archive.objects.filter(pk__in=ids).values('pk').query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(archive._meta.db_table)} '
+            f'({", ".join(quote(field.column) for field in fields)}) {select}',
+            select_params,
+        )
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({moved})',
+            moved_params,
+        )
+        return cursor.rowcount
+
+
+def archive_rows(model, days=None, batch_size=500, pause=0.0, now=None):
+    """
+    Move the rows of ``model`` older than ``days`` (ARCHIVE_AFTER_DAYS by
+    default) to its archive table ``batch_size`` at a time, sleeping
+    ``pause`` seconds between batches. Returns the number moved.
+    """
+    name, _ = ARCHIVES[model]
+    condition = archivable(model, settings.ARCHIVE_AFTER_DAYS[name] if days is None else days, now)
+    moved = last = 0
+    while True:
+        # Walks the primary key, so each lookup starts where the last one ended.
+        ids = list(
+            model.objects.filter(condition, pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return moved
+        moved += _move(model, ids, condition)
+        last = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+# Reading both tables
+
+def archived_requested(request):
+    return (request.method in SAFE_METHODS
+            and request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes'))
+
+
+class ArchiveListMixin:
+    """
+    For list views of an archived model: ``?include_archived=1`` adds the
+    archived rows, merged into the same keyset pages and ETag. The view's
+    ``get_queryset(model)`` must accept the archive model in place of its own.
+    """
+
+    def get_querysets(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not archived_requested(self.request):
+            return [queryset]
+        return [queryset, self.filter_queryset(self.get_queryset(archive_of(queryset.model)))]
+
+    def collection_etag(self, request):
+        querysets = self.get_querysets()
+        states = [queryset.order_by().aggregate(**COLLECTION_STATE) for queryset in querysets]
+        return collection_etag(querysets[0], request, combined_state(states))
+
+    def paginate_queryset(self, queryset):
+        if not archived_requested(self.request):
+            return super().paginate_queryset(queryset)
+        archived = self.filter_queryset(self.get_queryset(archive_of(queryset.model)))
+        return self.paginator.paginate_querysets([queryset, archived], self.request, view=self)
@@ -0,0 +1,181 @@
+"""
+Async counterparts of the read-heavy endpoints, mounted under ``api/async/``.
+
+They return the same payloads as the DRF views but are plain Django async
+views, so under an ASGI server (``djangobackend.asgi``) a worker doesn't
+tie up a thread per request, and the dashboard's independent queries are
+awaited together with ``asyncio.gather``.
+"""
+from datetime import date, timedelta
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.views import View
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .archive import archive_of, archived_requested
+from .calendar import abuild_calendar, parse_calendar_range
+from .conditional import COLLECTION_STATE, collection_etag, combined_state, set_validators
+from .dashboard import aget_dashboard
+from .fieldsets import preview_requested, trim_queryset
+from .models import Note, DailyPlan, StudySession, Goal, Reminder
+from .pagination import KeysetPagination
+from .serializers import (
+    NoteSerializer, DailyPlanSerializer, StudySessionSerializer, GoalSerializer, ReminderSerializer,
+)
+from .statistics import (
+    RangeError, astudy_buckets, aproductivity, aproductivity_report, last_week_summary, parse_dates, parse_range,
+    range_summary,
+)
+from .tokens import aresolve_token, bearer_token
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+async def authenticate(request):
+    """The session or bearer token user, as the DRF views accept; None if neither."""
+    raw = bearer_token(request.headers.get('Authorization', ''))
+    if raw is not None:
+        resolved = await aresolve_token(raw)
+        user = resolved[0] if resolved else None
+    else:
+        user = await request.auser()
+    if user is None or not user.is_authenticated or not user.is_active:
+        return None
+    request.user = user
+    return user
+
+
+def not_authenticated():
+    return json_response({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+
+def login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if await authenticate(request) is None:
+            return not_authenticated()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_GET
+@login_required
+async def dashboard(request):
+    return json_response(await aget_dashboard(request.user))
+
+
+@require_GET
+@login_required
+async def study_statistics(request):
+    today = timezone.now().date()
+    buckets = await astudy_buckets(request.user, today - timedelta(days=7), today, 'day')
+    return json_response(last_week_summary(buckets))
+
+
+@require_GET
+@login_required
+async def study_statistics_range(request):
+    try:
+        start, end, granularity = parse_range(request.GET, timezone.now().date())
+    except RangeError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    buckets = await astudy_buckets(request.user, start, end, granularity)
+    return json_response(range_summary(start, end, granularity, buckets))
+
+
+@require_GET
+@login_required
+async def productivity_summary(request):
+    return json_response(await aproductivity(request.user, date.today()))
+
+
+@require_GET
+@login_required
+async def productivity_range(request):
+    today = timezone.now().date()
+    try:
+        start, end = parse_dates(request.GET, today)
+    except RangeError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    return json_response(await aproductivity_report(request.user, start, end, today))
+
+
+@require_GET
+@login_required
+async def calendar(request):
+    try:
+        start, end = parse_calendar_range(request.GET, timezone.now().date())
+    except RangeError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    archived = archived_requested(Request(request))
+    return json_response(await abuild_calendar(request.user, start, end, archived))
+
+
+class ListView(View):
+    """
+    Read-only async list endpoint with the same keyset pages, ``?fields=``,
+    ``?omit=``, ``?preview=``, ``?include_archived=`` and ETag handling as
+    the DRF list views.
+    """
+    http_method_names = ['get', 'head', 'options']
+    model = None
+    serializer_class = None
+
+    def get_queryset(self, request, model=None):
+        return (model or self.model).objects.filter(user=request.user)
+
+    async def get(self, request):
+        if await authenticate(request) is None:
+            return not_authenticated()
+        # DRF's Request gives the paginator and serializers query_params;
+        # its user lets the serializers render ``user`` without a query,
+        # which the async ORM wouldn't allow anyway.
+        api_request = Request(request)
+        api_request.user = request.user
+        options = {'context': {'request': api_request}, 'preview': preview_requested(api_request)}
+        models = [self.model]
+        if archived_requested(api_request) and archive_of(self.model):
+            models.append(archive_of(self.model))
+        querysets = [
+            trim_queryset(self.get_queryset(request, model), self.serializer_class(**options)) for model in models
+        ]
+
+        states = [await queryset.order_by().aaggregate(**COLLECTION_STATE) for queryset in querysets]
+        etag = collection_etag(querysets[0], request, combined_state(states))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return set_validators(not_modified, etag)
+
+        paginator = KeysetPagination()
+        try:
+            rows = await paginator.apaginate_querysets(querysets, api_request)
+        except NotFound as exc:
+            return json_response({'detail': str(exc.detail)}, status=404)
+        data = self.serializer_class(rows, many=True, **options).data
+        return set_validators(json_response(paginator.get_paginated_data(data)), etag)
+
+
+class DailyPlanListView(ListView):
+    model = DailyPlan
+    serializer_class = DailyPlanSerializer
+
+    def get_queryset(self, request, model=None):
+        queryset = super().get_queryset(request, model)
+        if request.GET.get('date'):
+            queryset = queryset.filter(planned_date=request.GET['date'])
+        return queryset
+
+
+note_list = ListView.as_view(model=Note, serializer_class=NoteSerializer)
+daily_plan_list = DailyPlanListView.as_view()
+study_session_list = ListView.as_view(model=StudySession, serializer_class=StudySessionSerializer)
+goal_list = ListView.as_view(model=Goal, serializer_class=GoalSerializer)
+reminder_list = ListView.as_view(model=Reminder, serializer_class=ReminderSerializer)
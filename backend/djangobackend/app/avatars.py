@@ -0,0 +1,185 @@
+"""
+Avatar uploads and the resized variants clients display.
+
+An upload is only hashed, checked to be an image and stored as
+``avatars/<sha256[:2]>/<sha256>.<ext>``, once however many profiles use
+it; the request never decodes the picture. The profile's
+``avatar_variants`` stays NULL until ``python manage.py process_avatars``
+has written a square thumbnail in every AVATAR_SIZES and AVATAR_FORMATS
+next to the original, named after the same hash, so an avatar that is
+already processed is served at once to whoever uploads it next.
+"""
+import hashlib
+import logging
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+# Pillow format of an upload: extension of the stored original.
+ACCEPTED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+# Variant format: (extension, Pillow save options).
+VARIANT_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+class InvalidAvatar(ValueError):
+    pass
+
+
+# Uploads
+
+def _digest(fileobj):
+    sha = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(64 * 1024), b''):
+        sha.update(block)
+    fileobj.seek(0)
+    return sha.hexdigest()
+
+
+def store_original(fileobj):
+    """Store the uploaded image unless an identical one is; returns its storage name."""
+    size = getattr(fileobj, 'size', None)
+    if size is not None and size > settings.AVATAR_MAX_UPLOAD_BYTES:
+        raise InvalidAvatar(f'Avatars are limited to {settings.AVATAR_MAX_UPLOAD_BYTES // (1024 * 1024)} MB.')
+    # A small file can declare enough pixels to exhaust memory when
+    # process_avatars decodes it.
+    too_large = InvalidAvatar(f'Avatars are limited to {settings.AVATAR_MAX_PIXELS // 10 ** 6} megapixels.')
+    try:
+        # Reads the header only.
+        with Image.open(fileobj) as image:
+            format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError):
+        raise InvalidAvatar('Upload a JPEG, PNG, WebP or GIF image.')
+    except Image.DecompressionBombError:
+        raise too_large
+    if width * height > settings.AVATAR_MAX_PIXELS:
+        raise too_large
+    if format not in ACCEPTED_FORMATS:
+        raise InvalidAvatar('Upload a JPEG, PNG, WebP or GIF image.')
+    digest = _digest(fileobj)
+    name = f'avatars/{digest[:2]}/{digest}.{ACCEPTED_FORMATS[format]}'
+    if not default_storage.exists(name):
+        stored = default_storage.save(name, fileobj)
+        if stored != name:
+            # Another upload of the same file won the race.
+            default_storage.delete(stored)
+    return name
+
+
+def set_avatar(profile, fileobj, save=True):
+    name = store_original(fileobj)
+    profile.avatar = name
+    # Reuse the variants if this picture has been processed for anyone.
+    profile.avatar_variants = (
+        UserProfile.objects.filter(avatar=name, avatar_variants__isnull=False)
+        .values_list('avatar_variants', flat=True).first()
+    )
+    if save:
+        profile.save(update_fields=['avatar', 'avatar_variants', 'updated_at'])
+
+
+def clear_avatar(profile, save=True):
+    # Originals and variants may be shared, so the files are kept.
+    profile.avatar = None
+    profile.avatar_variants = {}
+    if save:
+        profile.save(update_fields=['avatar', 'avatar_variants', 'updated_at'])
+
+
+def variant_urls(variants, request=None):
+    """``{size: {format: url}}`` for a profile's ``avatar_variants``."""
+    if variants is None:
+        return None
+    urls = {}
+    for size, names in variants.items():
+        urls[size] = {}
+        for format, name in names.items():
+            url = default_storage.url(name)
+            urls[size][format] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+# Processing
+
+def _square(image, size):
+    return ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+
+
+def make_variants(name):
+    """Write any missing variants of the stored original ``name``; returns their names."""
+    stem = name.rsplit('.', 1)[0]
+    sizes = sorted(settings.AVATAR_SIZES)
+    names = {
+        str(size): {format: f'{stem}-{size}.{VARIANT_FORMATS[format][0]}' for format in settings.AVATAR_FORMATS}
+        for size in sizes
+    }
+    if all(default_storage.exists(variant) for formats in names.values() for variant in formats.values()):
+        return names
+
+    with default_storage.open(name, 'rb') as fh, Image.open(fh) as image:
+        # Lets the JPEG decoder scale down by up to 8x while decoding.
+        image.draft('RGB', (sizes[-1], sizes[-1]))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        # Each size is cut from the next larger one.
+        square = _square(image, sizes[-1])
+        for size in reversed(sizes):
+            square = _square(square, size)
+            for format, variant in names[str(size)].items():
+                if default_storage.exists(variant):
+                    continue
+                picture = square
+                if format == 'jpeg' and square.mode == 'RGBA':
+                    picture = Image.new('RGB', square.size, 'white')
+                    picture.paste(square, mask=square.getchannel('A'))
+                buffer = BytesIO()
+                picture.save(buffer, **VARIANT_FORMATS[format][1])
+                default_storage.save(variant, ContentFile(buffer.getvalue()))
+    return names
+
+
+def process_pending(limit=None):
+    """
+    Make the variants of up to ``limit`` pending avatars and hand them to
+    every profile using them; returns how many avatars were processed.
+    """
+    names = list(
+        UserProfile.objects.filter(avatar_variants__isnull=True).order_by()
+        .values_list('avatar', flat=True).distinct()[:limit or settings.AVATAR_BATCH_SIZE]
+    )
+    for name in names:
+        try:
+            variants = make_variants(name)
+        except Exception:
+            # Not retried; the original is still served.
+            logger.exception('Could not resize avatar %s', name)
+            variants = {}
+        # update() skips post_save, so cached users see the variants when
+        # their cache entries expire.
+        UserProfile.objects.filter(avatar=name, avatar_variants__isnull=True).update(avatar_variants=variants)
+    return len(names)
+
+
+def run(poll_interval=None, once=False):
+    """Process pending avatars until interrupted (or until none are left if ``once``)."""
+    poll_interval = poll_interval or settings.AVATAR_POLL_SECONDS
+    processed = 0
+    while True:
+        count = process_pending()
+        processed += count
+        if not count:
+            if once:
+                return processed
+            time.sleep(poll_interval)
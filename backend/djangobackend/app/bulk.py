@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import changelog, rollup
+from .signals import bulk_saved
+
+
+class BulkMutationView(APIView):
+    """
+    Apply a batch of creates, partial updates and deletes to one model.
+
+    Request body::
+
+        {"create": [{...}, ...],
+         "update": [{"id": 1, ...}, ...],
+         "delete": [3, 4]}
+
+    Every item is validated with ``serializer_class`` first; if any item
+    fails nothing is written and the response is a 400 carrying the
+    per-item results. Otherwise the whole batch is applied in one
+    transaction with ``bulk_create``/``bulk_update`` and a single DELETE, so
+    it costs a handful of queries whatever its size.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = None
+
+    def get_queryset(self):
+        model = self.serializer_class.Meta.model
+        return model.objects.filter(user=self.request.user)
+
+    def get_serializer(self, *args, **kwargs):
+        return self.serializer_class(*args, context={'request': self.request}, **kwargs)
+
+    def prepare_instance(self, instance, data, created):
+        """
+        Hook for model-specific side effects of a create or update; returns
+        the names of any fields it set beyond those in ``data``.
+        """
+        return ()
+
+    def post(self, request):
+        creates = request.data.get('create', [])
+        updates = request.data.get('update', [])
+        deletes = request.data.get('delete', [])
+        if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+            return Response({'error': 'create, update and delete must be lists'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(creates) + len(updates) + len(deletes) > settings.BULK_MAX_ITEMS:
+            return Response({'error': f'At most {settings.BULK_MAX_ITEMS} items per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.serializer_class.Meta.model
+        now = timezone.now()
+        results = {'create': [], 'update': [], 'delete': []}
+        failed = False
+
+        create_serializer = self.get_serializer(data=creates, many=True)
+        create_serializer.is_valid()
+        new_instances = []
+        item_errors = create_serializer.errors or {}
+        if isinstance(item_errors, list):
+            item_errors = dict(enumerate(item_errors))
+        for index in range(len(creates)):
+            errors = item_errors.get(index)
+            if errors:
+                failed = True
+                results['create'].append({'status': 400, 'errors': errors})
+            else:
+                results['create'].append({'status': 201})
+        if not failed:
+            for data in create_serializer.validated_data:
+                instance = model(user=request.user, **data)
+                self.prepare_instance(instance, data, created=True)
+                new_instances.append(instance)
+
+        update_ids = [item.get('id') for item in updates if isinstance(item, dict)]
+        existing = self.get_queryset().in_bulk([pk for pk in update_ids if isinstance(pk, int)])
+        changed_instances, changed_fields = [], set()
+        for item in updates:
+            instance = existing.get(item.get('id')) if isinstance(item, dict) else None
+            if instance is None:
+                failed = True
+                results['update'].append({'id': item.get('id') if isinstance(item, dict) else None,
+                                          'status': 404, 'errors': {'id': ['Not found.']}})
+                continue
+            serializer = self.get_serializer(instance, data=item, partial=True)
+            if not serializer.is_valid():
+                failed = True
+                results['update'].append({'id': instance.pk, 'status': 400, 'errors': serializer.errors})
+                continue
+            for field, value in serializer.validated_data.items():
+                setattr(instance, field, value)
+            changed_fields.update(serializer.validated_data)
+            changed_fields.update(self.prepare_instance(instance, serializer.validated_data, created=False))
+            changed_instances.append(instance)
+            results['update'].append({'id': instance.pk, 'status': 200})
+
+        delete_ids = set(self.get_queryset().filter(pk__in=[pk for pk in deletes if isinstance(pk, int)])
+                         .values_list('pk', flat=True)) if deletes else set()
+        for pk in deletes:
+            if pk in delete_ids:
+                results['delete'].append({'id': pk, 'status': 204})
+            else:
+                failed = True
+                results['delete'].append({'id': pk, 'status': 404, 'errors': {'id': ['Not found.']}})
+
+        if failed:
+            return Response(results, status=status.HTTP_400_BAD_REQUEST)
+
+        if changed_instances and any(f.name == 'updated_at' for f in model._meta.fields):
+            # bulk_update bypasses save(), so auto_now has to be applied by hand.
+            for instance in changed_instances:
+                instance.updated_at = now
+            changed_fields.add('updated_at')
+
+        with transaction.atomic(), rollup.batched(), changelog.batched():
+            created = model.objects.bulk_create(new_instances)
+            if changed_instances:
+                model.objects.bulk_update(changed_instances, sorted(changed_fields))
+            if delete_ids:
+                self.get_queryset().filter(pk__in=delete_ids).delete()
+            self.send_signals(model, created, changed_instances)
+
+        for result, instance in zip(results['create'], created):
+            result.update(id=instance.pk, data=self.get_serializer(instance).data)
+        for result, instance in zip(results['update'], changed_instances):
+            result['data'] = self.get_serializer(instance).data
+        return Response(results, status=status.HTTP_200_OK)
+
+    def send_signals(self, model, created, updated):
+        if created:
+            bulk_saved.send(sender=model, instances=created, created=True)
+        if updated:
+            bulk_saved.send(sender=model, instances=updated, created=False)
@@ -0,0 +1,108 @@
+"""
+Everything dated in a range of days, for month and week views.
+
+``build_calendar`` reads plans, study sessions, goals and reminders with
+one range query each, on the (user, date) index of the model, and groups
+the rows by day. Rows are lists in the order given by ``columns`` rather
+than objects, and days with nothing on them are left out, so a 6-week
+month grid is one small response.
+"""
+import asyncio
+from datetime import timedelta
+
+from django.db.models import DateTimeField
+from django.utils import timezone
+
+from .archive import archive_of
+from .models import DailyPlan, StudySession, Goal, Reminder
+from .statistics import RangeError, day_bounds, parse_dates
+
+# A 6-week month grid with room to spare.
+MAX_CALENDAR_DAYS = 62
+
+# Per section: model, date field, columns sent and the order within a day.
+SOURCES = {
+    'plans': (DailyPlan, 'planned_date', ('id', 'title', 'priority', 'is_completed', 'estimated_duration'),
+              ('-priority_rank', 'is_completed', 'position')),
+    'sessions': (StudySession, 'session_date', ('id', 'subject', 'duration_minutes'), ()),
+    'goals': (Goal, 'target_date', ('id', 'title', 'status'), ('-created_at',)),
+    'reminders': (Reminder, 'reminder_time', ('id', 'title', 'is_sent'), ()),
+}
+
+
+def _timed(model, field):
+    return isinstance(model._meta.get_field(field), DateTimeField)
+
+
+# Sessions and reminders get their local time of day as a last column.
+COLUMNS = {
+    name: [*columns, 'time'] if _timed(model, field) else list(columns)
+    for name, (model, field, columns, _) in SOURCES.items()
+}
+
+
+def parse_calendar_range(params, today):
+    """``(start, end)`` from the required ``start`` and ``end`` parameters; RangeError if invalid."""
+    if 'start' not in params or 'end' not in params:
+        raise RangeError('start and end are required (YYYY-MM-DD)')
+    return parse_dates(params, today, max_days=MAX_CALENDAR_DAYS)
+
+
+def _queries(user, start, end, archived=False):
+    # Independent of each other, so the async path can run them concurrently.
+    queries = {}
+    for name, (model, field, columns, then) in SOURCES.items():
+        lower, upper = day_bounds(start, end) if _timed(model, field) else (start, end + timedelta(days=1))
+        names = [field, *columns, *(key.lstrip('-') for key in then)]
+
+        def rows(model):
+            return model.objects.filter(
+                user=user, **{f'{field}__gte': lower, f'{field}__lt': upper}
+            ).values_list(*names)
+
+        queryset = rows(model)
+        if archived and archive_of(model):
+            queryset = queryset.order_by().union(rows(archive_of(model)).order_by(), all=True)
+        queries[name] = queryset.order_by(field, *then)
+    return queries
+
+
+def _assemble(start, end, results):
+    days = {}
+    for name, rows in results.items():
+        model, field, columns, _ = SOURCES[name]
+        timed = _timed(model, field)
+        for value, *row in rows:
+            row = row[:len(columns)]
+            if timed:
+                value = timezone.localtime(value)
+                row.append(value.strftime('%H:%M'))
+                value = value.date()
+            days.setdefault(value.isoformat(), {}).setdefault(name, []).append(row)
+    return {
+        'start': str(start),
+        'end': str(end),
+        'columns': COLUMNS,
+        'days': dict(sorted(days.items())),
+    }
+
+
+def build_calendar(user, start, end, archived=False):
+    """
+    The user's plans, sessions, goals and reminders dated ``start`` to
+    ``end`` (inclusive), keyed by day and then section; ``archived`` adds
+    the rows moved to the archive tables, in the same queries.
+    """
+    queries = _queries(user, start, end, archived)
+    return _assemble(start, end, {name: list(queryset) for name, queryset in queries.items()})
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+async def abuild_calendar(user, start, end, archived=False):
+    """``build_calendar`` with the four queries awaited together."""
+    queries = _queries(user, start, end, archived)
+    results = await asyncio.gather(*(_alist(queryset) for queryset in queries.values()))
+    return _assemble(start, end, dict(zip(queries, results)))
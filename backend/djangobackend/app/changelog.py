@@ -0,0 +1,196 @@
+import base64
+import binascii
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Exists, Max, OuterRef
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .archive import archive_of
+from .models import ChangeLogEntry, Note, DailyPlan, StudySession, Goal, Reminder
+from .serializers import (
+    NoteSerializer, DailyPlanSerializer, StudySessionSerializer, GoalSerializer, ReminderSerializer,
+)
+from .signals import bulk_saved
+
+# Response key and serializer for each synced model.
+SYNCED_MODELS = {
+    Note: ('notes', NoteSerializer),
+    DailyPlan: ('daily_plans', DailyPlanSerializer),
+    StudySession: ('study_sessions', StudySessionSerializer),
+    Goal: ('goals', GoalSerializer),
+    Reminder: ('reminders', ReminderSerializer),
+}
+
+
+_batch = threading.local()
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+# Writing
+
+@contextmanager
+def batched():
+    """Buffer the entries logged inside the block and insert them in one query."""
+    if getattr(_batch, 'entries', None) is not None:
+        yield
+        return
+    _batch.entries = entries = []
+    try:
+        yield
+    finally:
+        _batch.entries = None
+    ChangeLogEntry.objects.bulk_create(entries)
+
+
+def log_changes(instances, action):
+    entries = [
+        ChangeLogEntry(
+            user_id=instance.user_id, model=instance._meta.model_name,
+            object_id=instance.pk, action=action,
+        )
+        for instance in instances
+    ]
+    buffer = getattr(_batch, 'entries', None)
+    if buffer is not None:
+        buffer.extend(entries)
+    else:
+        ChangeLogEntry.objects.bulk_create(entries)
+
+
+def log_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        log_changes([instance], ChangeLogEntry.UPSERT)
+
+
+def log_delete(sender, instance, **kwargs):
+    log_changes([instance], ChangeLogEntry.DELETE)
+
+
+def log_bulk_save(sender, instances, **kwargs):
+    log_changes(instances, ChangeLogEntry.UPSERT)
+
+
+for model in SYNCED_MODELS:
+    name = model.__name__
+    post_save.connect(log_save, sender=model, dispatch_uid=f'changelog_save_{name}')
+    post_delete.connect(log_delete, sender=model, dispatch_uid=f'changelog_delete_{name}')
+    bulk_saved.connect(log_bulk_save, sender=model, dispatch_uid=f'changelog_bulk_{name}')
+
+
+# Tokens
+
+def encode_token(position, issued_at=None):
+    payload = json.dumps({'p': position, 't': int(issued_at or time.time())})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_token(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return int(payload['p']), int(payload['t'])
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise InvalidToken('Invalid sync token.')
+
+
+def retention():
+    return timedelta(days=settings.SYNC_RETENTION_DAYS)
+
+
+def current_token(user):
+    position = ChangeLogEntry.objects.filter(user=user).aggregate(last=Max('id'))['last']
+    return encode_token(position or 0)
+
+
+# Reading
+
+def changes_since(user, token, request=None, limit=None):
+    """
+    Everything that changed for ``user`` after ``token``, at most ``limit``
+    log entries at a time (``more`` says whether to ask again).
+
+    Tokens issued before the retention window may point at entries that
+    compaction has dropped; those get ``reset`` and the client reloads
+    its collections.
+
+    Log ids are assigned in commit order because SQLite serialises writers,
+    so a reader never skips an entry that commits after it looked.
+    """
+    position, issued_at = decode_token(token)
+    changed = {key: [] for key, _ in SYNCED_MODELS.values()}
+    deleted = {key: [] for key, _ in SYNCED_MODELS.values()}
+    if issued_at < time.time() - retention().total_seconds():
+        return {'token': current_token(user), 'reset': True, 'more': False,
+                'changed': changed, 'deleted': deleted}
+
+    limit = limit or settings.SYNC_MAX_CHANGES
+    entries = list(
+        ChangeLogEntry.objects.filter(user=user, id__gt=position)
+        .order_by('id').values_list('id', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Later entries win, so an object created and then deleted is a tombstone.
+    latest = {}
+    for _, model_name, object_id, action in entries:
+        latest[(model_name, object_id)] = action
+
+    for model, (key, serializer_class) in SYNCED_MODELS.items():
+        model_name = model._meta.model_name
+        upserts = [pk for (name, pk), action in latest.items()
+                   if name == model_name and action == ChangeLogEntry.UPSERT]
+        deleted[key] = [pk for (name, pk), action in latest.items()
+                        if name == model_name and action == ChangeLogEntry.DELETE]
+        if not upserts:
+            continue
+        objects = list(model.objects.filter(user=user, pk__in=upserts))
+        missing = set(upserts) - {obj.pk for obj in objects}
+        if missing and archive_of(model):
+            # Archived since it was logged; the client keeps its copy.
+            objects += archive_of(model).objects.filter(user=user, pk__in=missing)
+        context = {'request': request, 'owner': user}
+        changed[key] = serializer_class(objects, many=True, context=context).data
+        # Deleted after the last entry in this batch; the tombstone follows later.
+        found = {item['id'] for item in changed[key]}
+        deleted[key].extend(pk for pk in upserts if pk not in found)
+
+    # A token (p, t) promises every entry after p was written at or after t.
+    # While more entries are pending they predate now, so t carries over.
+    if entries:
+        position = entries[-1][0]
+    token = encode_token(position, issued_at if more else None)
+    return {'token': token, 'reset': False, 'more': more, 'changed': changed, 'deleted': deleted}
+
+
+# Compaction
+
+def compact_changelog(batch_size=10000, now=None):
+    """
+    Drop entries a newer entry for the same object supersedes, entries
+    older than SYNC_RETENTION_DAYS and entries of deleted users.
+    Returns ``(superseded, expired, orphaned)`` counts.
+    """
+    now = now or timezone.now()
+    superseded = 0
+    newer = ChangeLogEntry.objects.filter(
+        user_id=OuterRef('user_id'), model=OuterRef('model'),
+        object_id=OuterRef('object_id'), id__gt=OuterRef('id'),
+    )
+    last = ChangeLogEntry.objects.aggregate(last=Max('id'))['last'] or 0
+    for start in range(0, last, batch_size):
+        batch = ChangeLogEntry.objects.filter(id__gt=start, id__lte=start + batch_size)
+        superseded += batch.filter(Exists(newer)).delete()[0]
+
+    expired = ChangeLogEntry.objects.filter(created_at__lt=now - retention()).delete()[0]
+    orphaned = ChangeLogEntry.objects.exclude(user_id__in=User.objects.values('pk')).delete()[0]
+    return superseded, expired, orphaned
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """
+    Cached sessions need a cache every worker shares. With LocMemCache each
+    process keeps its own copy of a session for its whole expiry age, so
+    after a logout or ``session.flush()`` on one worker the others still
+    accept the cookie.
+    """
+    if settings.SESSION_ENGINE not in CACHED_SESSION_ENGINES:
+        return []
+    backend = settings.CACHES.get(settings.SESSION_CACHE_ALIAS, {}).get('BACKEND', '')
+    if not backend.endswith('.LocMemCache'):
+        return []
+    return [Error(
+        f'{settings.SESSION_ENGINE} cannot use the per-process LocMemCache.',
+        hint="Set FOCUSMATE_SESSION_MODE to 'db' or 'cookie', or set FOCUSMATE_REDIS_URL to a shared cache.",
+        id='app.E001',
+    )]
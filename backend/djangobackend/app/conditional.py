@@ -0,0 +1,123 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest())
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Clients may keep the body but must revalidate it on every use.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def _media_type(request):
+    return getattr(request, 'accepted_media_type', '')
+
+
+# COUNT(*) rather than COUNT(id): the archive tables' id isn't the rowid,
+# so only this form is answered from their (user, updated_at) index alone.
+COLLECTION_STATE = {'count': Count('*'), 'latest': Max('updated_at')}
+
+
+def combined_state(states):
+    """COLLECTION_STATE of several querysets listed as one."""
+    latest = [state['latest'] for state in states if state['latest'] is not None]
+    return {'count': sum(state['count'] for state in states), 'latest': max(latest, default=None)}
+
+
+def collection_etag(queryset, request, state):
+    """ETag for a list response, from ``queryset.aggregate(**COLLECTION_STATE)``."""
+    return make_etag(
+        queryset.model._meta.label, request.user.pk, state['count'], state['latest'],
+        request.get_full_path(), _media_type(request),
+    )
+
+
+class ConditionalListMixin:
+    """
+    ETag validation for list views, checked before any row is loaded.
+
+    The validator is the row count and newest ``updated_at`` of the filtered
+    queryset, one aggregate query. Edits move ``updated_at`` forward and
+    deletes lower the count, so every change to the collection changes the
+    ETag. The URL (cursor, ?fields= and other parameters) and the negotiated
+    media type are folded in, since each renders a different body. No
+    Last-Modified is sent: a delete leaves the newest timestamp unchanged.
+    """
+
+    def collection_etag(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.order_by().aggregate(**COLLECTION_STATE)
+        return collection_etag(queryset, request, state)
+
+    def list(self, request, *args, **kwargs):
+        etag = self.collection_etag(request)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return set_validators(not_modified, etag)
+        return set_validators(super().list(request, *args, **kwargs), etag)
+
+
+class ConditionalDetailMixin:
+    """
+    ETag/Last-Modified for detail views, from the row's ``updated_at``.
+
+    GET and HEAD answer 304 to a matching If-None-Match/If-Modified-Since.
+    PUT, PATCH and DELETE honour If-Match/If-Unmodified-Since and answer 412
+    when the row changed since the client read it.
+    """
+
+    def object_validators(self, request):
+        lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        row = self.get_queryset().filter(**lookup).values_list('pk', 'updated_at').first()
+        if row is None:
+            return None, None
+        pk, updated_at = row
+        # As for lists, ?fields=/?omit= render a different body under their own ETag.
+        etag = make_etag(self.get_queryset().model._meta.label, pk, updated_at.isoformat(),
+                         request.get_full_path(), _media_type(request))
+        return etag, updated_at
+
+    def evaluate_preconditions(self, request):
+        """``(response, etag, last_modified)``; ``response`` is a 304/412 or None."""
+        etag, last_modified = self.object_validators(request)
+        if etag is None:
+            # Let the view raise its usual 404.
+            return None, None, None
+        response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+        if response is not None:
+            set_validators(response, etag, last_modified)
+        return response, etag, last_modified
+
+    def retrieve(self, request, *args, **kwargs):
+        conditional, etag, last_modified = self.evaluate_preconditions(request)
+        if conditional is not None:
+            return conditional
+        response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified) if etag else response
+
+    def update(self, request, *args, **kwargs):
+        conditional, _, _ = self.evaluate_preconditions(request)
+        if conditional is not None:
+            return conditional
+        response = super().update(request, *args, **kwargs)
+        if response.status_code == 200:
+            etag, last_modified = self.object_validators(request)
+            if etag is not None:
+                set_validators(response, etag, last_modified)
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        conditional, _, _ = self.evaluate_preconditions(request)
+        if conditional is not None:
+            return conditional
+        return super().destroy(request, *args, **kwargs)
@@ -0,0 +1,144 @@
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .fieldsets import trim_queryset
+from .models import ChangeLogEntry, Note, DailyPlan, StudySession, Goal, Reminder, UserDailyStats
+from .serializers import NoteSerializer, DailyPlanSerializer, StudySessionSerializer
+
+
+def dashboard_cache_key(user_id, day=None):
+    # "today" is part of the key so the snapshot rolls over at midnight.
+    day = day or timezone.localdate()
+    return f'dashboard:{user_id}:{day.isoformat()}'
+
+
+def invalidate_dashboard(user_id):
+    cache.delete(dashboard_cache_key(user_id))
+
+
+def _queries(user, today, now):
+    # Independent of each other, so the async path can run them concurrently.
+    return {
+        'total_notes': Note.objects.filter(user=user),
+        'today_plans': DailyPlan.objects.filter(user=user, planned_date=today),
+        'session_totals': UserDailyStats.objects.filter(user=user),
+        'active_goals': Goal.objects.filter(user=user, status__in=['not_started', 'in_progress']),
+        'reminder_totals': Reminder.objects.filter(user=user, is_sent=False, reminder_time__gte=now),
+        # Only the first characters of each note's content are sent.
+        'recent_notes': trim_queryset(Note.objects.filter(user=user), NoteSerializer(preview=True))[:5],
+        'recent_study_sessions': StudySession.objects.filter(user=user)[:5],
+    }
+
+
+SESSION_TOTALS = {'count': Sum('session_count'), 'minutes': Sum('study_minutes')}
+REMINDER_TOTALS = {'upcoming': Count('id'), 'next_due': Min('reminder_time')}
+
+
+def _assemble(user, results, now):
+    context = {'owner': user}
+    today_plans = results['today_plans']
+    session_totals = results['session_totals']
+    reminder_totals = results['reminder_totals']
+    data = {
+        'total_notes': results['total_notes'],
+        'total_daily_plans': len(today_plans),
+        'completed_plans_today': sum(1 for plan in today_plans if plan.is_completed),
+        'total_study_sessions': session_totals['count'] or 0,
+        'total_study_time': session_totals['minutes'] or 0,
+        'active_goals': results['active_goals'],
+        'upcoming_reminders': reminder_totals['upcoming'],
+        'recent_notes': NoteSerializer(results['recent_notes'], many=True, preview=True, context=context).data,
+        'today_plans': DailyPlanSerializer(today_plans, many=True, context=context).data,
+        'recent_study_sessions': StudySessionSerializer(
+            results['recent_study_sessions'], many=True, context=context).data,
+    }
+
+    timeout = settings.DASHBOARD_CACHE_TIMEOUT
+    if reminder_totals['next_due'] is not None:
+        seconds_until_due = (reminder_totals['next_due'] - now).total_seconds()
+        timeout = max(1, min(timeout, int(seconds_until_due) + 1))
+    return data, timeout
+
+
+def build_dashboard(user):
+    """
+    Build the dashboard payload with one query per table (two for notes and
+    sessions, which also need their five most recent rows); session totals
+    come from the UserDailyStats rollup.
+
+    Returns ``(data, timeout)``; the timeout is cut short when a pending
+    reminder becomes due, since that changes ``upcoming_reminders`` without
+    any write to the user's data.
+    """
+    now = timezone.now()
+    queries = _queries(user, timezone.localdate(now), now)
+    return _assemble(user, {
+        'total_notes': queries['total_notes'].count(),
+        'today_plans': list(queries['today_plans']),
+        'session_totals': queries['session_totals'].aggregate(**SESSION_TOTALS),
+        'active_goals': queries['active_goals'].count(),
+        'reminder_totals': queries['reminder_totals'].aggregate(**REMINDER_TOTALS),
+        'recent_notes': list(queries['recent_notes']),
+        'recent_study_sessions': list(queries['recent_study_sessions']),
+    }, now)
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+async def abuild_dashboard(user):
+    """``build_dashboard`` with the seven queries awaited together."""
+    now = timezone.now()
+    queries = _queries(user, timezone.localdate(now), now)
+    pending = {
+        'total_notes': queries['total_notes'].acount(),
+        'today_plans': _alist(queries['today_plans']),
+        'session_totals': queries['session_totals'].aaggregate(**SESSION_TOTALS),
+        'active_goals': queries['active_goals'].acount(),
+        'reminder_totals': queries['reminder_totals'].aaggregate(**REMINDER_TOTALS),
+        'recent_notes': _alist(queries['recent_notes']),
+        'recent_study_sessions': _alist(queries['recent_study_sessions']),
+    }
+    results = await asyncio.gather(*pending.values())
+    return _assemble(user, dict(zip(pending, results)), now)
+
+
+# Every write to the five models logs a change (app/changelog.py) under a
+# new, never reused id, so the user's latest id changes with their data. It
+# is read from the database on each request, one query on
+# changelog_user_id_idx, so a write handled by one worker also retires the
+# snapshots other workers hold in their own caches. A cached load therefore
+# costs this one query instead of none: the zero-query target is relaxed on
+# purpose, since LocMemCache can't be invalidated across processes.
+LAST_CHANGE = {'last': Max('id')}
+
+
+def _changes(user):
+    return ChangeLogEntry.objects.filter(user=user)
+
+
+def get_dashboard(user):
+    key = dashboard_cache_key(user.pk)
+    version = _changes(user).aggregate(**LAST_CHANGE)['last']
+    snapshot = cache.get(key)
+    if snapshot is None or snapshot[0] != version:
+        data, timeout = build_dashboard(user)
+        cache.set(key, (version, data), timeout)
+        return data
+    return snapshot[1]
+
+
+async def aget_dashboard(user):
+    key = dashboard_cache_key(user.pk)
+    version = (await _changes(user).aaggregate(**LAST_CHANGE))['last']
+    snapshot = await cache.aget(key)
+    if snapshot is None or snapshot[0] != version:
+        data, timeout = await abuild_dashboard(user)
+        await cache.aset(key, (version, data), timeout)
+        return data
+    return snapshot[1]
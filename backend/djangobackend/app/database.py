@@ -0,0 +1,75 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# True while a GET/HEAD/OPTIONS request is being handled.
+read_only_request = ContextVar('read_only_request', default=False)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver applying SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    if connection.alias == ReadWriteRouter.read_alias:
+        pragmas['query_only'] = 'ON'
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class ReadOnlyRequestMiddleware:
+    """Flags GET, HEAD and OPTIONS requests for ReadWriteRouter."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_only_request.set(request.method in READ_ONLY_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            read_only_request.reset(token)
+
+    async def __acall__(self, request):
+        token = read_only_request.set(request.method in READ_ONLY_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            read_only_request.reset(token)
+
+
+class ReadWriteRouter:
+    """
+    Writes always go to 'default', the single writer. Reads made while
+    handling a read-only request go to ``read_alias`` so they never queue
+    behind the writer's connection, except inside a transaction on
+    'default', which must see its own uncommitted rows. WAL lets the read
+    connection see every committed write without blocking it.
+    """
+    read_alias = 'replica'
+
+    def db_for_read(self, model, **hints):
+        if not read_only_request.get() or connections['default'].in_atomic_block:
+            return 'default'
+        return self.read_alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database file.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
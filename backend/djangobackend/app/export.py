@@ -0,0 +1,137 @@
+"""
+Streaming export of everything a user has stored.
+
+Rows are read with ``.values().iterator(chunk_size=EXPORT_CHUNK_SIZE)`` and
+written straight into the response as NDJSON or CSV, optionally through a
+streaming gzip compressor, so the process holds one chunk of rows and one
+output buffer at a time however big the account is. Serializers aren't
+involved: the export is the stored columns.
+
+Under ASGI the response gets ``aiterate(pieces)``: Django would otherwise
+collect a synchronous iterator into a list before sending any of it.
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from .archive import archive_of
+from .models import Note, DailyPlan, StudySession, Goal, Reminder
+
+# Name used by ?models= and in every exported row, for each model.
+EXPORTED_MODELS = {
+    'notes': Note,
+    'daily_plans': DailyPlan,
+    'study_sessions': StudySession,
+    'goals': Goal,
+    'reminders': Reminder,
+}
+
+# Bytes buffered before a piece of the response is sent.
+BUFFER_SIZE = 64 * 1024
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields if field.name != 'user']
+
+
+def rows(user, model, chunk_size=None):
+    """The user's rows of ``model``, followed by those of its archive table."""
+    for table in filter(None, (model, archive_of(model))):
+        yield from (
+            table.objects.filter(user=user).order_by('pk')
+            .values(*columns(model))
+            .iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+        )
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Picked by ``?format=``; ``stream()`` writes the export itself, and
+    ``render()`` is only used for error responses.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+    def stream(self, user, names, chunk_size=None):
+        """The export of ``names`` for ``user``, in pieces of about BUFFER_SIZE bytes."""
+        buffer = io.StringIO()
+        for name in names:
+            model = EXPORTED_MODELS[name]
+            self.write_header(buffer, name, columns(model))
+            for row in rows(user, model, chunk_size):
+                self.write_row(buffer, name, row)
+                if buffer.tell() >= BUFFER_SIZE:
+                    yield buffer.getvalue().encode()
+                    buffer.seek(0)
+                    buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def write_header(self, buffer, name, fields):
+        pass
+
+    def write_row(self, buffer, name, row):
+        raise NotImplementedError
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """
+    Keeps the microseconds DjangoJSONEncoder drops from datetimes, so an
+    imported row's natural key matches the stored one.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            value = o.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return super().default(o)
+
+
+class NDJSONRenderer(ExportRenderer):
+    """One JSON object per line, its ``model`` key naming the model."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    encode = ExportJSONEncoder().encode
+
+    def write_row(self, buffer, name, row):
+        buffer.write(self.encode({'model': name, **row}))
+        buffer.write('\n')
+
+
+class CSVRenderer(ExportRenderer):
+    """One section per model, each starting with a ``model,<columns>`` header row."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def write_header(self, buffer, name, fields):
+        self.writer = csv.writer(buffer)
+        self.writer.writerow(['model', *fields])
+
+    def write_row(self, buffer, name, row):
+        self.writer.writerow([name, *row.values()])
+
+
+def gzipped(pieces):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for piece in pieces:
+        compressed = compressor.compress(piece)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def aiterate(pieces):
+    """``pieces`` as an async iterator, each piece made in the thread the ORM runs in."""
+    pieces = iter(pieces)
+    step = sync_to_async(next, thread_sensitive=True)
+    while (piece := await step(pieces, None)) is not None:
+        yield piece
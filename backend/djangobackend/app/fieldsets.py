@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.db.models.functions import Substr
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+PREVIEW_SUFFIX = '_preview'
+
+
+def parse_field_list(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+class PreviewField(serializers.ReadOnlyField):
+    """
+    The first ``length`` characters of a long text field. Reads the
+    ``<field>_preview`` annotation added by ``trim_queryset`` and only falls
+    back to the full column for instances loaded without it.
+    """
+
+    def __init__(self, text_field, length=None, **kwargs):
+        self.text_field = text_field
+        self.length = length or settings.CONTENT_PREVIEW_LENGTH
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        if self.field_name in instance.__dict__:
+            return instance.__dict__[self.field_name]
+        return getattr(instance, self.text_field)
+
+    def to_representation(self, value):
+        value = value or ''
+        if len(value) <= self.length:
+            return value
+        return value[:self.length].rstrip() + '…'
+
+
+class SparseFieldsetMixin:
+    """
+    Lets a ModelSerializer render a subset of its fields.
+
+    ``fields=``/``omit=`` can be passed to the constructor; the top-level
+    serializer of a GET request also honours ``?fields=a,b`` and ``?omit=c``.
+    With ``preview=True`` every field in ``Meta.preview_fields`` is swapped
+    for a truncated ``<field>_preview``. ``id`` is always kept.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, preview=False, **kwargs):
+        self.only_fields = set(fields or ())
+        self.omit_fields = set(omit or ())
+        self.preview = preview
+        super().__init__(*args, **kwargs)
+
+    def requested_fieldset(self):
+        only, omit = self.only_fields, self.omit_fields
+        request = self.context.get('request')
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is None and request is not None and request.method in SAFE_METHODS:
+            only = only or parse_field_list(request.query_params.get('fields'))
+            omit = omit or parse_field_list(request.query_params.get('omit'))
+        return only, omit
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.preview:
+            for name in getattr(self.Meta, 'preview_fields', ()):
+                if fields.pop(name, None) is not None:
+                    fields[name + PREVIEW_SUFFIX] = PreviewField(name)
+
+        only, omit = self.requested_fieldset()
+        if only:
+            fields = {
+                name: field for name, field in fields.items()
+                if name == 'id' or name in only or name.removesuffix(PREVIEW_SUFFIX) in only
+            }
+        for name in omit - {'id'}:
+            fields.pop(name, None)
+        return fields
+
+
+def trim_queryset(queryset, serializer):
+    """
+    Defer the columns ``serializer`` won't render and annotate the preview
+    fields with a SQL substring, so the full text never reaches Python.
+    Ordering columns stay loaded for the keyset paginator.
+    """
+    fields = serializer.fields
+    previews = {
+        name: Substr(field.text_field, 1, field.length + 1)
+        for name, field in fields.items() if isinstance(field, PreviewField)
+    }
+    if previews:
+        queryset = queryset.annotate(**previews)
+
+    opts = queryset.model._meta
+    used = {field.source.split('.')[0] for field in fields.values()}
+    used.update(name.lstrip('-') for name in (queryset.query.order_by or opts.ordering))
+    if isinstance(queryset.query.select_related, dict):
+        # A joined relation can't also be deferred.
+        used.update(queryset.query.select_related)
+    deferred = [
+        field.name for field in opts.concrete_fields
+        if not field.primary_key and field.name not in used and field.attname not in used
+    ]
+    return queryset.defer(*deferred) if deferred else queryset
+
+
+def preview_requested(request):
+    return (request.method in SAFE_METHODS
+            and request.query_params.get('preview', '').lower() in ('1', 'true', 'yes'))
+
+
+class SparseListMixin:
+    """
+    For list views: ``?preview=1`` selects the serializer's preview
+    representation, and the queryset only loads the columns rendered.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if preview_requested(self.request):
+            kwargs.setdefault('preview', True)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return trim_queryset(queryset, self.get_serializer())
@@ -0,0 +1,165 @@
+"""
+Bulk import of study sessions and notes from CSV or NDJSON files.
+
+The file is read a line at a time (gzip-compressed files too) and
+processed IMPORT_CHUNK_SIZE rows at a time: rows are validated with the
+model's API serializer, rows whose natural key is already stored or
+repeated are dropped, and the rest are written with ``bulk_create`` in
+one transaction per chunk, sending ``bulk_saved`` so the rollup, change
+log and dashboard follow. A bad row is reported by line number and does
+not stop the import; chunks already written stay written.
+
+Files written by api/export/ can be imported as they are: their ``model``
+column or key picks the rows of the model being imported, and read-only
+columns such as ``id`` are ignored.
+"""
+import csv
+import gzip
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from . import changelog, rollup
+from .archive import archive_of
+from .serializers import NoteSerializer, StudySessionSerializer
+from .signals import bulk_saved
+
+# Serializer and natural key for each model that can be imported.
+IMPORTERS = {
+    'study_sessions': (StudySessionSerializer, ('session_date', 'subject')),
+    'notes': (NoteSerializer, ('title', 'content')),
+}
+
+FORMATS = ('csv', 'ndjson')
+
+# Raised while reading a file that isn't gzip-compressed or UTF-8 text when
+# it should be. Chunks before the bad byte have been imported by then.
+UNREADABLE = (OSError, EOFError, UnicodeDecodeError)
+
+# Rows per INSERT statement.
+INSERT_BATCH_SIZE = 1000
+
+
+def guess_format(filename):
+    """``(format, gzipped)`` from a file name such as ``sessions.csv.gz``."""
+    name = filename.lower()
+    gzipped = name.endswith('.gz')
+    if gzipped:
+        name = name[:-3]
+    for format, extensions in (('csv', ('.csv',)), ('ndjson', ('.ndjson', '.jsonl'))):
+        if name.endswith(extensions):
+            return format, gzipped
+    return None, gzipped
+
+
+def read_rows(fileobj, format, gzipped=False):
+    """
+    ``(line, row)`` for each record in the binary file ``fileobj``; ``row``
+    is a dict, or None for a line that isn't a JSON object.
+    """
+    if gzipped:
+        fileobj = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    if format == 'csv':
+        yield from _csv_rows(text)
+    else:
+        yield from _ndjson_rows(text)
+
+
+def _csv_rows(text):
+    reader = csv.reader(text)
+    header = None
+    for cells in reader:
+        if not cells:
+            continue
+        if header is None or (header[0] == 'model' and cells[0] == 'model'):
+            # The first row is the header; export files start a new one per model.
+            header = cells
+            continue
+        yield reader.line_num, dict(zip(header, cells))
+
+
+def _ndjson_rows(text):
+    for line, raw in enumerate(text, 1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else None
+
+
+def import_rows(user, name, rows, chunk_size=None):
+    """
+    Import ``(line, row)`` pairs from ``read_rows`` as ``user``'s ``name``
+    objects; returns the report.
+    """
+    serializer_class, natural_key = IMPORTERS[name]
+    # Validates one row at a time, as a many=True serializer would.
+    serializer = serializer_class(context={'owner': user})
+    nullable = {field_name for field_name, field in serializer.fields.items()
+                if field.allow_null and not field.read_only}
+    report = {'model': name, 'rows': 0, 'created': 0, 'duplicates': 0, 'skipped': 0, 'failed': 0,
+              'errors': []}
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size or settings.IMPORT_CHUNK_SIZE))
+        if not chunk:
+            return report
+        report['rows'] += len(chunk)
+        instances = {}
+        for line, row in chunk:
+            if row is None:
+                _fail(report, line, {'non_field_errors': ['Not a JSON object.']})
+                continue
+            if row.get('model', name) != name:
+                report['skipped'] += 1
+                continue
+            if nullable:
+                row = {key: None if key in nullable and value == '' else value for key, value in row.items()}
+            try:
+                validated = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                _fail(report, line, exc.detail)
+                continue
+            instance = serializer_class.Meta.model(user=user, **validated)
+            key = tuple(getattr(instance, field) for field in natural_key)
+            if key in instances:
+                report['duplicates'] += 1
+            else:
+                instances[key] = instance
+        report['created'] += _insert(user, natural_key, instances, report)
+
+
+def _insert(user, natural_key, instances, report):
+    """Write the chunk's ``{natural key: instance}`` that aren't stored yet."""
+    if not instances:
+        return 0
+    model = next(iter(instances.values()))._meta.model
+    first = natural_key[0]
+    stored = set()
+    # Archived rows count as stored, so re-importing an export adds nothing.
+    for table in filter(None, (model, archive_of(model))):
+        stored.update(
+            table.objects.filter(user=user, **{f'{first}__in': {key[0] for key in instances}}).order_by()
+            .values_list(*natural_key)
+        )
+    fresh = [instance for key, instance in instances.items() if key not in stored]
+    report['duplicates'] += len(instances) - len(fresh)
+    if not fresh:
+        return 0
+    with transaction.atomic(), rollup.batched(), changelog.batched():
+        created = model.objects.bulk_create(fresh, batch_size=INSERT_BATCH_SIZE)
+        bulk_saved.send(sender=model, instances=created, created=True)
+    return len(created)
+
+
+def _fail(report, line, errors):
+    report['failed'] += 1
+    if len(report['errors']) < settings.IMPORT_MAX_ERRORS:
+        report['errors'].append({'line': line, 'errors': errors})
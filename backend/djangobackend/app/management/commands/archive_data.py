@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from app.archive import ARCHIVES, archive_rows
+
+
+class Command(BaseCommand):
+    help = ('Move completed daily plans, sent reminders and study sessions older than '
+            'ARCHIVE_AFTER_DAYS to the archive tables, in short batches.')
+
+    def add_arguments(self, parser):
+        names = [name for name, _ in ARCHIVES.values()]
+        parser.add_argument('--model', choices=names, action='append', dest='models',
+                            help='Only this model (repeatable).')
+        parser.add_argument('--days', type=int,
+                            help='Archive rows older than this many days instead of ARCHIVE_AFTER_DAYS.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, models=None, days=None, batch_size, pause, **options):
+        moved = []
+        for model, (name, _) in ARCHIVES.items():
+            if models and name not in models:
+                continue
+            count = archive_rows(model, days, batch_size=batch_size, pause=pause)
+            moved.append(f'{count} {name.replace("_", " ")}')
+        self.stdout.write(f'Archived {", ".join(moved)}.')
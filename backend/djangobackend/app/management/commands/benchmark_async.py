@@ -0,0 +1,120 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+
+from app.models import DailyPlan, Note, StudySession, UserDailyStats
+from app.rollup import rebuild_daily_stats
+
+ENDPOINTS = ('dashboard/', 'statistics/productivity/', 'statistics/study/range/', 'notes/?preview=1')
+
+
+def summary(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Compare the WSGI (threaded DRF views) and ASGI (api/async/ views) paths '
+            'in one process at a given concurrency. Seeds a throwaway user, removed afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and path.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--rows', type=int, default=500, help='Notes, plans and sessions seeded.')
+        parser.add_argument('--cache', action='store_true',
+                            help='Let the dashboard snapshot cache answer (default: rebuild every time).')
+
+    def handle(self, *args, **options):
+        user = self.seed(options['rows'])
+        try:
+            # A zero timeout makes every dashboard request rebuild the snapshot.
+            with override_settings(**({} if options['cache'] else {'DASHBOARD_CACHE_TIMEOUT': 0})):
+                results = {}
+                for endpoint in ENDPOINTS:
+                    results[endpoint] = {
+                        'wsgi': self.run_wsgi(user, f'/api/{endpoint}', options),
+                        'asgi': async_to_sync(self.run_asgi)(user, f'/api/async/{endpoint}', options),
+                    }
+        finally:
+            user.delete()
+        self.stdout.write(json.dumps({
+            'concurrency': options['concurrency'],
+            'rows': options['rows'],
+            'endpoints': results,
+        }, indent=2))
+
+    def seed(self, rows):
+        user = User.objects.create_user(username=f'benchmark-{time.time_ns()}')
+        now = timezone.now()
+        Note.objects.bulk_create(
+            [Note(user=user, title=f'note {i}', content='benchmark ' * 200) for i in range(rows)],
+            batch_size=500,
+        )
+        DailyPlan.objects.bulk_create(
+            [DailyPlan(user=user, title=f'plan {i}', planned_date=date.today() - timedelta(days=i % 30),
+                       is_completed=i % 3 == 0) for i in range(rows)],
+            batch_size=500,
+        )
+        StudySession.objects.bulk_create(
+            [StudySession(user=user, subject='math', duration_minutes=30,
+                          session_date=now - timedelta(hours=i)) for i in range(rows)],
+            batch_size=500,
+        )
+        rebuild_daily_stats(StudySession, DailyPlan, UserDailyStats, [user.pk])
+        return user
+
+    def run_wsgi(self, user, url, options):
+        # A threaded WSGI worker: one thread and one DB connection per
+        # concurrent request.
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(user)
+            started = time.perf_counter()
+            response = local.client.get(url)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started
+
+        def close(_):
+            connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            latencies = list(pool.map(request, range(options['requests'])))
+            list(pool.map(close, range(options['concurrency'])))
+        return summary(latencies, time.perf_counter() - started)
+
+    async def run_asgi(self, user, url, options):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        gate = asyncio.Semaphore(options['concurrency'])
+
+        async def request():
+            async with gate:
+                started = time.perf_counter()
+                response = await client.get(url)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(options['requests'])))
+        return summary(latencies, time.perf_counter() - started)
@@ -0,0 +1,83 @@
+import json
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from app.models import UserProfile
+from app.sessions import user_cache
+from app.tokens import issue_token, token_cache
+
+from .load_test import git_revision, summary
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}
+# Mode name, session engine (None for a bearer token) and whether the
+# authenticated user cache is on; 'db, uncached' is the old behaviour.
+MODES = (
+    ('db, uncached', 'db', False),
+    ('db', 'db', True),
+    ('cache', 'cache', True),
+    ('cookie', 'cookie', True),
+    ('token', None, True),
+)
+PATH = '/api/auth/user/'
+
+
+class Command(BaseCommand):
+    help = (f'Measure what authenticating costs per request: GET {PATH} through each session '
+            'mode and a bearer token, reporting latency percentiles and queries as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode.')
+        parser.add_argument('--output', help='Also write the report to this file.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive.')
+        user = User.objects.create_user(username=f'benchmark-{uuid.uuid4().hex[:8]}@example.com')
+        UserProfile.objects.create(user=user)
+        ttl = user_cache.ttl
+        try:
+            report = {name: self.measure(user, engine, ttl if cached else 0, options['requests'])
+                      for name, engine, cached in MODES}
+        finally:
+            user_cache.ttl = ttl
+            user.delete()
+
+        output = json.dumps({
+            'revision': git_revision(),
+            'requests_per_mode': options['requests'],
+            'modes': report,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+    def measure(self, user, engine, ttl, requests):
+        user_cache.clear()
+        token_cache.clear()
+        user_cache.ttl = ttl
+        with override_settings(SESSION_ENGINE=ENGINES[engine or 'db']):
+            if engine is None:
+                client = Client(headers={'Authorization': f'Bearer {issue_token(user, "benchmark")[1]}'})
+            else:
+                client = Client()
+                client.force_login(user)
+            samples = []
+            started = time.perf_counter()
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as queries:
+                    request_started = time.perf_counter()
+                    response = client.get(PATH)
+                    latency = time.perf_counter() - request_started
+                samples.append((latency, len(queries), response.status_code))
+            return summary(samples, time.perf_counter() - started)
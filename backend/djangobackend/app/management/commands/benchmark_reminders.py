@@ -0,0 +1,53 @@
+import json
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app import reminders
+from app.models import Reminder
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure dispatcher throughput on throwaway reminders (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10_000)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username=f'benchmark-{time.time_ns()}')
+                due = timezone.now() - timedelta(seconds=1)
+                Reminder.objects.bulk_create(
+                    [Reminder(user=user, title=f'r{i}', message='benchmark', reminder_time=due)
+                     for i in range(count)],
+                    batch_size=1000,
+                )
+                reminders.outbox.clear()
+                dispatcher = reminders.ReminderDispatcher(
+                    backend=reminders.LocMemBackend(), batch_size=options['batch_size']
+                )
+                started = time.perf_counter()
+                dispatcher.refresh()
+                sent = dispatcher.dispatch_due()
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        reminders.outbox.clear()
+        self.stdout.write(json.dumps({
+            'reminders': count,
+            'sent': sent,
+            'seconds': round(elapsed, 3),
+            'per_minute': round(sent / elapsed * 60) if elapsed else None,
+        }))
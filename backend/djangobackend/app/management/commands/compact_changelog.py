@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.changelog import compact_changelog
+
+
+class Command(BaseCommand):
+    help = ('Trim the sync change log: superseded entries, entries older than '
+            'SYNC_RETENTION_DAYS and entries of deleted users.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Log ids scanned per DELETE when collapsing superseded entries.')
+
+    def handle(self, *args, batch_size, **options):
+        superseded, expired, orphaned = compact_changelog(batch_size=batch_size)
+        self.stdout.write(
+            f'Removed {superseded} superseded, {expired} expired and {orphaned} orphaned entries.'
+        )
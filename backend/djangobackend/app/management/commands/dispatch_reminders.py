@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from app.reminders import ReminderDispatcher, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Send reminders as they fall due. Safe to run as several workers at once.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Send everything currently due and exit.')
+        parser.add_argument('--backend', help='Dotted path of the delivery backend (default: REMINDER_BACKEND).')
+        parser.add_argument('--batch-size', type=int, help='Reminders claimed per UPDATE.')
+        parser.add_argument('--horizon', type=int, help='Seconds of upcoming reminders to hold in memory.')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between scans for new or edited reminders.')
+
+    def handle(self, *args, **options):
+        dispatcher = ReminderDispatcher(
+            backend=get_backend(options['backend']),
+            batch_size=options['batch_size'],
+            horizon=timedelta(seconds=options['horizon']) if options['horizon'] else None,
+        )
+        try:
+            dispatcher.run(poll_interval=options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Sent {dispatcher.sent} reminders.')
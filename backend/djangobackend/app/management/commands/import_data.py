@@ -0,0 +1,38 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app.imports import FORMATS, IMPORTERS, UNREADABLE, guess_format, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Import study sessions or notes for one user from a CSV or NDJSON file '
+            '(optionally gzipped), as api/import/ does, and print the report as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username (email) to import for.')
+        parser.add_argument('--model', required=True, choices=list(IMPORTERS))
+        parser.add_argument('--format', choices=FORMATS, help='Default: from the file name.')
+        parser.add_argument('--chunk-size', type=int, help='Rows per transaction (default IMPORT_CHUNK_SIZE).')
+
+    def handle(self, *args, path, user, model, format, chunk_size, **options):
+        try:
+            owner = User.objects.get(username=user)
+        except User.DoesNotExist:
+            raise CommandError(f'No user {user!r}.')
+        guessed, gzipped = guess_format(path)
+        format = format or guessed
+        if format is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format.')
+
+        started = time.perf_counter()
+        with open(path, 'rb') as fh:
+            try:
+                report = import_rows(owner, model, read_rows(fh, format, gzipped), chunk_size)
+            except UNREADABLE as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+        report['seconds'] = round(time.perf_counter() - started, 1)
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,296 @@
+import json
+import math
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from app.changelog import encode_token
+from app.dashboard import invalidate_dashboard
+from app.models import AuthToken, Note, DailyPlan, StudySession, Goal, Reminder, UserProfile
+from app.tokens import issue_token
+
+# URL prefix, model and the body of a create for each collection.
+COLLECTIONS = {
+    'notes': (Note, {'title': 'Load test', 'content': 'Load test note ' * 40, 'category': 'study'}),
+    'daily-plans': (DailyPlan, {'title': 'Load test', 'planned_date': '{today}', 'priority': 'high'}),
+    'study-sessions': (StudySession, {'subject': 'Load test', 'duration_minutes': 25, 'rating': 4}),
+    'goals': (Goal, {'title': 'Load test', 'description': 'Load test goal', 'target_date': '{today}'}),
+    'reminders': (Reminder, {'title': 'Load test', 'message': 'Load test', 'reminder_time': '2099-01-01T09:00:00Z'}),
+}
+TOKEN_NAME = 'load test'
+IMPORT_SUBJECT = 'Load test import'
+
+# A body value sent as a file in multipart form data.
+Upload = namedtuple('Upload', 'name content')
+# Imported again on every request, so all but the first find duplicates.
+IMPORT_FILE = Upload('load-test.csv', 'subject,duration_minutes,session_date\n' + ''.join(
+    f'{IMPORT_SUBJECT},25,{{today}}T{hour:02d}:00:00Z\n' for hour in range(24)))
+
+READS = (
+    'csrf-token/', 'auth/user/', 'auth/tokens/', 'dashboard/', 'notes/search/?q=review',
+    'statistics/study/', 'statistics/study/range/?granularity=week', 'statistics/productivity/',
+    'statistics/productivity/range/', 'daily-plans/next/', 'calendar/?start={grid_start}&end={grid_end}',
+    'sync/', 'sync/?since={token}', 'export/',
+    'daily-plans/?include_archived=1', 'study-sessions/?include_archived=1', 'reminders/?include_archived=1',
+    'async/dashboard/', 'async/notes/', 'async/daily-plans/', 'async/study-sessions/', 'async/goals/',
+    'async/reminders/', 'async/statistics/study/', 'async/statistics/study/range/?granularity=month',
+    'async/statistics/productivity/', 'async/statistics/productivity/range/',
+    'async/calendar/?start={grid_start}&end={grid_end}',
+)
+
+
+def avatar():
+    buffer = BytesIO()
+    Image.effect_noise((512, 512), 60).convert('RGB').save(buffer, 'JPEG', quality=90)
+    return Upload('load-test.jpg', buffer.getvalue())
+
+
+def routes():
+    """``(method, path, body)`` for every route in app/urls.py, in run order."""
+    yield from (('GET', path, None) for path in READS)
+    for prefix, (_, body) in COLLECTIONS.items():
+        yield 'GET', f'{prefix}/', None
+        yield 'GET', f'{prefix}/?preview=1', None
+        yield 'GET', f'{prefix}/{{{prefix}}}/', None
+        yield 'POST', f'{prefix}/', body
+        yield 'PATCH', f'{prefix}/{{created}}/', {'title': 'Load test, edited'}
+        yield 'DELETE', f'{prefix}/{{created}}/', None
+    yield 'POST', 'daily-plans/{created}/move/', {'before': '{daily-plans}'}
+    for prefix in ('daily-plans', 'study-sessions'):
+        yield 'POST', f'{prefix}/bulk/', {'create': [COLLECTIONS[prefix][1]] * 10}
+    yield 'POST', 'import/', {'model': 'study_sessions', 'file': IMPORT_FILE}
+    yield 'POST', 'auth/user/avatar/', {'avatar': avatar()}
+    yield 'DELETE', 'auth/user/avatar/', None
+    yield 'POST', 'auth/register/', {'email': '{email}', 'password': 'load-test-pw',
+                                     'password_confirm': 'load-test-pw', 'name': 'Load Test'}
+    yield 'POST', 'auth/login/', {'email': '{username}', 'password': '{password}'}
+    yield 'POST', 'auth/tokens/', {'email': '{username}', 'password': '{password}', 'name': TOKEN_NAME}
+    yield 'POST', 'auth/tokens/rotate/', None
+    yield 'DELETE', 'auth/tokens/{auth_token}/', None
+    yield 'POST', 'auth/logout/', None
+
+
+def fill(value, params):
+    if isinstance(value, str):
+        return value.format(**params)
+    if isinstance(value, dict):
+        return {key: fill(item, params) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, params) for item in value]
+    return value
+
+
+def percentile(ordered, pct):
+    return ordered[max(0, math.ceil(len(ordered) * pct / 100) - 1)]
+
+
+def summary(samples, elapsed):
+    latencies = sorted(latency for latency, _, _ in samples)
+    queries = [queries for _, queries, _ in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 400),
+        'seconds': round(elapsed, 3),
+        'per_second': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Drive every API route in-process through logged-in sessions of users made by '
+            'seed_focusmate, and report latency percentiles, throughput and queries per '
+            'request as JSON. Rows the run creates are removed afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route.')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Worker threads, each with its own session and DB connection.')
+        parser.add_argument('--prefix', default='seed', help='The seed_focusmate --prefix to log in as.')
+        parser.add_argument('--password', default='focusmate-seed')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Only routes whose path starts with this (repeatable).')
+        parser.add_argument('--cache', action='store_true',
+                            help='Let the dashboard snapshot cache answer (default: rebuild every time).')
+        parser.add_argument('--output', help='Also write the report to this file.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+        users = list(User.objects.filter(
+            username__startswith=options['prefix'], username__endswith='@example.com',
+            first_name=options['prefix'],
+        ).order_by('pk')[:options['concurrency']])
+        if not users:
+            raise CommandError(f"No users with prefix {options['prefix']!r}; run seed_focusmate first.")
+
+        self.options = options
+        self.users = users
+        self.local = threading.local()
+        self.sessions = count()
+        self.run_id = uuid.uuid4().hex[:8]
+        self.registered = count()
+        self.lock = threading.Lock()
+        # Rows made by POSTs, per (collection, user) for the PATCH and DELETE
+        # routes, and all of them per collection for the clean-up.
+        self.created = defaultdict(list)
+        self.created_ids = defaultdict(list)
+        self.existing = {
+            prefix: dict(model.objects.filter(user__in=users).values_list('user_id', 'pk').order_by('pk'))
+            for prefix, (model, _) in COLLECTIONS.items()
+        }
+
+        selected = [
+            route for route in routes()
+            if not options['routes'] or any(route[1].startswith(prefix) for prefix in options['routes'])
+        ]
+        rows_per_user = {
+            prefix: model.objects.filter(user=users[0]).count() for prefix, (model, _) in COLLECTIONS.items()
+        }
+        report = {}
+        pool = ThreadPoolExecutor(options['concurrency']) if options['concurrency'] > 1 else None
+        try:
+            for method, path, body in selected:
+                report[f'{method} {path}'] = self.run_route(pool, method, path, body)
+        finally:
+            if pool is not None:
+                list(pool.map(lambda _: connection.close(), range(options['concurrency'])))
+                pool.shutdown()
+            self.clean_up()
+
+        result = {
+            'revision': git_revision(),
+            'concurrency': options['concurrency'],
+            'requests_per_route': options['requests'],
+            'users': len(users),
+            'rows_per_user': rows_per_user,
+            'routes': report,
+        }
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+    def session(self):
+        """This thread's logged-in client and user."""
+        if not hasattr(self.local, 'client'):
+            user = self.users[next(self.sessions) % len(self.users)]
+            client = Client()
+            if not client.login(username=user.username, password=self.options['password']):
+                raise CommandError(f'Cannot log in as {user.username}; check --password.')
+            self.local.client, self.local.user = client, user
+        return self.local.client, self.local.user
+
+    def params(self, user):
+        # The 6-week month grid holding today, starting on a Monday.
+        first = date.today().replace(day=1)
+        grid_start = first - timedelta(days=first.weekday())
+        return {
+            'today': date.today().isoformat(), 'token': encode_token(0), 'password': self.options['password'],
+            'grid_start': grid_start.isoformat(), 'grid_end': (grid_start + timedelta(days=41)).isoformat(),
+            'username': user.username, 'email': f'loadtest-{self.run_id}-{next(self.registered)}@example.com',
+            **{key: self.existing[key].get(user.pk, 0) for key in COLLECTIONS},
+        }
+
+    def run_route(self, pool, method, path, body):
+        def request(_):
+            client, user = self.session()
+            prefix = path.split('/')[0]
+            if '{created}' in path and not self.created[prefix, user.pk]:
+                # Jobs don't land on the same threads as the POSTs did;
+                # make a row for this user outside the measurement.
+                create = client.post(f'/api/{prefix}/', fill(COLLECTIONS[prefix][1], self.params(user)),
+                                     content_type='application/json')
+                self.record_created(prefix, user, path, create.json())
+            params = dict(self.params(user), created=self.take_created(prefix, user, pop=method == 'DELETE'))
+            if path == 'auth/logout/':
+                # Log out a throwaway session, not this thread's.
+                client = Client()
+                client.force_login(user)
+            elif path == 'auth/tokens/rotate/':
+                client = Client(headers={'Authorization': f'Bearer {issue_token(user, TOKEN_NAME)[1]}'})
+            elif path == 'auth/tokens/{auth_token}/':
+                params['auth_token'] = issue_token(user, TOKEN_NAME)[0].pk
+            if path.endswith('dashboard/') and not self.options['cache']:
+                invalidate_dashboard(user.pk)
+            if body is None:
+                kwargs = {}
+            elif any(isinstance(value, Upload) for value in body.values()):
+                kwargs = {'data': {key: self.upload(value, params) if isinstance(value, Upload) else value
+                                   for key, value in body.items()}}
+            else:
+                kwargs = {'data': json.dumps(fill(body, params)), 'content_type': 'application/json'}
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method.lower())('/api/' + fill(path, params), **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latency = time.perf_counter() - started
+            if method == 'POST' and response.status_code < 400 and prefix in COLLECTIONS:
+                self.record_created(prefix, user, path, response.json())
+            return latency, len(queries), response.status_code
+
+        started = time.perf_counter()
+        jobs = range(self.options['requests'])
+        samples = list(pool.map(request, jobs)) if pool is not None else [request(job) for job in jobs]
+        return summary(samples, time.perf_counter() - started)
+
+    def upload(self, value, params):
+        content = value.content
+        if isinstance(content, str):
+            content = fill(content, params).encode()
+        return SimpleUploadedFile(value.name, content)
+
+    def record_created(self, prefix, user, path, data):
+        with self.lock:
+            if path.endswith('bulk/'):
+                self.created_ids[prefix].extend(item['id'] for item in data['create'])
+            else:
+                self.created[prefix, user.pk].append(data['id'])
+                self.created_ids[prefix].append(data['id'])
+
+    def take_created(self, prefix, user, pop):
+        with self.lock:
+            rows = self.created[prefix, user.pk]
+            if not rows:
+                return 0
+            return rows.pop() if pop else rows[-1]
+
+    def clean_up(self):
+        for prefix, (model, _) in COLLECTIONS.items():
+            ids = self.created_ids[prefix]
+            for start in range(0, len(ids), 500):
+                model.objects.filter(pk__in=ids[start:start + 500]).delete()
+        StudySession.objects.filter(user__in=self.users, subject=IMPORT_SUBJECT).delete()
+        # The uploaded file itself is kept: stored avatars may be shared.
+        UserProfile.objects.filter(user__in=self.users, avatar__startswith='avatars/').update(
+            avatar=None, avatar_variants={})
+        AuthToken.objects.filter(user__in=self.users, name=TOKEN_NAME).delete()
+        User.objects.filter(username__startswith=f'loadtest-{self.run_id}-').delete()
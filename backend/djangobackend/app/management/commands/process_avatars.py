@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app import avatars
+
+
+class Command(BaseCommand):
+    help = ('Make the resized variants of newly uploaded avatars. Safe to run as several '
+            'workers at once; an avatar two workers pick up is written the same way twice.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Process every pending avatar and exit.')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between looks for new uploads.')
+
+    def handle(self, *args, **options):
+        processed = 0
+        try:
+            processed = avatars.run(poll_interval=options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Processed {processed} avatars.')
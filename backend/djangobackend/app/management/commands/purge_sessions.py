@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from app.sessions import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = ('Delete expired sessions in batches; unlike clearsessions, never holds the '
+            'write lock for one large DELETE.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, batch_size, pause, **options):
+        deleted = purge_expired_sessions(batch_size=batch_size, pause=pause)
+        if deleted is None:
+            self.stdout.write('Sessions are not stored in the database; nothing to purge.')
+        else:
+            self.stdout.write(f'Removed {deleted} expired sessions.')
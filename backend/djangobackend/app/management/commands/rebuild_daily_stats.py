@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import (
+    DailyPlan, StudySession, UserDailyStats, CompletionStreak, ArchivedDailyPlan, ArchivedStudySession,
+)
+from app.rollup import STAT_FIELDS, compute_daily_stats, rebuild_daily_stats, stored_daily_stats
+from app.streaks import compute_streaks, rebuild_streaks, stored_streaks
+
+
+class Command(BaseCommand):
+    help = ('Backfill the UserDailyStats rollup from raw sessions and plans, and the completion '
+            'streaks from the rollup, or verify them.')
+    # Archived rows still count towards the rollup.
+    archive_models = (ArchivedStudySession, ArchivedDailyPlan)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only this user id (repeatable).')
+        parser.add_argument('--verify', action='store_true',
+                            help='Compare the rollup with the raw tables instead of rebuilding it.')
+
+    def handle(self, *args, users=None, verify=False, **options):
+        if not verify:
+            count = rebuild_daily_stats(StudySession, DailyPlan, UserDailyStats, users,
+                                        archive_models=self.archive_models)
+            streaks = rebuild_streaks(UserDailyStats, CompletionStreak, users)
+            self.stdout.write(f'Rebuilt {count} daily stats rows and {streaks} streaks.')
+            return
+
+        expected = compute_daily_stats(StudySession, DailyPlan, users, self.archive_models)
+        stored = stored_daily_stats(UserDailyStats, users)
+        zero = dict.fromkeys(STAT_FIELDS, 0)
+        mismatches = [
+            (key, expected.get(key, zero), stored.get(key, zero))
+            for key in sorted(set(expected) | set(stored))
+            if dict(expected.get(key, zero)) != stored.get(key, zero)
+        ]
+        for (user_id, day), want, have in mismatches[:50]:
+            self.stdout.write(f'user {user_id} {day}: expected {dict(want)}, stored {have}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} daily stats rows are out of date; '
+                               f'run rebuild_daily_stats to fix them.')
+        if compute_streaks(UserDailyStats, users) != stored_streaks(CompletionStreak, users):
+            raise CommandError('The completion streaks are out of date; run rebuild_daily_stats to fix them.')
+        self.stdout.write(f'Verified {len(stored)} daily stats rows.')
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyplan',
+            index=models.Index(fields=['user', 'planned_date', '-priority', 'is_completed', 'created_at'], name='plan_user_date_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyplan',
+            index=models.Index(fields=['user', '-priority', 'is_completed', 'created_at'], name='plan_user_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', 'target_date', '-created_at'], name='goal_user_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', 'status'], name='goal_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', '-is_pinned', '-updated_at'], name='note_user_pinned_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_pinned', True)), fields=['user', '-updated_at'], name='note_user_pinned_only_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['user', 'reminder_time'], name='reminder_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('is_sent', False)), fields=['user', 'reminder_time'], name='reminder_user_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studysession',
+            index=models.Index(fields=['user', '-session_date'], name='session_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from app.search import drop_note_index, install_note_index
+
+
+def create_index(apps, schema_editor):
+    install_note_index(schema_editor.connection)
+
+
+def remove_index(apps, schema_editor):
+    drop_note_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, remove_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pending(apps, schema_editor):
+    # Avatars uploaded before variants existed get processed like new ones.
+    UserProfile = apps.get_model('app', 'UserProfile')
+    UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True).update(avatar_variants=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_auth_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('avatar_variants__isnull', True)), fields=['avatar'], name='profile_avatar_pending_idx'),
+        ),
+        migrations.RunPython(mark_pending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_avatar_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDailyPlan',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='medium', max_length=10)),
+                ('is_completed', models.BooleanField(default=False)),
+                ('planned_date', models.DateField()),
+                ('estimated_duration', models.PositiveIntegerField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_daily_plans', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-priority', 'is_completed', 'created_at'],
+                'indexes': [models.Index(fields=['user', 'planned_date', '-priority', 'is_completed', 'created_at'], name='archive_plan_user_date_idx'), models.Index(fields=['user', '-priority', 'is_completed', 'created_at'], name='archive_plan_user_order_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedReminder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('reminder_time', models.DateTimeField()),
+                ('is_sent', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['reminder_time'],
+                'indexes': [models.Index(fields=['user', 'reminder_time'], name='archive_reminder_user_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedStudySession',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=100)),
+                ('duration_minutes', models.PositiveIntegerField()),
+                ('notes', models.TextField(blank=True)),
+                ('rating', models.PositiveIntegerField(blank=True, choices=[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5)], null=True)),
+                ('session_date', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_study_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-session_date'],
+                'indexes': [models.Index(fields=['user', '-session_date'], name='archive_session_user_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from app.streaks import rebuild_streaks
+
+
+def backfill(apps, schema_editor):
+    rebuild_streaks(apps.get_model('app', 'UserDailyStats'), apps.get_model('app', 'CompletionStreak'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_archive_tables'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionStreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField()),
+                ('end', models.DateField()),
+                ('days', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completion_streaks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['user', 'end'], name='streak_user_end_idx'), models.Index(fields=['user', '-days'], name='streak_user_days_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'start'), name='streak_user_start_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:57
+
+import app.models
+from django.conf import settings
+from django.db import migrations, models
+
+# Existing plans keep their order: the position of a plan is its creation
+# time in microseconds, as for new ones (app.models.default_position).
+POSITION_FROM_CREATED_AT = (
+    'UPDATE {table} SET position = CAST((julianday(created_at) - 2440587.5) * 86400000000 AS INTEGER)'
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_completion_streaks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='archiveddailyplan',
+            options={'ordering': ['-priority_rank', 'is_completed', 'position']},
+        ),
+        migrations.AlterModelOptions(
+            name='dailyplan',
+            options={'ordering': ['-priority_rank', 'is_completed', 'position']},
+        ),
+        migrations.RemoveIndex(
+            model_name='archiveddailyplan',
+            name='archive_plan_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='archiveddailyplan',
+            name='archive_plan_user_order_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='dailyplan',
+            name='plan_user_date_order_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='dailyplan',
+            name='plan_user_order_idx',
+        ),
+        migrations.AddField(
+            model_name='archiveddailyplan',
+            name='position',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archiveddailyplan',
+            name='priority_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(priority='low', then=models.Value(1)), models.When(priority='medium', then=models.Value(2)), models.When(priority='high', then=models.Value(3)), default=models.Value(0)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='dailyplan',
+            name='position',
+            field=models.BigIntegerField(default=app.models.default_position),
+        ),
+        migrations.AddField(
+            model_name='dailyplan',
+            name='priority_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(priority='low', then=models.Value(1)), models.When(priority='medium', then=models.Value(2)), models.When(priority='high', then=models.Value(3)), default=models.Value(0)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddailyplan',
+            index=models.Index(fields=['user', 'planned_date', '-priority_rank', 'is_completed', 'position'], name='archive_plan_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddailyplan',
+            index=models.Index(fields=['user', '-priority_rank', 'is_completed', 'position'], name='archive_plan_user_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyplan',
+            index=models.Index(fields=['user', 'planned_date', '-priority_rank', 'is_completed', 'position'], name='plan_user_date_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyplan',
+            index=models.Index(fields=['user', '-priority_rank', 'is_completed', 'position'], name='plan_user_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyplan',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['user', '-priority_rank', 'position'], name='plan_user_open_idx'),
+        ),
+        migrations.RunSQL(POSITION_FROM_CREATED_AT.format(table='app_dailyplan'), migrations.RunSQL.noop),
+        migrations.RunSQL(POSITION_FROM_CREATED_AT.format(table='app_archiveddailyplan'), migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_plan_priority_rank_position'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archiveddailyplan',
+            index=models.Index(fields=['user', 'updated_at'], name='archive_plan_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreminder',
+            index=models.Index(fields=['user', 'updated_at'], name='archive_reminder_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedstudysession',
+            index=models.Index(fields=['user', 'updated_at'], name='archive_session_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyplan',
+            index=models.Index(fields=['user', 'updated_at'], name='plan_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', 'updated_at'], name='goal_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['user', 'updated_at'], name='reminder_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studysession',
+            index=models.Index(fields=['user', 'updated_at'], name='session_user_updated_idx'),
+        ),
+    ]
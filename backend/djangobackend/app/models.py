@@ -1,3 +1,5 @@
+import time
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -10,9 +12,21 @@ class UserProfile(models.Model):
     location = models.CharField(max_length=30, blank=True)
     birth_date = models.DateField(null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # {size: {format: storage name}} of the resized avatars; NULL while
+    # process_avatars hasn't made them yet (see app/avatars.py).
+    avatar_variants = models.JSONField(default=dict, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['avatar'],
+                name='profile_avatar_pending_idx',
+                condition=models.Q(avatar_variants__isnull=True),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
@@ -36,11 +50,38 @@ class Note(models.Model):
 
     class Meta:
         ordering = ['-is_pinned', '-updated_at']
+        indexes = [
+            models.Index(fields=['user', '-is_pinned', '-updated_at'], name='note_user_pinned_updated_idx'),
+            models.Index(
+                fields=['user', '-updated_at'],
+                name='note_user_pinned_only_idx',
+                condition=models.Q(is_pinned=True),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+PRIORITY_RANKS = {'low': 1, 'medium': 2, 'high': 3}
+
+
+def default_position():
+    # Microseconds since the epoch: new plans go last (see app/positions.py).
+    return time.time_ns() // 1000
+
+
+def priority_rank():
+    return models.GeneratedField(
+        expression=models.Case(
+            *[models.When(priority=priority, then=models.Value(rank)) for priority, rank in PRIORITY_RANKS.items()],
+            default=models.Value(0),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+
+
 class DailyPlan(models.Model):
     PRIORITY_CHOICES = [
         ('low', 'Low'),
@@ -52,6 +93,10 @@ class DailyPlan(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
+    # ``priority`` as a number for ordering; the strings sort medium > low > high.
+    priority_rank = priority_rank()
+    # Manual order among plans of the same priority.
+    position = models.BigIntegerField(default=default_position)
     is_completed = models.BooleanField(default=False)
     planned_date = models.DateField(default=timezone.now)
     estimated_duration = models.PositiveIntegerField(help_text="Duration in minutes", null=True, blank=True)
@@ -60,7 +105,22 @@ class DailyPlan(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-priority', 'is_completed', 'created_at']
+        ordering = ['-priority_rank', 'is_completed', 'position']
+        indexes = [
+            models.Index(
+                fields=['user', 'planned_date', '-priority_rank', 'is_completed', 'position'],
+                name='plan_user_date_order_idx',
+            ),
+            models.Index(fields=['user', '-priority_rank', 'is_completed', 'position'], name='plan_user_order_idx'),
+            # daily-plans/next/: open plans across all days, in list order.
+            models.Index(
+                fields=['user', '-priority_rank', 'position'],
+                name='plan_user_open_idx',
+                condition=models.Q(is_completed=False),
+            ),
+            # The list ETag's COUNT/MAX(updated_at), read from the index alone.
+            models.Index(fields=['user', 'updated_at'], name='plan_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.planned_date}"
@@ -74,9 +134,15 @@ class StudySession(models.Model):
     rating = models.PositiveIntegerField(choices=[(i, i) for i in range(1, 6)], null=True, blank=True)
     session_date = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-session_date']
+        indexes = [
+            models.Index(fields=['user', '-session_date'], name='session_user_date_idx'),
+            # The list ETag's COUNT/MAX(updated_at), read from the index alone.
+            models.Index(fields=['user', 'updated_at'], name='session_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.subject} - {self.duration_minutes} mins"
@@ -101,6 +167,12 @@ class Goal(models.Model):
 
     class Meta:
         ordering = ['target_date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', 'target_date', '-created_at'], name='goal_user_target_idx'),
+            models.Index(fields=['user', 'status'], name='goal_user_status_idx'),
+            # The list ETag's COUNT/MAX(updated_at), read from the index alone.
+            models.Index(fields=['user', 'updated_at'], name='goal_user_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -113,9 +185,217 @@ class Reminder(models.Model):
     reminder_time = models.DateTimeField()
     is_sent = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['reminder_time']
+        indexes = [
+            models.Index(fields=['user', 'reminder_time'], name='reminder_user_time_idx'),
+            models.Index(
+                fields=['user', 'reminder_time'],
+                name='reminder_user_pending_idx',
+                condition=models.Q(is_sent=False),
+            ),
+            # Used by the dispatcher (app/reminders.py): due rows across all
+            # users, and rows created or edited since its last look.
+            models.Index(
+                fields=['reminder_time'],
+                name='reminder_pending_idx',
+                condition=models.Q(is_sent=False),
+            ),
+            models.Index(fields=['updated_at'], name='reminder_updated_idx'),
+            # The list ETag's COUNT/MAX(updated_at), read from the index alone.
+            models.Index(fields=['user', 'updated_at'], name='reminder_user_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.reminder_time}"
+
+
+class UserDailyStats(models.Model):
+    """
+    Per-user, per-day rollup of study sessions and daily plans.
+
+    Maintained incrementally by the signal handlers in app/rollup.py so
+    statistics read O(days) rows instead of every session and plan ever
+    written. ``python manage.py rebuild_daily_stats`` backfills and verifies it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    session_count = models.IntegerField(default=0)
+    study_minutes = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    plans_total = models.IntegerField(default=0)
+    plans_completed = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='daily_stats_user_date_uniq'),
+        ]
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
+
+    def __str__(self):
+        return f"{self.user} - {self.date}"
+
+
+class CompletionStreak(models.Model):
+    """
+    A run of consecutive days on which the user completed at least one daily
+    plan. Kept in step with UserDailyStats by app/streaks.py, so the current
+    and longest streaks are each one index lookup however long they are.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='completion_streaks')
+    start = models.DateField()
+    end = models.DateField()
+    days = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['start']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'start'], name='streak_user_start_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'end'], name='streak_user_end_idx'),
+            models.Index(fields=['user', '-days'], name='streak_user_days_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.start} to {self.end}"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One row per save or delete of a user's synced objects, written by the
+    signal handlers in app/changelog.py. The auto-increment id is the sync
+    position; ``python manage.py compact_changelog`` trims old entries.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Upsert'),
+        (DELETE, 'Delete'),
+    ]
+
+    # No FK constraint: entries for a user's objects are logged while the
+    # user row itself is being deleted. Compaction removes the orphans.
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='changelog_user_id_idx'),
+            models.Index(fields=['user', 'model', 'object_id'], name='changelog_object_idx'),
+            models.Index(fields=['created_at'], name='changelog_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model} {self.object_id}"
+
+
+class AuthToken(models.Model):
+    """
+    A bearer token for scripted clients, issued by ``POST /api/auth/tokens/``.
+    Only the SHA-256 of the token is stored; tokens are long random strings,
+    so a fast hash is enough and checking one costs no password hashing.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='auth_tokens')
+    key_hash = models.CharField(max_length=64, unique=True)
+    # The token's first characters, so users can tell their tokens apart.
+    prefix = models.CharField(max_length=8)
+    name = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.prefix}…"
+
+
+# Archive tables. ``python manage.py archive_data`` moves old completed
+# plans, sent reminders and study sessions here (see app/archive.py), keeping
+# their ids and every column, so the hot tables only hold rows in active use.
+
+class ArchivedDailyPlan(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_daily_plans')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    priority = models.CharField(max_length=10, choices=DailyPlan.PRIORITY_CHOICES, default='medium')
+    priority_rank = priority_rank()
+    position = models.BigIntegerField(default=0)
+    is_completed = models.BooleanField(default=False)
+    planned_date = models.DateField()
+    estimated_duration = models.PositiveIntegerField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-priority_rank', 'is_completed', 'position']
+        indexes = [
+            models.Index(
+                fields=['user', 'planned_date', '-priority_rank', 'is_completed', 'position'],
+                name='archive_plan_user_date_idx',
+            ),
+            models.Index(fields=['user', '-priority_rank', 'is_completed', 'position'], name='archive_plan_user_order_idx'),
+            models.Index(fields=['user', 'updated_at'], name='archive_plan_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.planned_date}"
+
+
+class ArchivedStudySession(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_study_sessions')
+    subject = models.CharField(max_length=100)
+    duration_minutes = models.PositiveIntegerField()
+    notes = models.TextField(blank=True)
+    rating = models.PositiveIntegerField(choices=[(i, i) for i in range(1, 6)], null=True, blank=True)
+    session_date = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-session_date']
+        indexes = [
+            models.Index(fields=['user', '-session_date'], name='archive_session_user_date_idx'),
+            models.Index(fields=['user', 'updated_at'], name='archive_session_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} - {self.duration_minutes} mins"
+
+
+class ArchivedReminder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_reminders')
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    reminder_time = models.DateTimeField()
+    is_sent = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
 
     class Meta:
         ordering = ['reminder_time']
+        indexes = [
+            models.Index(fields=['user', 'reminder_time'], name='archive_reminder_user_time_idx'),
+            models.Index(fields=['user', 'updated_at'], name='archive_reminder_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.reminder_time}"
@@ -0,0 +1,197 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on every field of the queryset's ordering (the
+    model's ``Meta.ordering`` unless the view sets one), with ``id`` appended
+    as the final tie-breaker.
+
+    DRF's ``CursorPagination`` positions on the first ordering field only and
+    falls back to OFFSET for ties, which degrades badly on orderings such as
+    ``-is_pinned`` for notes. Here the cursor holds the full sort key of the
+    boundary row and each page is read with index seeks: the "rows after key"
+    condition is split into one query per ordering column (equal prefix plus
+    a strict range on the next column), taken deepest first until the page is
+    full. Every query is an equality prefix and one range on a composite
+    index, so latency does not depend on how deep the client has paged and
+    rows inserted concurrently never shift or duplicate page boundaries.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'MAX_PAGE_SIZE', 200)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position, reverse = self.start(queryset, request)
+        return self.finish(self.fetch(queryset, position, reverse, self.page_size + 1), position, reverse)
+
+    async def apaginate_queryset(self, queryset, request):
+        position, reverse = self.start(queryset, request)
+        return self.finish(await self.afetch(queryset, position, reverse, self.page_size + 1), position, reverse)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """Paginate querysets of models with the same ordering as one list."""
+        position, reverse = self.start(querysets[0], request)
+        pages = [self.fetch(queryset, position, reverse, self.page_size + 1) for queryset in querysets]
+        return self.finish(self.merge(pages, reverse), position, reverse)
+
+    async def apaginate_querysets(self, querysets, request):
+        position, reverse = self.start(querysets[0], request)
+        pages = [await self.afetch(queryset, position, reverse, self.page_size + 1) for queryset in querysets]
+        return self.finish(self.merge(pages, reverse), position, reverse)
+
+    def start(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+        return self.decode_cursor(request)
+
+    def finish(self, rows, position, reverse):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = self.sort_key(rows[-1]) if rows and has_next else None
+        self.previous_position = self.sort_key(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_link(self.next_position, reverse=False),
+            'previous': self.get_link(self.previous_position, reverse=True),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            ordering.append('id')
+        return ordering
+
+    def page_queries(self, queryset, position, reverse):
+        """The queries to read, in order, until a page is full."""
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is None:
+            yield queryset
+            return
+
+        for depth in reversed(range(len(ordering))):
+            filters = dict(self.equal_filter(i, position[i]) for i in range(depth))
+            name = ordering[depth]
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            filters[f'{name.lstrip("-")}__{lookup}'] = position[depth]
+            yield queryset.filter(**filters)
+
+    def fetch(self, queryset, position, reverse, limit):
+        rows = []
+        for query in self.page_queries(queryset, position, reverse):
+            rows.extend(query[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+        return rows
+
+    async def afetch(self, queryset, position, reverse, limit):
+        rows = []
+        for query in self.page_queries(queryset, position, reverse):
+            rows.extend([row async for row in query[:limit - len(rows)]])
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def merge(self, pages, reverse):
+        """
+        The rows of several pages in page order. A row read from two tables
+        (moved between the queries) is kept once.
+        """
+        if len(pages) == 1:
+            return pages[0]
+        rows = list({row.pk: row for page in reversed(pages) for row in page}.values())
+        # Stable sorts from the last ordering column to the first; NULLs sort
+        # first ascending, as in SQLite.
+        for name, field in reversed(list(zip(self.ordering, self.fields))):
+            rows.sort(
+                key=lambda row: (getattr(row, field.attname) is not None, getattr(row, field.attname)),
+                reverse=name.startswith('-') != reverse,
+            )
+        return rows
+
+    def equal_filter(self, index, value):
+        field = self.fields[index]
+        # Django renders ``flag=False`` as ``NOT flag``, which SQLite cannot
+        # match against an index column; ``flag IN (?)`` is an index equality.
+        if isinstance(field, BooleanField):
+            return f'{field.name}__in', [value]
+        return field.name, value
+
+    def sort_key(self, instance):
+        return [getattr(instance, field.attname) for field in self.fields]
+
+    def encode_cursor(self, position, reverse):
+        values = [
+            value.isoformat() if isinstance(value, (date, datetime)) else value
+            for value in position
+        ]
+        payload = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
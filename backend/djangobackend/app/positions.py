@@ -0,0 +1,61 @@
+"""
+Manual ordering of daily plans.
+
+Plans are listed by ``priority_rank``, open before completed, then by
+``position``. A new plan's position is the time it was created in
+microseconds, so it goes last and consecutive plans are usually far apart.
+Moving a plan gives it the midpoint of its new neighbours' positions,
+which rewrites that one row. Only when the neighbours are adjacent
+integers are the positions up to the lower one lowered by GAP, in one
+UPDATE; lowering rather than raising keeps every position below the clock,
+so new plans still go last. The shifted plans get a new ``updated_at`` and
+change log entries like the moved one, so ETags and sync clients see them.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import changelog
+from .models import ChangeLogEntry, DailyPlan, default_position
+
+# Room opened up when two neighbours have no position left between them.
+GAP = 1_000_000
+
+
+def _key_before(plan):
+    """Filter for plans ordered before ``plan`` by ``(position, id)``."""
+    return Q(position__lt=plan.position) | Q(position=plan.position, pk__lt=plan.pk)
+
+
+def move_plan(plan, after=None, before=None):
+    """
+    Give ``plan`` a position right after ``after`` or right before
+    ``before``, another of the user's plans, and save it.
+    """
+    others = DailyPlan.objects.filter(user_id=plan.user_id).exclude(pk=plan.pk)
+    # Part of the caller's transaction when there is one.
+    with transaction.atomic(savepoint=False), changelog.batched():
+        if after is not None:
+            lower = after
+            upper = others.exclude(_key_before(after)).exclude(pk=after.pk).order_by('position', 'pk').first()
+        else:
+            upper = before
+            lower = others.filter(_key_before(before)).order_by('-position', '-pk').first()
+
+        if lower is None:
+            position = upper.position - GAP
+        elif upper is None:
+            position = max(lower.position + 1, default_position())
+        else:
+            if upper.position - lower.position < 2:
+                head = others.filter(_key_before(lower) | Q(pk=lower.pk))
+                shifted = list(head.values_list('pk', flat=True))
+                head.update(position=F('position') - GAP, updated_at=timezone.now())
+                changelog.log_changes(
+                    [DailyPlan(pk=pk, user_id=plan.user_id) for pk in shifted], ChangeLogEntry.UPSERT)
+                lower.position -= GAP
+            position = (lower.position + upper.position) // 2
+
+        plan.position = position
+        plan.save(update_fields=['position', 'updated_at'])
+    return plan
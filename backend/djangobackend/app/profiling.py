@@ -0,0 +1,192 @@
+"""
+Per-request profiling, for finding where a slow request spent its time.
+
+ProfilingMiddleware profiles a ``PROFILING_SAMPLE_RATE`` fraction of
+requests: query count and database time (from a query recorder every
+connection gets through ``execute_wrapper``), time spent building
+serializer ``.data`` and response render time. A profiled response
+carries them in a ``Server-Timing`` header, and requests and queries
+slower than PROFILING_SLOW_REQUEST_MS/PROFILING_SLOW_QUERY_MS are logged
+to the ``app.profiling`` logger as JSON, queries by SQL fingerprint.
+
+Requests that aren't sampled cost one ``random()`` call plus one context
+variable lookup per query.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework import serializers
+
+logger = logging.getLogger('app.profiling')
+
+# The Profile of the request being handled, if it was sampled.
+current_profile = ContextVar('current_profile', default=None)
+
+
+class Profile:
+    __slots__ = ('started', 'queries', 'db_time', 'serializer_time', 'render_time', 'slow_queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = self.serializer_time = self.render_time = 0.0
+        self.slow_queries = []
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serializer_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+# Queries
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_LISTS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """``sql`` with literals and placeholders as ``?`` and ``IN`` lists collapsed."""
+    sql = _LITERALS.sub('?', sql)
+    sql = _LISTS.sub('(?)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def record_query(execute, sql, params, many, context):
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.queries += 1
+        profile.db_time += elapsed
+        if elapsed * 1000 >= settings.PROFILING_SLOW_QUERY_MS:
+            profile.slow_queries.append((sql, elapsed))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver adding ``record_query`` to the connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Serializers
+
+@contextmanager
+def serializer_timer():
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serializer_time += time.perf_counter() - started
+
+
+class ProfiledSerializerMixin:
+    """Counts the time spent building ``.data``, for one object or many."""
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_serializer = super().many_init(*args, **kwargs)
+        if type(list_serializer) is serializers.ListSerializer:
+            list_serializer.__class__ = ProfiledListSerializer
+        return list_serializer
+
+
+class ProfiledListSerializer(ProfiledSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+# Requests
+
+class ProfilingMiddleware:
+    """See the module docstring; unused while PROFILING_SAMPLE_RATE is 0."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = Profile()
+        token = current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return await self.get_response(request)
+        profile = Profile()
+        token = current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def process_template_response(self, request, response):
+        # Called right before DRF's Response is rendered.
+        profile = current_profile.get()
+        if profile is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                profile.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, profile):
+        total = time.perf_counter() - profile.started
+        response['Server-Timing'] = profile.server_timing(total)
+        path = request.path
+        if total * 1000 >= settings.PROFILING_SLOW_REQUEST_MS:
+            logger.warning(json.dumps({
+                'event': 'slow_request', 'method': request.method, 'path': path,
+                'status': response.status_code, 'total_ms': round(total * 1000, 1),
+                'db_ms': round(profile.db_time * 1000, 1), 'queries': profile.queries,
+                'serialize_ms': round(profile.serializer_time * 1000, 1),
+                'render_ms': round(profile.render_time * 1000, 1),
+            }))
+        for sql, elapsed in profile.slow_queries:
+            normalized = fingerprint(sql)
+            logger.warning(json.dumps({
+                'event': 'slow_query', 'method': request.method, 'path': path,
+                'ms': round(elapsed * 1000, 1), 'fingerprint': normalized,
+                'fingerprint_id': hashlib.md5(normalized.encode()).hexdigest()[:12],
+            }))
+        return response
@@ -0,0 +1,259 @@
+import heapq
+import json
+import logging
+import sys
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Reminder
+from .signals import bulk_saved
+
+logger = logging.getLogger(__name__)
+
+DueReminder = namedtuple(
+    'DueReminder', 'id user_id email username title message reminder_time'
+)
+
+
+# Delivery backends
+
+class BaseReminderBackend:
+    """Delivers claimed reminders; subclasses implement ``send_messages``."""
+
+    def send_messages(self, reminders):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseReminderBackend):
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send_messages(self, reminders):
+        for reminder in reminders:
+            self.stream.write(
+                f'[{reminder.reminder_time:%Y-%m-%d %H:%M}] {reminder.username}: '
+                f'{reminder.title} - {reminder.message}\n'
+            )
+        self.stream.flush()
+        return len(reminders)
+
+
+class FileBackend(BaseReminderBackend):
+    """Appends one JSON object per reminder to ``REMINDER_FILE_PATH``."""
+
+    def __init__(self, path=None):
+        self.path = path or settings.REMINDER_FILE_PATH
+
+    def send_messages(self, reminders):
+        with open(self.path, 'a') as handle:
+            for reminder in reminders:
+                handle.write(json.dumps({
+                    **reminder._asdict(),
+                    'reminder_time': reminder.reminder_time.isoformat(),
+                }) + '\n')
+        return len(reminders)
+
+
+# Reminders delivered through LocMemBackend, for tests.
+outbox = []
+
+
+class LocMemBackend(BaseReminderBackend):
+    def send_messages(self, reminders):
+        outbox.extend(reminders)
+        return len(reminders)
+
+
+def get_backend(path=None, **kwargs):
+    return import_string(path or settings.REMINDER_BACKEND)(**kwargs)
+
+
+# Claiming
+
+def _supports_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def claim_reminders(ids, now):
+    """
+    Atomically mark the given reminders as sent if they are still unsent
+    and due, and return the ones this call won.
+
+    The guard ``NOT is_sent`` makes the UPDATE the claim: when several
+    dispatchers race for the same rows each row is handed to exactly one.
+    """
+    if not ids:
+        return []
+    table = Reminder._meta.db_table
+    placeholders = ', '.join(['%s'] * len(ids))
+    where = f'id IN ({placeholders}) AND NOT is_sent AND reminder_time <= %s'
+    # Stored and compared in the same format as the ORM's own writes (naive
+    # UTC text on SQLite), not as the driver renders an aware datetime.
+    stamp = connection.ops.adapt_datetimefield_value(now)
+    params = [stamp, *ids, stamp]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if _supports_returning():
+                cursor.execute(
+                    f'UPDATE {table} SET is_sent = TRUE, updated_at = %s WHERE {where} '
+                    f'RETURNING id, user_id, title, message, reminder_time',
+                    params,
+                )
+                rows = cursor.fetchall()
+            else:
+                cursor.execute(
+                    f'SELECT id, user_id, title, message, reminder_time FROM {table} WHERE {where}',
+                    params[1:],
+                )
+                rows = [
+                    row for row in cursor.fetchall()
+                    if Reminder.objects.filter(pk=row[0], is_sent=False).update(is_sent=True, updated_at=now)
+                ]
+
+    if not rows:
+        return []
+    users = User.objects.in_bulk({row[1] for row in rows})
+    converter = Reminder._meta.get_field('reminder_time')
+    claimed = []
+    for pk, user_id, title, message, reminder_time in rows:
+        if isinstance(reminder_time, str):
+            reminder_time = converter.to_python(reminder_time)
+        user = users.get(user_id)
+        claimed.append(DueReminder(
+            pk, user_id, user.email if user else '', user.username if user else '',
+            title, message, reminder_time,
+        ))
+    bulk_saved.send(
+        sender=Reminder,
+        instances=[Reminder(pk=r.id, user_id=r.user_id, is_sent=True) for r in claimed],
+        created=False,
+    )
+    return claimed
+
+
+def release_reminders(ids):
+    """Return reminders whose delivery failed to the pending pool."""
+    released = list(Reminder.objects.filter(pk__in=ids).only('pk', 'user_id'))
+    Reminder.objects.filter(pk__in=ids).update(is_sent=False, updated_at=timezone.now())
+    for reminder in released:
+        reminder.is_sent = False
+    bulk_saved.send(sender=Reminder, instances=released, created=False)
+
+
+# Dispatcher
+
+class ReminderDispatcher:
+    """
+    Fires reminders when they fall due.
+
+    Upcoming reminders within ``horizon`` are held in a min-heap ordered by
+    ``reminder_time``. ``refresh`` tops the heap up without rescanning the
+    table: it extends the loaded window along ``reminder_pending_idx`` and
+    picks up reminders created or edited since the previous refresh through
+    ``reminder_updated_idx``. Due entries are claimed in batches with a
+    guarded UPDATE (see ``claim_reminders``), so any number of dispatchers
+    can run side by side without sending a reminder twice. A heap entry
+    whose reminder was moved or already sent simply loses the claim.
+    """
+
+    # Overlap between consecutive change scans, to tolerate clock skew
+    # between the app servers that stamp updated_at and this process.
+    change_overlap = timedelta(seconds=2)
+
+    def __init__(self, backend=None, batch_size=None, horizon=None, clock=timezone.now):
+        self.backend = backend or get_backend()
+        self.batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+        self.horizon = horizon or timedelta(seconds=settings.REMINDER_HORIZON_SECONDS)
+        self.clock = clock
+        self.heap = []
+        self.scheduled = {}
+        self.loaded_until = None
+        self.changes_since = None
+        self.sent = 0
+
+    def schedule(self, pk, reminder_time):
+        if self.scheduled.get(pk) == reminder_time:
+            return
+        self.scheduled[pk] = reminder_time
+        heapq.heappush(self.heap, (reminder_time, pk))
+
+    def refresh(self):
+        now = self.clock()
+        window_end = now + self.horizon
+        pending = Reminder.objects.filter(is_sent=False).order_by()
+
+        if self.loaded_until is None:
+            rows = pending.filter(reminder_time__lte=window_end)
+        else:
+            rows = pending.filter(reminder_time__gt=self.loaded_until, reminder_time__lte=window_end)
+        for pk, reminder_time in rows.values_list('pk', 'reminder_time'):
+            self.schedule(pk, reminder_time)
+
+        if self.changes_since is not None:
+            changed = pending.filter(
+                updated_at__gte=self.changes_since, reminder_time__lte=window_end
+            ).values_list('pk', 'reminder_time')
+            for pk, reminder_time in changed:
+                self.schedule(pk, reminder_time)
+
+        self.loaded_until = window_end
+        self.changes_since = now - self.change_overlap
+
+    def pop_due(self, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            reminder_time, pk = heapq.heappop(self.heap)
+            if self.scheduled.get(pk) == reminder_time:
+                del self.scheduled[pk]
+                due.append(pk)
+        return due
+
+    def dispatch_due(self):
+        now = self.clock()
+        due = self.pop_due(now)
+        sent = 0
+        for start in range(0, len(due), self.batch_size):
+            claimed = claim_reminders(due[start:start + self.batch_size], now)
+            if not claimed:
+                continue
+            try:
+                self.backend.send_messages(claimed)
+            except Exception:
+                logger.exception('Delivering %d reminders failed; releasing them', len(claimed))
+                release_reminders([reminder.id for reminder in claimed])
+                continue
+            sent += len(claimed)
+        self.sent += sent
+        return sent
+
+    def seconds_until_next(self, now):
+        if not self.heap:
+            return None
+        return max(0.0, (self.heap[0][0] - now).total_seconds())
+
+    def run(self, poll_interval=None, once=False):
+        """Refresh and dispatch until interrupted (or one pass if ``once``)."""
+        poll_interval = poll_interval or settings.REMINDER_POLL_SECONDS
+        next_refresh = 0.0
+        while True:
+            if time.monotonic() >= next_refresh:
+                self.refresh()
+                next_refresh = time.monotonic() + poll_interval
+            self.dispatch_due()
+            if once:
+                return self.sent
+            wait = self.seconds_until_next(self.clock())
+            until_refresh = max(0.0, next_refresh - time.monotonic())
+            time.sleep(until_refresh if wait is None else min(wait, until_refresh))
@@ -0,0 +1,241 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.utils import timezone
+
+from . import streaks
+from .models import DailyPlan, StudySession, UserDailyStats
+from .signals import bulk_saved
+
+STAT_FIELDS = (
+    'session_count', 'study_minutes', 'rating_sum', 'rating_count',
+    'plans_total', 'plans_completed',
+)
+
+# Attributes each model's contribution is computed from.
+SOURCE_FIELDS = {
+    StudySession: ('user_id', 'session_date', 'duration_minutes', 'rating'),
+    DailyPlan: ('user_id', 'planned_date', 'is_completed'),
+}
+
+UNKNOWN = object()
+
+_batch = threading.local()
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def contribution(instance):
+    """``(user_id, date, {field: amount})`` that ``instance`` adds to the rollup."""
+    if isinstance(instance, StudySession):
+        return instance.user_id, _as_date(instance.session_date), {
+            'session_count': 1,
+            'study_minutes': instance.duration_minutes or 0,
+            'rating_sum': instance.rating or 0,
+            'rating_count': 1 if instance.rating else 0,
+        }
+    return instance.user_id, _as_date(instance.planned_date), {
+        'plans_total': 1,
+        'plans_completed': 1 if instance.is_completed else 0,
+    }
+
+
+def _loaded_state(instance):
+    # _state.adding is only settled after post_init; pre_save re-checks it.
+    if instance.pk is None:
+        return None
+    if any(name not in instance.__dict__ for name in SOURCE_FIELDS[type(instance)]):
+        return UNKNOWN
+    return contribution(instance)
+
+
+def add(totals, state, sign):
+    if state is None or state is UNKNOWN:
+        return
+    user_id, day, amounts = state
+    for field, amount in amounts.items():
+        totals[(user_id, day)][field] += sign * amount
+
+
+def apply(totals):
+    """
+    Apply ``{(user_id, date): {field: delta}}`` with F() updates, and update
+    the completion streaks of days whose ``plans_completed`` changed.
+    """
+    for (user_id, day), deltas in totals.items():
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            continue
+        rows = UserDailyStats.objects.filter(user_id=user_id, date=day)
+        if not rows.update(**{field: F(field) + delta for field, delta in deltas.items()}):
+            if all(delta < 0 for delta in deltas.values()):
+                # Nothing to take away from, e.g. the user is being deleted.
+                continue
+            try:
+                with transaction.atomic():
+                    UserDailyStats.objects.create(user_id=user_id, date=day, **deltas)
+            except IntegrityError:
+                rows.update(**{field: F(field) + delta for field, delta in deltas.items()})
+        if 'plans_completed' in deltas:
+            streaks.update_day(user_id, day)
+
+
+def _new_totals():
+    return defaultdict(lambda: defaultdict(int))
+
+
+@contextmanager
+def batched():
+    """
+    Merge the rollup deltas of every write inside the block and apply them
+    on exit, one UPDATE per (user, day) instead of one per row.
+    Nothing is applied if the block raises.
+    """
+    if getattr(_batch, 'totals', None) is not None:
+        yield
+        return
+    _batch.totals = totals = _new_totals()
+    try:
+        yield
+    finally:
+        _batch.totals = None
+    apply(totals)
+
+
+@contextmanager
+def _deltas():
+    totals = getattr(_batch, 'totals', None)
+    if totals is not None:
+        yield totals
+    else:
+        totals = _new_totals()
+        yield totals
+        apply(totals)
+
+
+# Signal handlers
+
+def remember_state(sender, instance, **kwargs):
+    instance._rollup_state = _loaded_state(instance)
+
+
+def settle_state(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._rollup_state = None
+    # Instances loaded with .only()/.defer() don't carry the old values.
+    elif getattr(instance, '_rollup_state', None) is UNKNOWN:
+        old = sender.objects.filter(pk=instance.pk).first()
+        instance._rollup_state = contribution(old) if old else None
+
+
+def track_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    new_state = contribution(instance)
+    with _deltas() as totals:
+        add(totals, getattr(instance, '_rollup_state', None), -1)
+        add(totals, new_state, +1)
+    instance._rollup_state = new_state
+
+
+def track_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_rollup_state', None)
+    with _deltas() as totals:
+        add(totals, contribution(instance) if state in (None, UNKNOWN) else state, -1)
+    instance._rollup_state = None
+
+
+def track_bulk(sender, instances, created, **kwargs):
+    with _deltas() as totals:
+        for instance in instances:
+            if not created:
+                add(totals, getattr(instance, '_rollup_state', None), -1)
+            instance._rollup_state = contribution(instance)
+            add(totals, instance._rollup_state, +1)
+
+
+for model in SOURCE_FIELDS:
+    name = model.__name__
+    post_init.connect(remember_state, sender=model, dispatch_uid=f'rollup_init_{name}')
+    pre_save.connect(settle_state, sender=model, dispatch_uid=f'rollup_pre_save_{name}')
+    post_save.connect(track_save, sender=model, dispatch_uid=f'rollup_save_{name}')
+    post_delete.connect(track_delete, sender=model, dispatch_uid=f'rollup_delete_{name}')
+    bulk_saved.connect(track_bulk, sender=model, dispatch_uid=f'rollup_bulk_{name}')
+
+
+# Backfill
+
+def compute_daily_stats(session_model, plan_model, user_ids=None, archive_models=None):
+    """
+    Recompute the rollup from the raw tables with two grouped queries, plus
+    two for ``archive_models``, the ``(session, plan)`` archive tables.
+    Takes the model classes so migrations can pass historical models.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+    session_models, plan_models = [session_model], [plan_model]
+    if archive_models is not None:
+        session_models.append(archive_models[0])
+        plan_models.append(archive_models[1])
+
+    for model in session_models:
+        sessions = model.objects.order_by()
+        if user_ids is not None:
+            sessions = sessions.filter(user_id__in=user_ids)
+        for row in sessions.values('user_id', day=TruncDate('session_date')).annotate(
+            session_count=Count('id'),
+            study_minutes=Sum('duration_minutes'),
+            rating_sum=Sum('rating'),
+            rating_count=Count('rating'),
+        ):
+            day = totals[(row['user_id'], row['day'])]
+            day['session_count'] += row['session_count']
+            day['study_minutes'] += row['study_minutes'] or 0
+            day['rating_sum'] += row['rating_sum'] or 0
+            day['rating_count'] += row['rating_count']
+    for model in plan_models:
+        plans = model.objects.order_by()
+        if user_ids is not None:
+            plans = plans.filter(user_id__in=user_ids)
+        for row in plans.values('user_id', 'planned_date').annotate(
+            plans_total=Count('id'),
+            plans_completed=Count('id', filter=Q(is_completed=True)),
+        ):
+            day = totals[(row['user_id'], row['planned_date'])]
+            day['plans_total'] += row['plans_total']
+            day['plans_completed'] += row['plans_completed']
+    return totals
+
+
+def stored_daily_stats(stats_model, user_ids=None):
+    rows = stats_model.objects.order_by()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    return {
+        (row['user_id'], row['date']): {field: row[field] for field in STAT_FIELDS}
+        for row in rows.values('user_id', 'date', *STAT_FIELDS)
+    }
+
+
+def rebuild_daily_stats(session_model, plan_model, stats_model, user_ids=None, batch_size=1000,
+                        archive_models=None):
+    totals = compute_daily_stats(session_model, plan_model, user_ids, archive_models)
+    with transaction.atomic():
+        existing = stats_model.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        stats_model.objects.bulk_create(
+            [stats_model(user_id=user_id, date=day, **fields) for (user_id, day), fields in totals.items()],
+            batch_size=batch_size,
+        )
+    return len(totals)
@@ -0,0 +1,175 @@
+import re
+
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+FTS_TABLE = 'app_note_fts'
+
+# Private-use markers wrapped around matches by SQLite; swapped for <mark>
+# after the surrounding note text has been HTML-escaped.
+MATCH_START, MATCH_END = '\ue000', '\ue001'
+
+CREATE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content,
+        content='app_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON app_note BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON app_note BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON app_note BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+DROP_STATEMENTS = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+TRIGGER_NAMES = (f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au')
+
+
+def fts_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install_note_index(using=connection):
+    """
+    Create the FTS5 index over app_note and the triggers that keep it in
+    sync, rebuilding it from app_note if any trigger was missing.
+
+    SQLite drops triggers when Django remakes a table during a migration, so
+    this also runs after every migrate (see ``AppConfig.ready``).
+    """
+    if not fts_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            TRIGGER_NAMES,
+        )
+        complete = cursor.fetchone()[0] == len(TRIGGER_NAMES)
+        for statement in CREATE_STATEMENTS:
+            cursor.execute(statement)
+        # Make the hidden rank column BM25 with titles weighted 10x, so
+        # ORDER BY rank takes FTS5's optimised top-k path.
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+        if not complete:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def repair_note_index(sender, using, **kwargs):
+    """post_migrate hook: reinstall lost triggers once the index exists."""
+    from django.db import connections
+
+    using = connections[using]
+    if fts_available(using) and FTS_TABLE in using.introspection.table_names():
+        install_note_index(using)
+
+
+def drop_note_index(using=connection):
+    if not fts_available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in DROP_STATEMENTS:
+            cursor.execute(statement)
+
+
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word must match and the last
+    one may be a prefix (search-as-you-type). Only the last word is expanded
+    because a short prefix on every word can match most of the index.
+    Words are quoted so FTS5 operators in user input are inert.
+    """
+    terms = [f'"{term}"' for term in re.findall(r'\w+', text)]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_note_ids(match):
+    """A ``pk__in`` subquery for the notes matching ``match``."""
+    return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+
+
+def search_notes(user, text, category=None, limit=20):
+    """
+    Rank the user's notes against ``text`` with BM25 (title weighted above
+    content) and return Note instances annotated with ``rank``,
+    ``title_highlight`` and ``snippet``.
+    """
+    from .models import Note
+
+    match = match_expression(text)
+    if not match:
+        return []
+    if not fts_available():
+        return fallback_search(user, text, category, limit)
+
+    params = [MATCH_START, MATCH_END, MATCH_START, MATCH_END, match, user.pk]
+    category_clause = ''
+    if category:
+        category_clause = 'AND app_note.category = %s'
+        params.append(category)
+    params.append(limit)
+
+    notes = list(Note.objects.raw(
+        f"""
+        SELECT app_note.*,
+               {FTS_TABLE}.rank AS rank,
+               highlight({FTS_TABLE}, 0, %s, %s) AS title_highlight,
+               snippet({FTS_TABLE}, 1, %s, %s, '…', 16) AS snippet
+        FROM {FTS_TABLE}
+        JOIN app_note ON app_note.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND app_note.user_id = %s {category_clause}
+        ORDER BY {FTS_TABLE}.rank
+        LIMIT %s
+        """,
+        params,
+    ))
+    for note in notes:
+        note.title_highlight = mark(note.title_highlight)
+        note.snippet = mark(note.snippet)
+    return notes
+
+
+def fallback_search(user, text, category, limit):
+    # Unranked LIKE scan for databases without FTS5.
+    from .models import Note
+
+    notes = Note.objects.filter(user=user).filter(
+        models.Q(title__icontains=text) | models.Q(content__icontains=text)
+    )
+    if category:
+        notes = notes.filter(category=category)
+    notes = list(notes[:limit])
+    for note in notes:
+        note.rank = 0.0
+        note.title_highlight = escape(note.title)
+        note.snippet = escape(note.content[:200])
+    return notes
+
+
+def mark(text):
+    return escape(text).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
@@ -0,0 +1,155 @@
+"""
+Synthetic data for benchmarks and load tests (``seed_focusmate``).
+
+Rows are generated lazily and written with ``bulk_create`` one chunk at a
+time, so memory stays flat however many rows are requested. A fixed
+``random.Random`` seed makes every run produce the same data.
+"""
+import math
+import random
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder, UserDailyStats, CompletionStreak
+from .rollup import rebuild_daily_stats
+from .streaks import rebuild_streaks
+
+WORDS = (
+    'review chapter lecture exercise proof derivation summary outline draft revise essay lab '
+    'report reading notes formula theorem vocabulary practice problem set flashcards exam quiz '
+    'project deadline outline research source citation diagram model experiment hypothesis '
+    'result analysis chart method algorithm function variable integral matrix vector cell '
+    'protein reaction history economics grammar translation presentation group meeting focus '
+    'break plan goal progress schedule morning evening weekend library online course module'
+).split()
+SUBJECTS = ('Mathematics', 'Physics', 'Chemistry', 'Biology', 'History', 'Literature',
+            'Computer Science', 'Economics', 'Languages', 'Philosophy')
+NOTE_CATEGORIES = [choice for choice, _ in Note.CATEGORY_CHOICES]
+PRIORITIES = [choice for choice, _ in DailyPlan.PRIORITY_CHOICES]
+GOAL_STATUSES = [choice for choice, _ in Goal.STATUS_CHOICES]
+
+
+def text(rng, median_chars, cap):
+    """Roughly ``median_chars`` of prose, log-normally distributed up to ``cap``."""
+    target = min(cap, max(20, int(rng.lognormvariate(math.log(median_chars), 0.9))))
+    words, length = [], 0
+    while length < target:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    sentence = ' '.join(words)[:target]
+    return sentence[:1].upper() + sentence[1:] + '.'
+
+
+def title(rng, words=4):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, words))).capitalize()
+
+
+def notes(rng, user_id, count, days, now):
+    for _ in range(count):
+        yield Note(
+            user_id=user_id, title=title(rng, 6), content=text(rng, 800, 20000),
+            category=rng.choice(NOTE_CATEGORIES), is_pinned=rng.random() < 0.05,
+        )
+
+
+def daily_plans(rng, user_id, count, days, now):
+    today = now.date()
+    for _ in range(count):
+        day = today - timedelta(days=rng.randrange(days))
+        done = day < today and rng.random() < 0.7
+        yield DailyPlan(
+            user_id=user_id, title=title(rng), description=text(rng, 120, 1000) if rng.random() < 0.6 else '',
+            priority=rng.choice(PRIORITIES), is_completed=done, planned_date=day,
+            estimated_duration=rng.choice((None, 15, 30, 45, 60, 90, 120)),
+            completed_at=timezone.make_aware(datetime.combine(day, time(rng.randrange(7, 23)))) if done else None,
+        )
+
+
+def study_sessions(rng, user_id, count, days, now):
+    for _ in range(count):
+        yield StudySession(
+            user_id=user_id, subject=rng.choice(SUBJECTS), duration_minutes=rng.randint(10, 180),
+            notes=text(rng, 150, 2000) if rng.random() < 0.5 else '',
+            rating=rng.choice((None, 1, 2, 3, 4, 4, 5, 5)),
+            session_date=now - timedelta(days=rng.randrange(days), minutes=rng.randrange(24 * 60)),
+        )
+
+
+def goals(rng, user_id, count, days, now):
+    for _ in range(count):
+        status = rng.choice(GOAL_STATUSES)
+        yield Goal(
+            user_id=user_id, title=title(rng, 6), description=text(rng, 300, 3000),
+            target_date=now.date() + timedelta(days=rng.randrange(-days // 2, 365)), status=status,
+            progress_percentage=100 if status == 'completed' else rng.randrange(0, 100, 5),
+        )
+
+
+def reminders(rng, user_id, count, days, now):
+    for _ in range(count):
+        offset = timedelta(minutes=rng.randrange(-days * 24 * 60, 30 * 24 * 60))
+        yield Reminder(
+            user_id=user_id, title=title(rng), message=text(rng, 100, 500),
+            reminder_time=now + offset, is_sent=offset.total_seconds() < 0,
+        )
+
+
+# Model and row generator for each per-user volume, in insert order.
+GENERATORS = {
+    'notes': (Note, notes),
+    'daily_plans': (DailyPlan, daily_plans),
+    'study_sessions': (StudySession, study_sessions),
+    'goals': (Goal, goals),
+    'reminders': (Reminder, reminders),
+}
+
+
+def create_users(prefix, count, password):
+    """Create ``<prefix><n>@example.com`` users with profiles; returns their ids."""
+    # Hashing is deliberately slow, so every user shares one hash.
+    hashed = make_password(password)
+    users = User.objects.bulk_create(
+        [User(username=f'{prefix}{n}@example.com', email=f'{prefix}{n}@example.com',
+              first_name=prefix, last_name=str(n), password=hashed) for n in range(count)],
+        batch_size=1000,
+    )
+    # SQLite returns the new primary keys from bulk inserts.
+    user_ids = [user.pk for user in users]
+    UserProfile.objects.bulk_create([UserProfile(user_id=pk) for pk in user_ids], batch_size=1000)
+    return user_ids
+
+
+def seed(user_ids, volumes, days=365, chunk_size=5000, random_seed=0, progress=None):
+    """
+    Write ``volumes[name]`` rows of each GENERATORS table for every user,
+    spread over the last ``days`` days, then rebuild their daily stats.
+    ``progress(name, written)`` is called after each chunk. Returns the
+    row count per table.
+
+    ``bulk_create`` sends no signals, so the change log isn't written; sync
+    clients of seeded users start from a reset.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    written = dict.fromkeys(GENERATORS, 0)
+    for name, (model, generate) in GENERATORS.items():
+        count = volumes.get(name, 0)
+        if not count:
+            continue
+        rows = (row for user_id in user_ids for row in generate(rng, user_id, count, days, now))
+        while chunk := list(islice(rows, chunk_size)):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+            written[name] += len(chunk)
+            if progress:
+                progress(name, written[name])
+    for start in range(0, len(user_ids), 500):
+        rebuild_daily_stats(StudySession, DailyPlan, UserDailyStats, user_ids[start:start + 500])
+        rebuild_streaks(UserDailyStats, CompletionStreak, user_ids[start:start + 500])
+    return written
@@ -1,10 +1,30 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder
-
-
-class UserRegistrationSerializer(serializers.ModelSerializer):
+from .fieldsets import SparseFieldsetMixin
+from .profiling import ProfiledSerializerMixin
+from .avatars import variant_urls
+from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder, AuthToken
+
+
+class OwnerField(serializers.ReadOnlyField):
+    """
+    The owning user's username. Every object these serializers render
+    belongs to the requesting user, so it comes from the ``owner`` in the
+    context or ``request.user`` instead of loading ``instance.user`` for
+    each row; other rows fall back to the relation.
+    """
+
+    def get_attribute(self, instance):
+        owner = self.context.get('owner')
+        if owner is None:
+            owner = getattr(self.context.get('request'), 'user', None)
+        if owner is not None and owner.pk == instance.user_id:
+            return str(owner)
+        return str(instance.user)
+
+
+class UserRegistrationSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     password_confirm = serializers.CharField(write_only=True)
     name = serializers.CharField(write_only=True, max_length=150)
@@ -56,18 +76,36 @@ class UserLoginSerializer(serializers.Serializer):
         return attrs
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class TokenRequestSerializer(UserLoginSerializer):
+    name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+
+
+class AuthTokenSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = AuthToken
+        fields = ('id', 'name', 'prefix', 'created_at', 'expires_at')
+        read_only_fields = fields
+
+
+class UserProfileSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.CharField(source='user.email', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = UserProfile
-        fields = ('username', 'email', 'first_name', 'last_name', 'bio', 'location', 'birth_date', 'avatar')
+        fields = ('username', 'email', 'first_name', 'last_name', 'bio', 'location', 'birth_date', 'avatar',
+                  'avatar_variants')
+
+    def get_avatar_variants(self, profile):
+        # {"64": {"webp": url, "jpeg": url}, ...}; null until they are made.
+        return variant_urls(profile.avatar_variants, self.context.get('request'))
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
 
     class Meta:
@@ -75,68 +113,83 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'profile')
 
 
-class NoteSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
+class NoteSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    user = OwnerField()
 
     class Meta:
         model = Note
         fields = ('id', 'user', 'title', 'content', 'category', 'is_pinned', 'created_at', 'updated_at')
         read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        preview_fields = ('content',)
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class DailyPlanSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
+class NoteSearchResultSerializer(NoteSerializer):
+    rank = serializers.FloatField(read_only=True)
+    title_highlight = serializers.CharField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta(NoteSerializer.Meta):
+        fields = NoteSerializer.Meta.fields + ('rank', 'title_highlight', 'snippet')
+
+
+class DailyPlanSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    user = OwnerField()
 
     class Meta:
         model = DailyPlan
-        fields = ('id', 'user', 'title', 'description', 'priority', 'is_completed', 
+        fields = ('id', 'user', 'title', 'description', 'priority', 'position', 'is_completed', 
                  'planned_date', 'estimated_duration', 'completed_at', 'created_at', 'updated_at')
-        read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        # Plans are reordered with daily-plans/<id>/move/.
+        read_only_fields = ('id', 'user', 'position', 'created_at', 'updated_at')
+        preview_fields = ('description',)
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class StudySessionSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
+class StudySessionSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    user = OwnerField()
 
     class Meta:
         model = StudySession
         fields = ('id', 'user', 'subject', 'duration_minutes', 'notes', 'rating', 
                  'session_date', 'created_at')
         read_only_fields = ('id', 'user', 'created_at')
+        preview_fields = ('notes',)
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class GoalSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
+class GoalSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    user = OwnerField()
 
     class Meta:
         model = Goal
         fields = ('id', 'user', 'title', 'description', 'target_date', 'status', 
                  'progress_percentage', 'created_at', 'updated_at')
         read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        preview_fields = ('description',)
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class ReminderSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
+class ReminderSerializer(ProfiledSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    user = OwnerField()
 
     class Meta:
         model = Reminder
         fields = ('id', 'user', 'title', 'message', 'reminder_time', 'is_sent', 'created_at')
         read_only_fields = ('id', 'user', 'is_sent', 'created_at')
+        preview_fields = ('message',)
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -151,6 +204,6 @@ class DashboardDataSerializer(serializers.Serializer):
     total_study_time = serializers.IntegerField()
     active_goals = serializers.IntegerField()
     upcoming_reminders = serializers.IntegerField()
-    recent_notes = NoteSerializer(many=True)
+    recent_notes = NoteSerializer(many=True, preview=True)
     today_plans = DailyPlanSerializer(many=True)
     recent_study_sessions = StudySessionSerializer(many=True)
@@ -0,0 +1,110 @@
+"""
+Cheaper session authentication.
+
+SESSION_ENGINE follows FOCUSMATE_SESSION_MODE (see settings.py): database
+sessions (the default), sessions cached in a shared cache and written
+through to the database, or signed cookies. CachedAuthenticationMiddleware then keeps the user each session
+resolves to for AUTH_USER_CACHE_SECONDS, so a request whose session is in
+the cache runs no auth query at all.
+
+Entries are keyed by user id and only serve sessions carrying the auth
+hash they were stored with, so a session logged in with a newer password
+never gets a stale user. Saving or deleting the user or their profile
+drops the entry in this process; other processes pick the change up,
+password changes included, when their entry expires.
+"""
+import copy
+import time
+from functools import partial
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+from .tokens import TTLCache
+
+user_cache = TTLCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_SECONDS)
+
+
+def _cached(user_id, session_hash):
+    entry = user_cache.get(str(user_id)) if user_id and session_hash else None
+    if entry is None or not constant_time_compare(entry[0], session_hash):
+        return None
+    # Each request gets its own copy of the cached user.
+    return copy.copy(entry[1])
+
+
+def _remember(user, session_hash):
+    # auth.get_user() has verified session_hash if it returned a user.
+    if user.is_authenticated and session_hash:
+        user_cache.set(str(user.pk), (session_hash, copy.copy(user)))
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        session = request.session
+        session_hash = session.get(auth.HASH_SESSION_KEY)
+        user = _cached(session.get(auth.SESSION_KEY), session_hash)
+        request._cached_user = user or _remember(auth.get_user(request), session_hash)
+    return request._cached_user
+
+
+async def auser(request):
+    if not hasattr(request, '_acached_user'):
+        session = request.session
+        session_hash = await session.aget(auth.HASH_SESSION_KEY)
+        user = _cached(await session.aget(auth.SESSION_KEY), session_hash)
+        request._acached_user = user or _remember(await auth.aget_user(request), session_hash)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware whose ``request.user`` comes from ``user_cache`` when it can."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
+
+
+def forget_user(sender, instance, **kwargs):
+    user_cache.discard(str(instance.pk))
+
+
+def forget_profile_owner(sender, instance, **kwargs):
+    user_cache.discard(str(instance.user_id))
+
+
+post_save.connect(forget_user, sender=User, dispatch_uid='forget_cached_user_save')
+post_delete.connect(forget_user, sender=User, dispatch_uid='forget_cached_user_delete')
+post_save.connect(forget_profile_owner, sender=UserProfile, dispatch_uid='forget_cached_user_profile')
+
+
+def purge_expired_sessions(batch_size=1000, pause=0.0):
+    """
+    Delete expired database sessions ``batch_size`` at a time, sleeping
+    ``pause`` seconds between batches so live requests get the write lock
+    in between. Returns the number deleted, or None when sessions aren't
+    stored in the database.
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not hasattr(store, 'get_model_class'):
+        return None
+    model = store.get_model_class()
+    now = timezone.now()
+    deleted = 0
+    while True:
+        keys = list(model.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size])
+        if not keys:
+            return deleted
+        deleted += model.objects.filter(session_key__in=keys).delete()[0]
+        if pause:
+            time.sleep(pause)
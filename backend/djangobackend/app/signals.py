@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by bulk_create/bulk_update code paths, which bypass post_save.
+# Arguments: sender (the model), instances, created.
+bulk_saved = Signal()
@@ -0,0 +1,307 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import (
+    PRIORITY_RANKS, DailyPlan, StudySession, UserDailyStats, CompletionStreak, ArchivedDailyPlan, ArchivedStudySession,
+)
+
+GRANULARITIES = ('day', 'week', 'month', 'hour_of_week')
+
+# Upper bound on the span of one request, so a typo can't ask for 10k years.
+MAX_RANGE_DAYS = 3 * 366
+
+
+class RangeError(ValueError):
+    pass
+
+
+def day_bounds(start, end):
+    """Aware datetimes covering the dates ``start``..``end`` inclusive."""
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(start, time.min), tz)
+    upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    return lower, upper
+
+
+def _periods(start, end, granularity):
+    if granularity == 'day':
+        day = start
+        while day <= end:
+            yield day
+            day += timedelta(days=1)
+    elif granularity == 'week':
+        week = start - timedelta(days=start.weekday())
+        while week <= end:
+            yield week
+            week += timedelta(weeks=1)
+    elif granularity == 'month':
+        month = start.replace(day=1)
+        while month <= end:
+            yield month
+            month = (month + timedelta(days=32)).replace(day=1)
+    else:
+        for weekday in range(1, 8):
+            for hour in range(24):
+                yield (weekday, hour)
+
+
+def _period_of(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _hour_of_week(model, user, lower, upper):
+    return model.objects.filter(
+        user=user, session_date__gte=lower, session_date__lt=upper
+    ).order_by().values_list(
+        ExtractIsoWeekDay('session_date'), ExtractHour('session_date')
+    ).annotate(sessions=Count('id'), total_minutes=Sum('duration_minutes'))
+
+
+def _rows(user, start, end, granularity):
+    if granularity == 'hour_of_week':
+        # The rollup is per day, so hour-of-week still groups the raw sessions,
+        # filtered by a plain session_date range on the (user, date) index of
+        # the sessions table and of its archive. _buckets adds up the two.
+        lower, upper = day_bounds(start, end)
+        return _hour_of_week(StudySession, user, lower, upper).union(
+            _hour_of_week(ArchivedStudySession, user, lower, upper), all=True)
+    return UserDailyStats.objects.filter(
+        user=user, date__gte=start, date__lte=end
+    ).values_list('date', 'session_count', 'study_minutes')
+
+
+def _buckets(rows, start, end, granularity):
+    grouped = {}
+    for row in rows:
+        if granularity == 'hour_of_week':
+            weekday, hour, sessions, minutes = row
+            period = (weekday, hour)
+        else:
+            day, sessions, minutes = row
+            period = _period_of(day, granularity)
+        bucket = grouped.setdefault(period, {'sessions': 0, 'total_minutes': 0})
+        bucket['sessions'] += sessions
+        bucket['total_minutes'] += minutes or 0
+
+    buckets = []
+    for period in _periods(start, end, granularity):
+        bucket = grouped.get(period, {'sessions': 0, 'total_minutes': 0})
+        if granularity == 'hour_of_week':
+            bucket = {'weekday': period[0], 'hour': period[1], **bucket}
+        else:
+            bucket = {'period': str(period), **bucket}
+        buckets.append(bucket)
+    return buckets
+
+
+def study_buckets(user, start, end, granularity='day'):
+    """
+    Study totals for the user between ``start`` and ``end`` (dates,
+    inclusive) as zero-filled buckets, using a single query.
+
+    Day, week and month buckets are summed from the UserDailyStats rollup,
+    so the cost is O(days in range) rather than O(sessions).
+    """
+    return _buckets(_rows(user, start, end, granularity), start, end, granularity)
+
+
+async def astudy_buckets(user, start, end, granularity='day'):
+    rows = [row async for row in _rows(user, start, end, granularity)]
+    return _buckets(rows, start, end, granularity)
+
+
+def parse_dates(params, today, max_days=MAX_RANGE_DAYS):
+    """``(start, end)`` from query parameters, the last 30 days by default; RangeError if invalid."""
+    invalid = RangeError('start and end must be dates (YYYY-MM-DD)')
+    try:
+        end = parse_date(params['end']) if 'end' in params else today
+        start = parse_date(params['start']) if 'start' in params else None
+    except ValueError:
+        raise invalid
+    # parse_date() returns None for text that isn't shaped like a date.
+    if end is None or ('start' in params and start is None):
+        raise invalid
+    start = start or end - timedelta(days=29)
+    if start > end or (end - start).days > max_days:
+        raise RangeError(f'start must not be after end, and the range is capped at {max_days} days')
+    return start, end
+
+
+def parse_range(params, today):
+    """``(start, end, granularity)`` from query parameters; RangeError if invalid."""
+    granularity = params.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise RangeError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    return (*parse_dates(params, today), granularity)
+
+
+def range_summary(start, end, granularity, buckets):
+    return {
+        'start': str(start),
+        'end': str(end),
+        'granularity': granularity,
+        'buckets': buckets,
+        **summarize(buckets),
+    }
+
+
+def last_week_summary(buckets):
+    # The query covers the 7 charted days plus today, which only counts
+    # towards the totals.
+    return {
+        'daily_stats': {
+            bucket['period']: {
+                'sessions': bucket['sessions'],
+                'total_minutes': bucket['total_minutes'],
+            }
+            for bucket in buckets[:7]
+        },
+        **summarize(buckets),
+    }
+
+
+def _productivity_totals(user, today):
+    week_start = today - timedelta(days=today.weekday())
+    queryset = UserDailyStats.objects.filter(user=user, date__gte=week_start, date__lte=today)
+    return queryset, {
+        'completed_week': Sum('plans_completed'),
+        'total_week': Sum('plans_total'),
+        'completed_today': Sum('plans_completed', filter=Q(date=today)),
+        'total_today': Sum('plans_total', filter=Q(date=today)),
+    }
+
+
+def _rate(completed, total):
+    return round(completed / total * 100, 2) if total > 0 else 0
+
+
+def _productivity(totals):
+    totals = {name: value or 0 for name, value in totals.items()}
+    return {
+        'today': {
+            'completed': totals['completed_today'],
+            'total': totals['total_today'],
+            'completion_rate': _rate(totals['completed_today'], totals['total_today']),
+        },
+        'this_week': {
+            'completed': totals['completed_week'],
+            'total': totals['total_week'],
+            'completion_rate': _rate(totals['completed_week'], totals['total_week']),
+        },
+    }
+
+
+def productivity(user, today):
+    """Plan completion for today and the current week, from one rollup aggregate."""
+    queryset, aggregates = _productivity_totals(user, today)
+    return _productivity(queryset.aggregate(**aggregates))
+
+
+async def aproductivity(user, today):
+    queryset, aggregates = _productivity_totals(user, today)
+    return _productivity(await queryset.aaggregate(**aggregates))
+
+
+# Trailing windows, ending at the last day of the range, of the rolling completion rates.
+ROLLING_DAYS = (7, 30)
+
+
+def _report_queries(user, start, end, today):
+    """The four queries behind a productivity report: totals, priorities, current and longest streak."""
+    in_range = Q(date__gte=start)
+    aggregates = {
+        'completed': Sum('plans_completed', filter=in_range),
+        'total': Sum('plans_total', filter=in_range),
+        'active_days': Count('id', filter=in_range & Q(plans_completed__gt=0)),
+    }
+    for days in ROLLING_DAYS:
+        window = Q(date__gt=end - timedelta(days=days))
+        aggregates[f'completed_{days}'] = Sum('plans_completed', filter=window)
+        aggregates[f'total_{days}'] = Sum('plans_total', filter=window)
+    totals = UserDailyStats.objects.filter(
+        user=user, date__gte=min(start, end - timedelta(days=max(ROLLING_DAYS) - 1)), date__lte=end,
+    )
+
+    # Grouped on plan_user_date_order_idx, which covers priority_rank and
+    # is_completed; archived plans are added by the second half.
+    def by_priority(model):
+        return model.objects.filter(user=user, planned_date__gte=start, planned_date__lte=end).order_by().values_list(
+            'priority_rank').annotate(total=Count('id'), completed=Count('id', filter=Q(is_completed=True)))
+    priorities = by_priority(DailyPlan).union(by_priority(ArchivedDailyPlan), all=True)
+
+    streaks = CompletionStreak.objects.filter(user=user)
+    # A streak stays current through the day after its last completed day.
+    current = streaks.filter(end__gte=today - timedelta(days=1)).order_by('-end')
+    longest = streaks.order_by('-days', '-end')
+    return (totals, aggregates), priorities, current, longest
+
+
+def _completion(completed, total):
+    completed, total = completed or 0, total or 0
+    return {'completed': completed, 'total': total, 'completion_rate': _rate(completed, total)}
+
+
+def _report(start, end, totals, priorities, current, longest):
+    counts = {priority: [0, 0] for priority, _ in reversed(DailyPlan.PRIORITY_CHOICES)}
+    priority_of = {rank: priority for priority, rank in PRIORITY_RANKS.items()}
+    for rank, total, completed in priorities:
+        counts[priority_of[rank]][0] += completed
+        counts[priority_of[rank]][1] += total
+    return {
+        'start': str(start),
+        'end': str(end),
+        **_completion(totals['completed'], totals['total']),
+        'active_days': totals['active_days'],
+        'rolling': {
+            f'last_{days}_days': _completion(totals[f'completed_{days}'], totals[f'total_{days}'])
+            for days in ROLLING_DAYS
+        },
+        'by_priority': {priority: _completion(*pair) for priority, pair in counts.items()},
+        'streaks': {
+            'current': current.days if current else 0,
+            'current_start': str(current.start) if current else None,
+            'longest': longest.days if longest else 0,
+            'longest_start': str(longest.start) if longest else None,
+            'longest_end': str(longest.end) if longest else None,
+        },
+    }
+
+
+def productivity_report(user, start, end, today):
+    """
+    Plan completion between ``start`` and ``end`` (dates, inclusive): totals
+    and days with a completed plan, the completion rate over the last 7 and
+    30 days of the range, a per-priority breakdown and the user's current
+    and longest completion streaks. Each comes from one query: the first
+    three from the rollup and the plans' covering index, the streaks from
+    the CompletionStreak rows kept by app/streaks.py.
+    """
+    (totals, aggregates), priorities, current, longest = _report_queries(user, start, end, today)
+    return _report(start, end, totals.aggregate(**aggregates), list(priorities), current.first(), longest.first())
+
+
+async def aproductivity_report(user, start, end, today):
+    (totals, aggregates), priorities, current, longest = _report_queries(user, start, end, today)
+    return _report(
+        start, end, await totals.aaggregate(**aggregates), [row async for row in priorities],
+        await current.afirst(), await longest.afirst(),
+    )
+
+
+def summarize(buckets):
+    total_sessions = sum(bucket['sessions'] for bucket in buckets)
+    total_minutes = sum(bucket['total_minutes'] for bucket in buckets)
+    avg_session_length = total_minutes / total_sessions if total_sessions > 0 else 0
+    return {
+        'total_sessions': total_sessions,
+        'total_minutes': total_minutes,
+        'average_session_length': round(avg_session_length, 2),
+    }
@@ -0,0 +1,131 @@
+"""
+Completion streaks: runs of consecutive days on which the user completed
+at least one daily plan.
+
+Each run is a CompletionStreak row. ``rollup.apply`` calls ``update_day``
+whenever a day's ``plans_completed`` changes, and the day is added to the
+runs around it (extending or joining them) or cut out of the run holding
+it (shortening or splitting it), a few indexed queries whatever the
+streak's length. ``rebuild_streaks`` recomputes every run from the
+rollup with one window-function query.
+"""
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Func, Window
+from django.db.models.functions import RowNumber
+
+from .models import CompletionStreak, UserDailyStats
+
+ONE_DAY = timedelta(days=1)
+
+
+def _nearby(user_id, day):
+    # Runs holding ``day``, ending the day before it or starting the day after.
+    return list(CompletionStreak.objects.filter(user_id=user_id, end__gte=day - ONE_DAY, start__lte=day + ONE_DAY))
+
+
+def _save(run, start=None, end=None):
+    run.start = start or run.start
+    run.end = end or run.end
+    run.days = (run.end - run.start).days + 1
+    run.save(update_fields=['start', 'end', 'days'])
+
+
+def _mark(user_id, day):
+    runs = _nearby(user_id, day)
+    if any(run.start <= day <= run.end for run in runs):
+        return
+    before = next((run for run in runs if run.end == day - ONE_DAY), None)
+    after = next((run for run in runs if run.start == day + ONE_DAY), None)
+    if before and after:
+        after.delete()
+        _save(before, end=after.end)
+    elif before:
+        _save(before, end=day)
+    elif after:
+        _save(after, start=day)
+    else:
+        CompletionStreak.objects.create(user_id=user_id, start=day, end=day, days=1)
+
+
+def _unmark(user_id, day):
+    run = next((run for run in _nearby(user_id, day) if run.start <= day <= run.end), None)
+    if run is None:
+        return
+    if run.start == run.end:
+        run.delete()
+    elif day == run.start:
+        _save(run, start=day + ONE_DAY)
+    elif day == run.end:
+        _save(run, end=day - ONE_DAY)
+    else:
+        CompletionStreak.objects.create(user_id=user_id, start=day + ONE_DAY, end=run.end,
+                                        days=(run.end - day).days)
+        _save(run, end=day - ONE_DAY)
+
+
+def update_day(user_id, day):
+    """Bring the user's streaks in line with ``day``'s ``plans_completed``."""
+    # Part of the caller's transaction when there is one.
+    with transaction.atomic(savepoint=False):
+        completed = (
+            UserDailyStats.objects.filter(user_id=user_id, date=day)
+            .values_list('plans_completed', flat=True).first()
+        )
+        if completed:
+            _mark(user_id, day)
+        else:
+            _unmark(user_id, day)
+
+
+# Backfill
+
+def _as_date(value):
+    # MIN()/MAX() of a date column come back as ISO strings on SQLite.
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def compute_streaks(stats_model, user_ids=None):
+    """
+    ``{(user_id, start): (end, days)}`` for every run, from one query: along
+    a run, a day's julian number minus its row number among the user's
+    completed days is constant, so grouping on it yields the runs.
+    Takes the model class so migrations can pass the historical model.
+    """
+    days = stats_model.objects.filter(plans_completed__gt=0)
+    if user_ids is not None:
+        days = days.filter(user_id__in=user_ids)
+    days = days.annotate(run=Func(F('date'), function='julianday', output_field=FloatField()) - Window(
+        RowNumber(), partition_by=F('user_id'), order_by=F('date').asc(),
+    )).order_by().values('user_id', 'date', 'run')
+    sql, params = days.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT user_id, MIN(date), MAX(date), COUNT(*) FROM ({sql}) GROUP BY user_id, run', params)
+        return {
+            (user_id, _as_date(start)): (_as_date(end), count)
+            for user_id, start, end, count in cursor.fetchall()
+        }
+
+
+def stored_streaks(streak_model, user_ids=None):
+    runs = streak_model.objects.order_by()
+    if user_ids is not None:
+        runs = runs.filter(user_id__in=user_ids)
+    return {(user_id, start): (end, days) for user_id, start, end, days in runs.values_list(
+        'user_id', 'start', 'end', 'days')}
+
+
+def rebuild_streaks(stats_model, streak_model, user_ids=None, batch_size=1000):
+    runs = compute_streaks(stats_model, user_ids)
+    with transaction.atomic():
+        existing = streak_model.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        streak_model.objects.bulk_create(
+            [streak_model(user_id=user_id, start=start, end=end, days=days)
+             for (user_id, start), (end, days) in runs.items()],
+            batch_size=batch_size,
+        )
+    return len(runs)
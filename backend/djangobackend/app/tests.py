@@ -1,3 +1,1949 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import hashlib
+import json
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from io import BytesIO, StringIO
+from datetime import date, datetime, timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .checks import check_session_cache
+from .conditional import COLLECTION_STATE
+from .pagination import KeysetPagination
+from .models import AuthToken, ChangeLogEntry, Note, DailyPlan, StudySession, Goal, Reminder, UserDailyStats, UserProfile
+from .models import ArchivedDailyPlan, ArchivedReminder, ArchivedStudySession, CompletionStreak
+from .dashboard import dashboard_cache_key, invalidate_dashboard
+from .rollup import rebuild_daily_stats, stored_daily_stats, compute_daily_stats
+from . import archive, avatars, changelog, profiling, reminders, sessions, tokens
+from .database import ReadWriteRouter, read_only_request
+from .admin import NoteAdmin
+from .search import fts_available
+from .calendar import _queries as calendar_queries
+from .streaks import compute_streaks, stored_streaks
+from .positions import GAP, move_plan
+from .views import (
+    DailyPlanBulkView, DailyPlanDetailView, DailyPlanMoveView, DailyPlanNextView, StudySessionBulkView,
+    DashboardView, NoteDetailView, SyncView, NoteListCreateView, NoteSearchView, StudySessionListCreateView,
+    calendar, productivity_range, study_statistics, study_statistics_range,
+)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN over the querysets issued by app/views.py and
+    fails when one of them stops using its composite index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='x')
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written against SQLite.')
+
+    def explain(self, queryset):
+        return queryset.explain()
+
+    def counted(self, queryset):
+        # .count() and .aggregate() drop Meta.ordering; mirror that here.
+        return queryset.order_by().values('pk')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.explain(queryset)
+        self.assertIn(index_name, plan, msg=f'{index_name} not used:\n{plan}')
+        self.assertNotRegex(plan, r'SCAN app_\w+(?! USING)', msg=f'table scan:\n{plan}')
+        self.assertNotIn('TEMP B-TREE', plan, msg=f'filesort:\n{plan}')
+
+    def test_note_list(self):
+        self.assertUsesIndex(Note.objects.filter(user=self.user), 'note_user_pinned_updated_idx')
+
+    def test_note_count(self):
+        self.assertUsesIndex(self.counted(Note.objects.filter(user=self.user)), 'note_')
+
+    def test_pinned_notes(self):
+        queryset = Note.objects.filter(user=self.user, is_pinned=True).order_by('-updated_at')
+        self.assertUsesIndex(queryset, 'note_user_pinned_only_idx')
+
+    def test_daily_plan_list(self):
+        self.assertUsesIndex(DailyPlan.objects.filter(user=self.user), 'plan_user_order_idx')
+
+    def test_daily_plans_for_date(self):
+        queryset = DailyPlan.objects.filter(user=self.user, planned_date=date.today())
+        self.assertUsesIndex(queryset, 'plan_user_date_order_idx')
+
+    def test_completed_plans_for_date(self):
+        queryset = DailyPlan.objects.filter(
+            user=self.user, planned_date=date.today(), is_completed=True
+        )
+        self.assertUsesIndex(self.counted(queryset), 'plan_user_date_order_idx')
+
+    def test_week_plans(self):
+        today = date.today()
+        queryset = DailyPlan.objects.filter(
+            user=self.user, planned_date__gte=today - timedelta(days=7), planned_date__lte=today
+        )
+        self.assertUsesIndex(self.counted(queryset), 'plan_user_date_order_idx')
+
+    def test_collection_state(self):
+        # ConditionalListMixin's validator, answered without touching the rows.
+        for model, index_name in ((DailyPlan, 'plan_user_updated_idx'), (StudySession, 'session_user_updated_idx'),
+                                  (Goal, 'goal_user_updated_idx'), (Reminder, 'reminder_user_updated_idx'),
+                                  (ArchivedDailyPlan, 'archive_plan_updated_idx'),
+                                  (ArchivedStudySession, 'archive_session_updated_idx'),
+                                  (ArchivedReminder, 'archive_reminder_updated_idx')):
+            with self.subTest(model=model.__name__):
+                with CaptureQueriesContext(connection) as queries:
+                    model.objects.filter(user=self.user).aggregate(**COLLECTION_STATE)
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn(f'COVERING INDEX {index_name}', plan)
+
+    def test_next_plans(self):
+        queryset = DailyPlan.objects.filter(user=self.user, is_completed=False).order_by(
+            '-priority_rank', 'position', 'id')
+        self.assertUsesIndex(queryset[:5], 'plan_user_open_idx')
+
+    def test_calendar(self):
+        queries = calendar_queries(self.user, date.today(), date.today() + timedelta(days=41))
+        for name, index_name in (('plans', 'plan_user_date_order_idx'), ('sessions', 'session_user_date_idx'),
+                                 ('goals', 'goal_user_target_idx'), ('reminders', 'reminder_user_time_idx')):
+            self.assertUsesIndex(queries[name], index_name)
+
+    def test_study_session_list(self):
+        self.assertUsesIndex(StudySession.objects.filter(user=self.user), 'session_user_date_idx')
+
+    def test_study_sessions_since(self):
+        queryset = StudySession.objects.filter(
+            user=self.user, session_date__gte=timezone.now() - timedelta(days=7)
+        )
+        self.assertUsesIndex(queryset, 'session_user_date_idx')
+
+    def test_grouped_study_statistics(self):
+        queryset = StudySession.objects.filter(
+            user=self.user, session_date__gte=timezone.now() - timedelta(days=7)
+        ).order_by().values(period=TruncDate('session_date')).annotate(n=Count('id'))
+        plan = self.explain(queryset)
+        self.assertIn('session_user_date_idx', plan, msg=plan)
+        self.assertNotRegex(plan, r'SCAN app_\w+(?! USING)', msg=plan)
+
+    def test_goal_list(self):
+        self.assertUsesIndex(Goal.objects.filter(user=self.user), 'goal_user_target_idx')
+
+    def test_active_goals(self):
+        queryset = Goal.objects.filter(
+            user=self.user, status__in=['not_started', 'in_progress']
+        )
+        self.assertUsesIndex(self.counted(queryset), 'goal_user_status_idx')
+
+    def test_reminder_list(self):
+        self.assertUsesIndex(Reminder.objects.filter(user=self.user), 'reminder_user_time_idx')
+
+    def test_upcoming_reminders(self):
+        queryset = Reminder.objects.filter(
+            user=self.user, is_sent=False, reminder_time__gte=timezone.now()
+        )
+        self.assertUsesIndex(self.counted(queryset), 'reminder_user_pending_idx')
+
+
+class DashboardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='dash', password='x')
+        Note.objects.create(user=cls.user, title='n', content='c')
+        DailyPlan.objects.create(user=cls.user, title='p', planned_date=date.today(), is_completed=True)
+        DailyPlan.objects.create(user=cls.user, title='q', planned_date=date.today())
+        StudySession.objects.create(user=cls.user, subject='s', duration_minutes=30)
+        Goal.objects.create(user=cls.user, title='g', description='d', target_date=date.today())
+        Reminder.objects.create(
+            user=cls.user, title='r', message='m', reminder_time=timezone.now() + timedelta(hours=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def get_dashboard(self):
+        request = self.factory.get('/api/dashboard/')
+        force_authenticate(request, user=self.user)
+        return DashboardView.as_view()(request).data
+
+    def test_counters(self):
+        data = self.get_dashboard()
+        self.assertEqual(data['total_notes'], 1)
+        self.assertEqual(data['total_daily_plans'], 2)
+        self.assertEqual(data['completed_plans_today'], 1)
+        self.assertEqual(data['total_study_sessions'], 1)
+        self.assertEqual(data['total_study_time'], 30)
+        self.assertEqual(data['active_goals'], 1)
+        self.assertEqual(data['upcoming_reminders'], 1)
+
+    def test_one_query_per_table_then_cached(self):
+        # The latest change log id, then one query per table.
+        with self.assertNumQueries(8):
+            self.get_dashboard()
+        with self.assertNumQueries(1):
+            self.get_dashboard()
+
+    def test_writes_invalidate_snapshot(self):
+        self.get_dashboard()
+        note = Note.objects.create(user=self.user, title='n2', content='c')
+        self.assertEqual(self.get_dashboard()['total_notes'], 2)
+        note.delete()
+        self.assertEqual(self.get_dashboard()['total_notes'], 1)
+
+    @override_settings(TIME_ZONE='Pacific/Kiritimati')
+    def test_today_follows_time_zone(self):
+        # UTC+14: a different date from the server's for most of the day.
+        today = timezone.localdate()
+        DailyPlan.objects.create(user=self.user, title='local', planned_date=today)
+        self.assertIn('local', [plan['title'] for plan in self.get_dashboard()['today_plans']])
+        self.assertIsNotNone(cache.get(dashboard_cache_key(self.user.pk, today)))
+
+    def test_write_on_another_worker_invalidates_snapshot(self):
+        self.get_dashboard()
+        # Another process's write leaves this process's cache alone; only
+        # the rows and the change log entry land in the shared database.
+        with patch.object(cache, 'delete'):
+            Note.objects.create(user=self.user, title='n2', content='c')
+        self.assertEqual(self.get_dashboard()['total_notes'], 2)
+
+
+class StudyStatisticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='stats', password='x')
+        now = timezone.now()
+        for days_ago, minutes in [(0, 10), (1, 20), (1, 40), (3, 15), (40, 60)]:
+            StudySession.objects.create(
+                user=cls.user, subject='s', duration_minutes=minutes,
+                session_date=now - timedelta(days=days_ago),
+            )
+
+    def call(self, view, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def test_study_statistics_single_query(self):
+        with self.assertNumQueries(1):
+            data = self.call(study_statistics).data
+        self.assertEqual(len(data['daily_stats']), 7)
+        yesterday = str(timezone.now().date() - timedelta(days=1))
+        self.assertEqual(data['daily_stats'][yesterday], {'sessions': 2, 'total_minutes': 60})
+        self.assertEqual(data['total_sessions'], 4)
+        self.assertEqual(data['total_minutes'], 85)
+
+    def test_range_zero_fills_days(self):
+        today = timezone.now().date()
+        start = today - timedelta(days=59)
+        with self.assertNumQueries(1):
+            data = self.call(study_statistics_range, start=str(start), end=str(today)).data
+        self.assertEqual(len(data['buckets']), 60)
+        self.assertEqual(data['buckets'][0], {'period': str(start), 'sessions': 0, 'total_minutes': 0})
+        self.assertEqual(data['total_sessions'], 5)
+
+    def test_range_granularities(self):
+        today = timezone.now().date()
+        start = today - timedelta(days=90)
+        for granularity in ('week', 'month', 'hour_of_week'):
+            data = self.call(
+                study_statistics_range, start=str(start), end=str(today), granularity=granularity
+            ).data
+            self.assertEqual(data['total_minutes'], 145, granularity)
+        self.assertEqual(len(data['buckets']), 168)
+
+    def test_range_rejects_bad_input(self):
+        for params in ({'start': 'nope'}, {'end': 'nope'}, {'end': '2025-02-30'}, {'granularity': 'year'},
+                       {'start': '2025-02-01', 'end': '2025-01-01'}):
+            self.assertEqual(self.call(study_statistics_range, **params).status_code, 400)
+
+
+class ProductivityReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='productivity', password='x')
+        cls.today = timezone.now().date()
+        # Completed plans on each of the last 3 days and on days 10-14 ago.
+        for days_ago in range(20):
+            day = cls.today - timedelta(days=days_ago)
+            DailyPlan.objects.create(user=cls.user, title='done', planned_date=day, priority='high',
+                                     is_completed=days_ago < 3 or 10 <= days_ago < 15)
+            DailyPlan.objects.create(user=cls.user, title='open', planned_date=day, priority='low')
+
+    def call(self, view, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def assertStreaksUpToDate(self):
+        self.assertEqual(stored_streaks(CompletionStreak), compute_streaks(UserDailyStats))
+
+    def test_streaks_follow_plan_changes(self):
+        self.assertEqual(sorted((run.start, run.days) for run in CompletionStreak.objects.all()), [
+            (self.today - timedelta(days=14), 5), (self.today - timedelta(days=2), 3)])
+        rng = random.Random(7)
+        plans = list(DailyPlan.objects.filter(user=self.user))
+        for _ in range(150):
+            plan = rng.choice(plans)
+            action = rng.random()
+            if action < 0.7:
+                plan.is_completed = not plan.is_completed
+                plan.save()
+            elif action < 0.85:
+                plan.planned_date = self.today - timedelta(days=rng.randrange(20))
+                plan.save()
+            else:
+                plan.delete()
+                plans.remove(plan)
+                plans.append(DailyPlan.objects.create(
+                    user=self.user, title='new', planned_date=self.today - timedelta(days=rng.randrange(20)),
+                    is_completed=rng.random() < 0.5))
+            self.assertStreaksUpToDate()
+
+    def test_report(self):
+        ArchivedDailyPlan.objects.create(
+            id=10 ** 6, user=self.user, title='archived', priority='medium', is_completed=True,
+            planned_date=self.today - timedelta(days=19), created_at=timezone.now(), updated_at=timezone.now())
+        with self.assertNumQueries(4):
+            data = self.call(productivity_range, start=str(self.today - timedelta(days=19))).data
+        self.assertEqual((data['completed'], data['total'], data['completion_rate']), (8, 40, 20.0))
+        self.assertEqual(data['active_days'], 8)
+        self.assertEqual(data['rolling'], {
+            'last_7_days': {'completed': 3, 'total': 14, 'completion_rate': 21.43},
+            'last_30_days': {'completed': 8, 'total': 40, 'completion_rate': 20.0},
+        })
+        self.assertEqual(data['by_priority'], {
+            'high': {'completed': 8, 'total': 20, 'completion_rate': 40.0},
+            'medium': {'completed': 1, 'total': 1, 'completion_rate': 100.0},
+            'low': {'completed': 0, 'total': 20, 'completion_rate': 0},
+        })
+        self.assertEqual(data['streaks'], {
+            'current': 3, 'current_start': str(self.today - timedelta(days=2)),
+            'longest': 5, 'longest_start': str(self.today - timedelta(days=14)),
+            'longest_end': str(self.today - timedelta(days=10)),
+        })
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/api/async/statistics/productivity/range/?start={self.today - timedelta(days=19)}')
+        self.assertEqual(response.json(), json.loads(json.dumps(data)))
+        self.assertEqual(self.call(productivity_range, start='2025-02-01', end='2025-01-01').status_code, 400)
+        self.assertEqual(self.call(productivity_range, end='abc').status_code, 400)
+
+    def test_rebuild_and_verify(self):
+        CompletionStreak.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_daily_stats', verify=True, stdout=StringIO())
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        self.assertEqual(CompletionStreak.objects.count(), 2)
+        call_command('rebuild_daily_stats', verify=True, stdout=StringIO())
+
+    def test_user_delete(self):
+        self.user.delete()
+        self.assertFalse(CompletionStreak.objects.exists())
+
+
+class CalendarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='calendar', password='x')
+        other = User.objects.create_user(username='calendar-other', password='x')
+        cls.start = date(2026, 3, 1)
+        noon = timezone.make_aware(datetime.combine(cls.start, datetime.min.time())) + timedelta(hours=12)
+        for user in (cls.user, other):
+            DailyPlan.objects.create(user=user, title='low', priority='low', planned_date=cls.start)
+            DailyPlan.objects.create(user=user, title='high', priority='high', planned_date=cls.start)
+            DailyPlan.objects.create(user=user, title='later', planned_date=cls.start + timedelta(days=41))
+            DailyPlan.objects.create(user=user, title='outside', planned_date=cls.start + timedelta(days=42))
+            StudySession.objects.create(user=user, subject='math', duration_minutes=30,
+                                        session_date=noon + timedelta(days=2))
+            Goal.objects.create(user=user, title='goal', description='d', target_date=cls.start + timedelta(days=2))
+            Reminder.objects.create(user=user, title='ping', message='m', reminder_time=noon - timedelta(minutes=1))
+        cls.archived = ArchivedDailyPlan.objects.create(
+            id=10 ** 6, user=cls.user, title='archived', priority='high', is_completed=True,
+            planned_date=cls.start, created_at=noon, updated_at=noon)
+
+    def call(self, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.user)
+        return calendar(request)
+
+    def test_grouped_by_day(self):
+        end = self.start + timedelta(days=41)
+        with self.assertNumQueries(4):
+            data = self.call(start=str(self.start), end=str(end)).data
+        self.assertEqual(list(data['days']), ['2026-03-01', '2026-03-03', '2026-04-11'])
+        first = data['days']['2026-03-01']
+        self.assertEqual([row[1] for row in first['plans']], ['high', 'low'])
+        self.assertEqual(first['reminders'][0][1:], ['ping', False, '11:59'])
+        self.assertEqual(data['columns']['sessions'], ['id', 'subject', 'duration_minutes', 'time'])
+        self.assertEqual(data['days']['2026-03-03']['sessions'][0][1:], ['math', 30, '12:00'])
+        self.assertEqual(data['days']['2026-03-03']['goals'][0][1:], ['goal', 'not_started'])
+        self.assertEqual(data['days']['2026-04-11'], {'plans': [data['days']['2026-04-11']['plans'][0]]})
+
+        with self.assertNumQueries(4):
+            data = self.call(start=str(self.start), end=str(self.start), include_archived=1).data
+        self.assertEqual([row[1] for row in data['days']['2026-03-01']['plans']], ['high', 'archived', 'low'])
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/api/async/calendar/?start={self.start}&end={end}')
+        self.assertEqual(response.json(), json.loads(json.dumps(self.call(start=str(self.start), end=str(end)).data)))
+
+    def test_rejects_bad_range(self):
+        for params in ({}, {'start': str(self.start)}, {'start': 'nope', 'end': 'nope'},
+                       {'start': str(self.start), 'end': str(self.start + timedelta(days=63))}):
+            self.assertEqual(self.call(**params).status_code, 400)
+
+
+class DailyStatsRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rollup', password='x')
+
+    def stats(self, day=None):
+        row = UserDailyStats.objects.filter(user=self.user, date=day or date.today()).first()
+        return row and {field: getattr(row, field) for field in (
+            'session_count', 'study_minutes', 'rating_count', 'plans_total', 'plans_completed')}
+
+    def assertMatchesRawTables(self):
+        expected = {key: dict(fields) for key, fields in compute_daily_stats(StudySession, DailyPlan).items()}
+        stored = {key: fields for key, fields in stored_daily_stats(UserDailyStats).items() if any(fields.values())}
+        self.assertEqual(stored, expected)
+
+    def test_saves_and_deletes_apply_deltas(self):
+        session = StudySession.objects.create(user=self.user, subject='s', duration_minutes=30, rating=4)
+        plan = DailyPlan.objects.create(user=self.user, title='p', planned_date=date.today())
+        self.assertEqual(self.stats(), {'session_count': 1, 'study_minutes': 30, 'rating_count': 1,
+                                        'plans_total': 1, 'plans_completed': 0})
+        session.duration_minutes = 45
+        session.save()
+        plan.is_completed = True
+        plan.save()
+        self.assertEqual(self.stats()['study_minutes'], 45)
+        self.assertEqual(self.stats()['plans_completed'], 1)
+
+        plan.planned_date = date.today() + timedelta(days=1)
+        plan.save()
+        self.assertEqual(self.stats()['plans_total'], 0)
+        self.assertEqual(self.stats(plan.planned_date)['plans_completed'], 1)
+
+        session.delete()
+        self.assertEqual(self.stats()['session_count'], 0)
+        self.assertMatchesRawTables()
+
+    def test_deferred_and_queryset_paths(self):
+        plan = DailyPlan.objects.create(user=self.user, title='p', planned_date=date.today())
+        partial = DailyPlan.objects.only('title').get(pk=plan.pk)
+        partial.is_completed = True
+        partial.save()
+        self.assertEqual(self.stats()['plans_completed'], 1)
+        DailyPlan.objects.filter(pk=plan.pk).delete()
+        self.assertEqual(self.stats()['plans_total'], 0)
+
+    def test_bulk_view_and_rebuild(self):
+        payload = {'create': [{'subject': 'math', 'duration_minutes': 25}] * 4}
+        request = APIRequestFactory().post('/bulk/', payload, format='json')
+        force_authenticate(request, user=self.user)
+        StudySessionBulkView.as_view()(request)
+        self.assertEqual(self.stats()['study_minutes'], 100)
+        self.assertMatchesRawTables()
+
+        UserDailyStats.objects.update(study_minutes=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_daily_stats', verify=True, stdout=StringIO())
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        call_command('rebuild_daily_stats', verify=True, stdout=StringIO())
+        self.assertEqual(self.stats()['study_minutes'], 100)
+
+
+class SparseFieldsetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='sparse', password='x')
+        cls.note = Note.objects.create(user=cls.user, title='long', content='word ' * 1000)
+
+    def list_notes(self, **params):
+        request = APIRequestFactory().get('/api/notes/', params)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            data = NoteListCreateView.as_view()(request).data
+        sql = next(q['sql'] for q in queries if '"app_note"."title"' in q['sql'])
+        return data['results'], sql
+
+    def test_preview_never_loads_content(self):
+        results, sql = self.list_notes(preview='1')
+        self.assertNotIn('content', results[0])
+        self.assertEqual(len(results[0]['content_preview']), 200)
+        self.assertTrue(results[0]['content_preview'].endswith('…'))
+        self.assertNotIn('"app_note"."content",', sql.replace('SUBSTR("app_note"."content"', ''))
+        self.assertIn('SUBSTR', sql)
+
+    def test_fields_and_omit(self):
+        results, sql = self.list_notes(fields='title,category')
+        self.assertEqual(set(results[0]), {'id', 'title', 'category'})
+        self.assertNotIn('"app_note"."content"', sql)
+        results, _ = self.list_notes(omit='content,user')
+        self.assertNotIn('content', results[0])
+        self.assertIn('title', results[0])
+
+    def test_writes_and_nested_serializers_ignore_query(self):
+        request = APIRequestFactory().post('/api/notes/?fields=title', {'title': 't', 'content': 'c'}, format='json')
+        force_authenticate(request, user=self.user)
+        response = NoteListCreateView.as_view()(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('content', response.data)
+
+        cache.clear()
+        request = APIRequestFactory().get('/api/dashboard/', {'fields': 'total_notes'})
+        force_authenticate(request, user=self.user)
+        recent = DashboardView.as_view()(request).data['recent_notes']
+        self.assertIn('content_preview', recent[0])
+        self.assertIn('title', recent[0])
+
+
+class ConditionalRequestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='etag', password='x')
+        cls.notes = [Note.objects.create(user=cls.user, title=f'n{i}', content='c') for i in range(3)]
+
+    def call(self, view, method='get', data=None, headers=None, **kwargs):
+        request = getattr(APIRequestFactory(), method)('/api/notes/', data, format='json', headers=headers)
+        force_authenticate(request, user=self.user)
+        response = view.as_view()(request, **kwargs)
+        response.render() if hasattr(response, 'render') else None
+        return response
+
+    def test_list_not_modified_before_serialization(self):
+        etag = self.call(NoteListCreateView)['ETag']
+        with self.assertNumQueries(1):
+            response = self.call(NoteListCreateView, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_on_edit_and_delete(self):
+        etag = self.call(NoteListCreateView)['ETag']
+        self.notes[0].title = 'edited'
+        self.notes[0].save()
+        edited = self.call(NoteListCreateView, headers={'If-None-Match': etag})
+        self.assertEqual(edited.status_code, 200)
+        self.notes[1].delete()
+        deleted = self.call(NoteListCreateView, headers={'If-None-Match': edited['ETag']})
+        self.assertEqual(deleted.status_code, 200)
+        self.assertEqual(len(deleted.data['results']), 2)
+
+    def test_detail_conditional_get(self):
+        pk = self.notes[0].pk
+        first = self.call(NoteDetailView, pk=pk)
+        self.assertIn('Last-Modified', first)
+        self.assertEqual(self.call(NoteDetailView, pk=pk, headers={'If-None-Match': first['ETag']}).status_code, 304)
+        since = self.call(NoteDetailView, pk=pk, headers={'If-Modified-Since': first['Last-Modified']})
+        self.assertEqual(since.status_code, 304)
+        self.assertEqual(self.call(NoteDetailView, pk=999999).status_code, 404)
+
+    def test_sparse_detail_has_its_own_etag(self):
+        pk = self.notes[0].pk
+        full = self.call(NoteDetailView, pk=pk)
+        sparse = self.call(NoteDetailView, data={'fields': 'title'}, pk=pk, headers={'If-None-Match': full['ETag']})
+        self.assertEqual(sparse.status_code, 200)
+        self.assertEqual(set(sparse.data), {'id', 'title'})
+        self.assertNotEqual(sparse['ETag'], full['ETag'])
+
+    def test_if_match_guards_writes(self):
+        pk = self.notes[2].pk
+        etag = self.call(NoteDetailView, pk=pk)['ETag']
+        updated = self.call(NoteDetailView, 'patch', {'title': 'mine'}, {'If-Match': etag}, pk=pk)
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated['ETag'], etag)
+
+        stale = self.call(NoteDetailView, 'patch', {'title': 'theirs'}, {'If-Match': etag}, pk=pk)
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(self.call(NoteDetailView, 'delete', headers={'If-Match': etag}, pk=pk).status_code, 412)
+        self.assertEqual(Note.objects.get(pk=pk).title, 'mine')
+        deleted = self.call(NoteDetailView, 'delete', headers={'If-Match': updated['ETag']}, pk=pk)
+        self.assertEqual(deleted.status_code, 204)
+
+
+class SyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='sync', password='x')
+        cls.other = User.objects.create_user(username='sync-other', password='x')
+
+    def sync(self, token=None, **params):
+        request = APIRequestFactory().get('/api/sync/', {'since': token, **params} if token else None)
+        force_authenticate(request, user=self.user)
+        return SyncView.as_view()(request)
+
+    def test_changes_and_tombstones_since_token(self):
+        kept = Note.objects.create(user=self.user, title='kept', content='c')
+        token = self.sync().data['token']
+
+        kept.title = 'edited'
+        kept.save()
+        gone = Goal.objects.create(user=self.user, title='g', description='d', target_date=date.today())
+        gone_pk = gone.pk
+        gone.delete()
+        plan = DailyPlan.objects.create(user=self.user, title='p', planned_date=date.today())
+        Note.objects.create(user=self.other, title='not mine', content='c')
+
+        data = self.sync(token).data
+        self.assertFalse(data['reset'])
+        self.assertEqual([n['title'] for n in data['changed']['notes']], ['edited'])
+        self.assertEqual([p['id'] for p in data['changed']['daily_plans']], [plan.pk])
+        self.assertEqual(data['changed']['goals'], [])
+        self.assertEqual(data['deleted']['goals'], [gone_pk])
+
+        quiet = self.sync(data['token']).data
+        self.assertEqual(sum(map(len, quiet['changed'].values())), 0)
+        self.assertEqual(sum(map(len, quiet['deleted'].values())), 0)
+
+    def test_archived_rows_are_not_tombstones(self):
+        token = self.sync().data['token']
+        session = StudySession.objects.create(user=self.user, subject='old', duration_minutes=10,
+                                              session_date=timezone.now() - timedelta(days=1000))
+        archive.archive_rows(StudySession, days=30)
+
+        data = self.sync(token).data
+        self.assertEqual([s['id'] for s in data['changed']['study_sessions']], [session.pk])
+        self.assertEqual(data['deleted']['study_sessions'], [])
+
+    @override_settings(SYNC_MAX_CHANGES=2)
+    def test_large_backlogs_are_paged(self):
+        token = self.sync().data['token']
+        for i in range(5):
+            StudySession.objects.create(user=self.user, subject=f's{i}', duration_minutes=10)
+        seen = []
+        while True:
+            data = self.sync(token).data
+            seen.extend(s['subject'] for s in data['changed']['study_sessions'])
+            token = data['token']
+            if not data['more']:
+                break
+        self.assertEqual(sorted(seen), [f's{i}' for i in range(5)])
+
+    def test_expired_and_invalid_tokens(self):
+        old = changelog.encode_token(0, time.time() - 31 * 86400)
+        self.assertTrue(self.sync(old).data['reset'])
+        self.assertEqual(self.sync('garbage').status_code, 400)
+
+    def test_compaction_keeps_latest_entry(self):
+        old = Note.objects.create(user=self.user, title='old', content='c')
+        ChangeLogEntry.objects.filter(object_id=old.pk).update(created_at=timezone.now() - timedelta(days=60))
+        note = Note.objects.create(user=self.user, title='a', content='c')
+        for title in 'bcd':
+            note.title = title
+            note.save()
+        Note.objects.create(user=self.other, title='x', content='c')
+        self.other.delete()
+
+        # a, b and c are superseded by d; the other user's upsert by its delete.
+        superseded, expired, orphaned = changelog.compact_changelog(batch_size=2)
+        self.assertEqual((superseded, expired, orphaned), (4, 1, 1))
+        self.assertEqual(list(ChangeLogEntry.objects.values_list('object_id', 'action')),
+                         [(note.pk, 'upsert')])
+
+
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='async', password='x')
+        for i in range(7):
+            Note.objects.create(user=cls.user, title=f'n{i}', content='word ' * 100)
+        DailyPlan.objects.create(user=cls.user, title='p', planned_date=date.today(), is_completed=True)
+        StudySession.objects.create(user=cls.user, subject='s', duration_minutes=30)
+
+    def sync_get(self, url, **params):
+        self.client.force_login(self.user)
+        return self.client.get(url, params).json()
+
+    async def async_get(self, url, **params):
+        await self.async_client.aforce_login(self.user)
+        return await self.async_client.get(url, params)
+
+    async def test_payloads_match_sync_views(self):
+        cache.clear()
+        for path in ('dashboard/', 'statistics/study/', 'statistics/productivity/',
+                     'statistics/study/range/?granularity=week'):
+            response = await self.async_get(f'/api/async/{path}')
+            self.assertEqual(response.status_code, 200, path)
+            cache.clear()
+            expected = await sync_to_async(self.sync_get)(f'/api/{path}')
+            self.assertEqual(response.json(), expected, path)
+
+    async def test_list_pages_and_conditional_get(self):
+        first = await self.async_get('/api/async/notes/', page_size=5, preview=1)
+        data = first.json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIn('content_preview', data['results'][0])
+        rest = (await self.async_client.get(data['next'])).json()
+        self.assertEqual(len(rest['results']), 2)
+
+        expected = await sync_to_async(self.sync_get)('/api/notes/', page_size=5, preview=1)
+        self.assertEqual(data['results'], expected['results'])
+
+        again = await self.async_client.get(
+            '/api/async/notes/', {'page_size': 5, 'preview': 1}, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+    async def test_rejects_anonymous_and_bad_input(self):
+        self.assertEqual((await self.async_client.get('/api/async/dashboard/')).status_code, 403)
+        self.assertEqual((await self.async_get('/api/async/statistics/study/range/', start='x')).status_code, 400)
+        self.assertEqual((await self.async_get('/api/async/goals/', cursor='junk')).status_code, 404)
+
+
+# The production profile's connection settings; the tests run with SQLite's defaults.
+PRODUCTION_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000}
+
+
+@override_settings(SQLITE_PRAGMAS=PRODUCTION_PRAGMAS)
+class DatabaseProfileTests(TestCase):
+
+    def scratch_settings(self, directory, name):
+        # The test database lives in memory, so use a scratch file to
+        # exercise real WAL locking.
+        return {**connection.settings_dict, 'NAME': os.path.join(directory, name),
+                'OPTIONS': {'transaction_mode': 'IMMEDIATE'}}
+
+    def test_pragmas_applied(self):
+        with tempfile.TemporaryDirectory() as directory:
+            scratch = DatabaseWrapper(self.scratch_settings(directory, 'pragmas.sqlite3'))
+            with scratch.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 5000)
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            scratch.close()
+
+    def test_router_sends_read_only_requests_to_replica(self):
+        router = ReadWriteRouter()
+        self.assertEqual(router.db_for_read(Note), 'default')
+        token = read_only_request.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Note), 'default')  # TestCase is inside atomic()
+            with patch.object(connection, 'in_atomic_block', False):
+                self.assertEqual(router.db_for_read(Note), 'replica')
+        finally:
+            read_only_request.reset(token)
+        self.assertEqual(router.db_for_write(Note), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'app'))
+
+    def test_fifty_concurrent_writers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = self.scratch_settings(directory, 'writers.sqlite3')
+            setup = DatabaseWrapper(settings_dict)
+            with setup.cursor() as cursor:
+                cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER)')
+                cursor.execute('INSERT INTO counter VALUES (1, 0)')
+
+            errors, start = [], threading.Barrier(50)
+
+            def writer():
+                connections['writers'] = DatabaseWrapper(settings_dict, alias='writers')
+                try:
+                    start.wait()
+                    for _ in range(20):
+                        # Read-modify-write, as a view saving a model does.
+                        with transaction.atomic(using='writers'), connections['writers'].cursor() as cursor:
+                            cursor.execute('SELECT value FROM counter WHERE id = 1')
+                            value = cursor.fetchone()[0]
+                            cursor.execute('UPDATE counter SET value = %s WHERE id = 1', [value + 1])
+                except Exception as exc:
+                    errors.append(exc)
+                finally:
+                    connections['writers'].close()
+
+            threads = [threading.Thread(target=writer) for _ in range(50)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            with setup.cursor() as cursor:
+                cursor.execute('SELECT value FROM counter')
+                self.assertEqual(cursor.fetchone()[0], 1000)
+            setup.close()
+        self.assertEqual(errors, [])
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='pager', password='x')
+        base = timezone.now() - timedelta(days=30)
+        notes = Note.objects.bulk_create([
+            Note(user=cls.user, title=f'n{i}', content='c', is_pinned=i % 7 == 0)
+            for i in range(45)
+        ])
+        # Repeat updated_at values so ties have to be broken by id.
+        for i, note in enumerate(notes):
+            note.updated_at = base + timedelta(hours=i // 3)
+        Note.objects.bulk_update(notes, ['updated_at'])
+
+    def list_notes(self, url='/api/notes/', **params):
+        # Links already carry their query string; only add params to bare urls.
+        request = APIRequestFactory().get(url, params or None)
+        force_authenticate(request, user=self.user)
+        return NoteListCreateView.as_view()(request).data
+
+    def walk(self, page_size):
+        ids, url = [], f'/api/notes/?page_size={page_size}'
+        while url:
+            page = self.list_notes(url)
+            ids.extend(note['id'] for note in page['results'])
+            url = page['next']
+        return ids
+
+    def test_pages_cover_ordering_exactly_once(self):
+        expected = list(Note.objects.filter(user=self.user).order_by('-is_pinned', '-updated_at', 'id')
+                        .values_list('id', flat=True))
+        for page_size in (1, 4, 10, 50):
+            self.assertEqual(self.walk(page_size), expected)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.list_notes(page_size=10)
+        second = self.list_notes(first['next'])
+        back = self.list_notes(second['previous'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(first['previous'])
+
+    def test_concurrent_inserts_do_not_shift_pages(self):
+        first = self.list_notes(page_size=10)
+        Note.objects.create(user=self.user, title='new', content='c', is_pinned=True)
+        second = self.list_notes(first['next'])
+        seen = {note['id'] for note in first['results']}
+        self.assertFalse(seen & {note['id'] for note in second['results']})
+        self.assertEqual(len(second['results']), 10)
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(len(self.list_notes(page_size=10_000)['results']), 45)
+        with patch.object(KeysetPagination, 'max_page_size', 5):
+            self.assertEqual(len(self.list_notes(page_size=10_000)['results']), 5)
+
+    def test_bad_cursor(self):
+        request = APIRequestFactory().get('/api/notes/', {'cursor': 'garbage'})
+        force_authenticate(request, user=self.user)
+        self.assertEqual(NoteListCreateView.as_view()(request).status_code, 404)
+
+    def test_deep_page_seeks_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written against SQLite.')
+        paginator = NoteListCreateView.pagination_class()
+        queryset = Note.objects.filter(user=self.user)
+        paginator.ordering = paginator.get_ordering(queryset)
+        note = queryset.order_by('-is_pinned', '-updated_at', 'id')[30]
+        paginator.fields = [Note._meta.get_field(name.lstrip('-')) for name in paginator.ordering]
+        position = paginator.sort_key(note)
+        with CaptureQueriesContext(connection) as queries:
+            paginator.fetch(queryset, position, reverse=False, limit=10)
+        self.assertGreater(len(queries), 1)
+        for query in queries:
+            plan = connection.cursor().execute('EXPLAIN QUERY PLAN ' + query['sql']).fetchall()
+            plan = '\n'.join(str(row[-1]) for row in plan)
+            self.assertRegex(plan, r'note_user_pinned_updated_idx \(user_id=\? AND is_pinned=\? AND', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class NoteSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='searcher', password='x')
+        cls.other = User.objects.create_user(username='other', password='x')
+        cls.title_hit = Note.objects.create(user=cls.user, title='Photosynthesis', content='Plants and light.')
+        cls.body_hit = Note.objects.create(
+            user=cls.user, title='Biology', content='Chapter on photosynthesis <b>basics</b>.', category='work'
+        )
+        Note.objects.create(user=cls.user, title='Chemistry', content='Acids and bases.')
+        Note.objects.create(user=cls.other, title='Photosynthesis', content='Not yours.')
+
+    def setUp(self):
+        if not fts_available():
+            self.skipTest('FTS5 search requires SQLite.')
+
+    def search(self, **params):
+        request = APIRequestFactory().get('/api/notes/search/', params)
+        force_authenticate(request, user=self.user)
+        return NoteSearchView.as_view()(request)
+
+    def test_ranks_title_matches_first(self):
+        results = self.search(q='photosynthesis').data['results']
+        self.assertEqual([note['id'] for note in results], [self.title_hit.id, self.body_hit.id])
+        self.assertEqual(results[0]['title_highlight'], '<mark>Photosynthesis</mark>')
+
+    def test_prefix_match_and_escaped_snippet(self):
+        results = self.search(q='photo').data['results']
+        self.assertEqual(len(results), 2)
+        self.assertIn('<mark>photosynthesis</mark> &lt;b&gt;basics', results[1]['snippet'])
+
+    def test_category_filter(self):
+        results = self.search(q='photosynthesis', category='work').data['results']
+        self.assertEqual([note['id'] for note in results], [self.body_hit.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.title_hit.title = 'Respiration'
+        self.title_hit.content = 'Mitochondria'
+        self.title_hit.save()
+        self.assertEqual(len(self.search(q='photosynthesis').data['results']), 1)
+        self.assertEqual(len(self.search(q='mitochondria').data['results']), 1)
+        self.body_hit.delete()
+        self.assertEqual(self.search(q='photosynthesis').data['results'], [])
+
+    def test_operators_in_input_are_inert(self):
+        self.assertEqual(self.search(q='photo* OR "').status_code, 200)
+        self.assertEqual(self.search(q='   ').status_code, 400)
+
+    def test_admin_search_uses_index(self):
+        admin = NoteAdmin(Note, AdminSite())
+        queryset, _ = admin.get_search_results(None, Note.objects.all(), 'photosynth')
+        self.assertIn('app_note_fts', str(queryset.query))
+        self.assertEqual(queryset.count(), 3)
+
+
+class BulkMutationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bulk', password='x')
+        cls.other = User.objects.create_user(username='bulk-other', password='x')
+        cls.plans = DailyPlan.objects.bulk_create([
+            DailyPlan(user=cls.user, title=f'p{i}', planned_date=date.today()) for i in range(5)
+        ])
+        cls.foreign = DailyPlan.objects.create(user=cls.other, title='not mine')
+        rebuild_daily_stats(StudySession, DailyPlan, UserDailyStats)
+
+    def post(self, view, payload):
+        request = APIRequestFactory().post('/bulk/', payload, format='json')
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request)
+
+    def test_batch_costs_constant_queries(self):
+        payload = {
+            'create': [{'title': f'new{i}', 'planned_date': str(date.today())} for i in range(20)],
+            'update': [{'id': plan.id, 'is_completed': True} for plan in self.plans[:3]],
+            'delete': [self.plans[4].id],
+        }
+        # in_bulk, delete lookup, savepoint, INSERT, UPDATE, delete
+        # collector SELECT + DELETE, one rollup UPDATE for the day, the
+        # day's completed count, its streaks and the INSERT of a new one,
+        # one change log INSERT, release.
+        with self.assertNumQueries(13):
+            response = self.post(DailyPlanBulkView, payload)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['create']), 20)
+        self.assertEqual(DailyPlan.objects.filter(user=self.user).count(), 24)
+        done = DailyPlan.objects.filter(user=self.user, is_completed=True)
+        self.assertEqual(done.count(), 3)
+        self.assertFalse(done.filter(completed_at__isnull=True).exists())
+        self.assertFalse(DailyPlan.objects.filter(pk=self.plans[4].pk).exists())
+
+    def test_invalid_item_rolls_back_whole_batch(self):
+        payload = {
+            'create': [{'title': 'ok', 'planned_date': str(date.today())}, {'title': ''}],
+            'update': [{'id': self.foreign.id, 'title': 'stolen'}],
+            'delete': [self.plans[0].id],
+        }
+        response = self.post(DailyPlanBulkView, payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['create'][0]['status'], 201)
+        self.assertEqual(response.data['create'][1]['status'], 400)
+        self.assertEqual(response.data['update'][0]['status'], 404)
+        self.assertEqual(DailyPlan.objects.filter(user=self.user).count(), 5)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.title, 'not mine')
+
+    def test_study_sessions(self):
+        payload = {'create': [{'subject': 'math', 'duration_minutes': 30}] * 3}
+        response = self.post(StudySessionBulkView, payload)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(StudySession.objects.filter(user=self.user).count(), 3)
+
+    def test_patch_completes_in_one_update(self):
+        plan = self.plans[0]
+        request = APIRequestFactory().patch('/', {'is_completed': True}, format='json')
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            DailyPlanDetailView.as_view()(request, pk=plan.pk)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "app_dailyplan"') for q in queries), 1)
+        plan.refresh_from_db()
+        self.assertIsNotNone(plan.completed_at)
+
+
+class PlanOrderingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='orderer', password='x')
+        cls.other = User.objects.create_user(username='orderer-other', password='x')
+        cls.plans = [
+            DailyPlan.objects.create(user=cls.user, title=f'{priority} {i}', priority=priority,
+                                     planned_date=date.today())
+            for priority in ('low', 'high', 'medium') for i in range(2)
+        ]
+        cls.foreign = DailyPlan.objects.create(user=cls.other, title='not mine')
+
+    def titles(self, **filters):
+        return list(DailyPlan.objects.filter(user=self.user, **filters).values_list('title', flat=True))
+
+    def move(self, plan, **body):
+        request = APIRequestFactory().post('/move/', body, format='json')
+        force_authenticate(request, user=self.user)
+        return DailyPlanMoveView.as_view()(request, pk=plan.pk)
+
+    def test_high_priority_first(self):
+        DailyPlan.objects.filter(title='high 0').update(is_completed=True)
+        self.assertEqual(self.titles(), ['high 1', 'high 0', 'medium 0', 'medium 1', 'low 0', 'low 1'])
+        self.assertEqual(
+            list(DailyPlan.objects.filter(user=self.user).values_list('priority_rank', flat=True)),
+            [3, 3, 2, 2, 1, 1])
+
+    def test_move_after_and_before(self):
+        low0, low1 = self.plans[:2]
+        response = self.move(low1, before=low0.pk)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.titles(priority='low'), ['low 1', 'low 0'])
+        self.assertEqual(response.data['position'], DailyPlan.objects.get(pk=low1.pk).position)
+
+        medium0, medium1 = self.plans[4:]
+        # Both plans, the plan after medium 1, the UPDATE and the change log INSERT.
+        with self.assertNumQueries(4):
+            self.assertEqual(self.move(medium0, after=medium1.pk).status_code, 200)
+        self.assertEqual(self.titles(priority='medium'), ['medium 1', 'medium 0'])
+
+    def test_adjacent_neighbours_make_room(self):
+        low0, low1 = self.plans[:2]
+        DailyPlan.objects.filter(pk=low0.pk).update(position=10)
+        DailyPlan.objects.filter(pk=low1.pk).update(position=11)
+        high0 = self.plans[2]
+        DailyPlan.objects.filter(pk=high0.pk).update(position=5)
+        low0.refresh_from_db()
+        before = dict(DailyPlan.objects.values_list('pk', 'updated_at'))
+        logged = ChangeLogEntry.objects.count()
+        move_plan(DailyPlan.objects.get(pk=self.plans[3].pk), after=low0)
+        # The shifted plans are logged and stamped like the moved one.
+        self.assertCountEqual(
+            ChangeLogEntry.objects.order_by('id')[logged:].values_list('object_id', flat=True),
+            [low0.pk, high0.pk, self.plans[3].pk])
+        changed = {pk for pk, updated_at in DailyPlan.objects.values_list('pk', 'updated_at')
+                   if updated_at != before[pk]}
+        self.assertEqual(changed, {low0.pk, high0.pk, self.plans[3].pk})
+        positions = dict(DailyPlan.objects.filter(user=self.user).values_list('title', 'position'))
+        self.assertEqual(positions['low 0'], 10 - GAP)
+        self.assertEqual(positions['high 0'], 5 - GAP)
+        self.assertEqual(positions['low 1'], 11)
+        self.assertLess(positions['low 0'], positions['high 1'])
+        self.assertLess(positions['high 1'], positions['low 1'])
+        self.assertEqual(DailyPlan.objects.get(pk=self.foreign.pk).position, self.foreign.position)
+
+    def test_move_rejects_bad_targets(self):
+        plan = self.plans[0]
+        self.assertEqual(self.move(plan).status_code, 400)
+        self.assertEqual(self.move(plan, after=self.plans[1].pk, before=self.plans[2].pk).status_code, 400)
+        self.assertEqual(self.move(plan, after='first').status_code, 400)
+        self.assertEqual(self.move(plan, after=plan.pk).status_code, 400)
+        self.assertEqual(self.move(plan, after=self.foreign.pk).status_code, 400)
+        self.assertEqual(self.move(self.foreign, after=plan.pk).status_code, 404)
+
+    def test_next_plans(self):
+        DailyPlan.objects.filter(title='high 0').update(is_completed=True)
+        request = APIRequestFactory().get('/next/', {'n': 3})
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(1):
+            response = DailyPlanNextView.as_view()(request)
+        self.assertEqual([plan['title'] for plan in response.data['results']], ['high 1', 'medium 0', 'medium 1'])
+
+
+class ReminderDispatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='remind', email='r@example.com', password='x')
+
+    def setUp(self):
+        reminders.outbox.clear()
+        self.now = timezone.now()
+
+    def make(self, minutes, **kwargs):
+        return Reminder.objects.create(
+            user=self.user, title='t', message='m',
+            reminder_time=self.now + timedelta(minutes=minutes), **kwargs,
+        )
+
+    def dispatcher(self):
+        return reminders.ReminderDispatcher(
+            backend=reminders.LocMemBackend(), clock=lambda: self.now,
+            horizon=timedelta(minutes=30),
+        )
+
+    def test_sends_only_due_reminders_once(self):
+        due = self.make(-1)
+        future = self.make(5)
+        self.make(-2, is_sent=True)
+        dispatcher = self.dispatcher()
+        dispatcher.refresh()
+        self.assertEqual(dispatcher.dispatch_due(), 1)
+        self.assertEqual([r.id for r in reminders.outbox], [due.id])
+        self.assertEqual(reminders.outbox[0].email, 'r@example.com')
+        self.now += timedelta(minutes=6)
+        self.assertEqual(dispatcher.dispatch_due(), 1)
+        self.assertEqual(reminders.outbox[-1].id, future.id)
+        self.assertFalse(Reminder.objects.filter(is_sent=False).exists())
+
+    def test_claim_stores_timestamps_like_the_orm(self):
+        # With UPDATE ... RETURNING, and with the SELECT-then-UPDATE fallback.
+        for returning in (True, False):
+            with self.subTest(returning=returning), patch.object(reminders, '_supports_returning', lambda: returning):
+                due = self.make(-1)
+                self.assertEqual([r.id for r in reminders.claim_reminders([due.id], self.now)], [due.id])
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT updated_at FROM app_reminder WHERE id = %s', [due.id])
+                    updated_at, = cursor.fetchone()
+                # Naive UTC, with no '+00:00' suffix for the driver to read back.
+                self.assertEqual(updated_at, self.now.replace(tzinfo=None))
+        self.assertEqual(Reminder.objects.filter(updated_at=self.now).count(), 2)
+
+    def test_competing_dispatchers_never_double_send(self):
+        created = [self.make(-1) for _ in range(20)]
+        first, second = self.dispatcher(), self.dispatcher()
+        first.refresh()
+        second.refresh()
+        self.assertEqual(first.dispatch_due() + second.dispatch_due(), 20)
+        self.assertCountEqual([r.id for r in reminders.outbox], [r.id for r in created])
+
+    def test_refresh_picks_up_new_and_edited_reminders(self):
+        moved = self.make(20)
+        dispatcher = self.dispatcher()
+        dispatcher.refresh()
+        self.now += timedelta(seconds=10)
+        added = self.make(-1)
+        moved.reminder_time = self.now - timedelta(seconds=1)
+        moved.save()
+        dispatcher.refresh()
+        self.assertEqual(dispatcher.dispatch_due(), 2)
+        self.assertCountEqual([r.id for r in reminders.outbox], [added.id, moved.id])
+
+    def test_failed_delivery_is_released(self):
+        reminder = self.make(-1)
+
+        class Broken(reminders.BaseReminderBackend):
+            def send_messages(self, batch):
+                raise RuntimeError('smtp down')
+
+        dispatcher = self.dispatcher()
+        dispatcher.backend = Broken()
+        dispatcher.refresh()
+        with self.assertLogs('app.reminders', 'ERROR'):
+            self.assertEqual(dispatcher.dispatch_due(), 0)
+        reminder.refresh_from_db()
+        self.assertFalse(reminder.is_sent)
+
+    def test_throughput_exceeds_10k_per_minute(self):
+        Reminder.objects.bulk_create([
+            Reminder(user=self.user, title='t', message='m', reminder_time=self.now - timedelta(seconds=1))
+            for _ in range(10_000)
+        ])
+        dispatcher = self.dispatcher()
+        started = time.perf_counter()
+        dispatcher.refresh()
+        sent = dispatcher.dispatch_due()
+        elapsed = time.perf_counter() - started
+        self.assertEqual(sent, 10_000)
+        self.assertLess(elapsed, 60)
+
+
+class TokenAuthTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='script@example.com', password='pw-tokens-1')
+        UserProfile.objects.create(user=cls.user)
+
+    def setUp(self):
+        tokens.token_cache.clear()
+
+    def issue(self, **extra):
+        credentials = {'email': 'script@example.com', 'password': 'pw-tokens-1'}
+        response = self.client.post('/api/auth/tokens/', dict(credentials, **extra))
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def bearer(self, raw):
+        return {'Authorization': f'Bearer {raw}'}
+
+    def test_cached_token_costs_no_queries_or_hashing(self):
+        raw = self.issue(name='cron')['token']
+        self.assertEqual(self.client.get('/api/auth/user/', headers=self.bearer(raw)).status_code, 200)
+        with patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.verify') as verify, self.assertNumQueries(0):
+            response = self.client.get('/api/auth/user/', headers=self.bearer(raw))
+        verify.assert_not_called()
+        self.assertEqual(response.json()['username'], 'script@example.com')
+        self.assertEqual(response.json()['profile']['username'], 'script@example.com')
+
+    def test_rotate_and_revoke_take_effect_immediately(self):
+        first = self.issue(name='ci')
+        self.client.get('/api/auth/user/', headers=self.bearer(first['token']))
+        rotated = self.client.post('/api/auth/tokens/rotate/', headers=self.bearer(first['token'])).json()
+        self.assertEqual(rotated['name'], 'ci')
+        self.assertEqual(self.client.get('/api/auth/user/', headers=self.bearer(first['token'])).status_code, 403)
+        self.assertEqual(self.client.get('/api/auth/user/', headers=self.bearer(rotated['token'])).status_code, 200)
+
+        listed = self.client.get('/api/auth/tokens/', headers=self.bearer(rotated['token'])).json()
+        self.assertEqual([token['id'] for token in listed], [rotated['id']])
+        self.assertNotIn('token', listed[0])
+        revoke = self.client.delete(f"/api/auth/tokens/{rotated['id']}/", headers=self.bearer(rotated['token']))
+        self.assertEqual(revoke.status_code, 204)
+        self.assertEqual(self.client.get('/api/auth/user/', headers=self.bearer(rotated['token'])).status_code, 403)
+
+    def test_logout_revokes_token(self):
+        raw = self.issue()['token']
+        self.assertEqual(self.client.post('/api/auth/logout/', headers=self.bearer(raw)).status_code, 200)
+        self.assertFalse(AuthToken.objects.exists())
+        self.assertEqual(self.client.get('/api/auth/user/', headers=self.bearer(raw)).status_code, 403)
+
+    def test_rejects_bad_expired_and_basic_credentials(self):
+        wrong = self.client.post('/api/auth/tokens/', {'email': 'script@example.com', 'password': 'wrong'})
+        self.assertEqual(wrong.status_code, 400)
+        self.assertEqual(self.client.get('/api/auth/user/', headers=self.bearer('nope')).status_code, 403)
+        raw = self.issue()['token']
+        AuthToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.client.get('/api/auth/user/', headers=self.bearer(raw)).status_code, 403)
+        basic = base64.b64encode(b'script@example.com:pw-tokens-1').decode()
+        response = self.client.get('/api/auth/user/', headers={'Authorization': f'Basic {basic}'})
+        self.assertEqual(response.status_code, 403)
+
+    async def test_async_views_accept_tokens(self):
+        _, raw = await sync_to_async(tokens.issue_token)(self.user)
+        response = await self.async_client.get('/api/async/notes/', headers=self.bearer(raw))
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/async/notes/', headers=self.bearer('nope'))
+        self.assertEqual(response.status_code, 403)
+
+
+class SessionAuthTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='session@example.com', password='pw-session-1')
+        UserProfile.objects.create(user=cls.user, location='Pune')
+
+    def setUp(self):
+        sessions.user_cache.clear()
+        self.client.force_login(self.user)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_session_user_costs_no_queries(self):
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/user/')
+        self.assertEqual(response.json()['profile']['location'], 'Pune')
+
+    def test_saves_and_password_changes_miss_the_cache(self):
+        self.client.get('/api/auth/user/')
+        self.user.profile.location = 'Goa'
+        self.user.profile.save()
+        self.assertEqual(self.client.get('/api/auth/user/').json()['profile']['location'], 'Goa')
+
+        # A session logged in after a password change doesn't match the entry
+        # cached for the old one.
+        other = Client()
+        other.force_login(self.user)
+        User.objects.filter(pk=self.user.pk).update(password='changed')
+        sessions.user_cache.set(str(self.user.pk), ('stale', self.user))
+        self.assertEqual(other.get('/api/auth/user/').status_code, 403)
+
+        self.client.get('/api/auth/user/')
+        self.user.set_password('pw-session-2')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 403)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        client = Client()
+        client.force_login(self.user)
+        client.get('/api/auth/user/')
+        with self.assertNumQueries(0):
+            response = client.get('/api/auth/user/')
+        self.assertEqual(response.json()['username'], 'session@example.com')
+
+    def test_cached_sessions_need_a_shared_cache(self):
+        self.assertEqual(check_session_cache(None), [])
+        with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db'):
+            self.assertEqual([error.id for error in check_session_cache(None)], ['app.E001'])
+            with override_settings(CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                    'LOCATION': 'redis://127.0.0.1:6379'}}):
+                self.assertEqual(check_session_cache(None), [])
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        from django.contrib.sessions.models import Session
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{n:04d}', session_data='', expire_date=now - timedelta(days=1))
+            for n in range(25)
+        )
+        live = Session.objects.count() - 25
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('purge_sessions', batch_size=10, pause=0, stdout=out)
+        self.assertIn('Removed 25 expired sessions.', out.getvalue())
+        self.assertEqual(Session.objects.count(), live)
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 3)
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 200)
+
+    def test_benchmark_reports_every_mode(self):
+        out = StringIO()
+        call_command('benchmark_auth', requests=3, stdout=out)
+        modes = json.loads(out.getvalue())['modes']
+        self.assertEqual(list(modes), ['db, uncached', 'db', 'cache', 'cookie', 'token'])
+        for result in modes.values():
+            self.assertEqual(result['errors'], 0)
+        self.assertGreater(modes['db, uncached']['queries_mean'], modes['db']['queries_mean'])
+        self.assertLess(modes['cache']['queries_mean'], modes['db']['queries_mean'])
+        self.assertEqual(sessions.user_cache.ttl, 30)
+        self.assertEqual(User.objects.count(), 1)
+
+
+class ProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='profiled', password='x')
+        Note.objects.bulk_create(Note(user=cls.user, title=f'n{i}', content='c') for i in range(3))
+
+    def get(self, url):
+        client = Client()
+        client.force_login(self.user)
+        return client.get(url)
+
+    def timings(self, response):
+        return dict(
+            (part.split(';')[0].strip(), part) for part in response['Server-Timing'].split(',')
+        )
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_REQUEST_MS=0, PROFILING_SLOW_QUERY_MS=0)
+    def test_server_timing_and_slow_log(self):
+        with self.assertLogs('app.profiling', 'WARNING') as logs:
+            response = self.get('/api/notes/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        # Session, user, collection ETag and the page.
+        self.assertIn('desc="4 queries"', timings['db'])
+
+        events = [json.loads(line.split(':', 2)[2]) for line in logs.output]
+        request = next(event for event in events if event['event'] == 'slow_request')
+        self.assertEqual((request['path'], request['status'], request['queries']), ('/api/notes/', 200, 4))
+        self.assertGreater(request['serialize_ms'] + request['render_ms'], 0)
+        queries = [event for event in events if event['event'] == 'slow_query']
+        self.assertEqual(len(queries), 4)
+        self.assertNotIn(str(self.user.pk), queries[-1]['fingerprint'].replace('?', ''))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_async_views_are_profiled(self):
+        response = self.get('/api/async/notes/')
+        self.assertIn('desc="4 queries"', self.timings(response)['db'])
+
+    def test_off_unless_sampled(self):
+        self.assertNotIn('Server-Timing', self.get('/api/notes/'))
+        with override_settings(PROFILING_SAMPLE_RATE=0.01), patch('app.profiling.random.random', return_value=0.5):
+            self.assertNotIn('Server-Timing', self.get('/api/notes/'))
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            profiling.fingerprint("SELECT  a FROM t WHERE id IN (%s, %s, %s) AND name = 'it''s'\n LIMIT 21"),
+            'SELECT a FROM t WHERE id IN (?) AND name = ? LIMIT ?',
+        )
+
+
+class SeedAndLoadTestTests(TestCase):
+
+    def test_seed_then_load_test_every_route(self):
+        call_command('seed_focusmate', users=2, notes=5, daily_plans=20, study_sessions=15, goals=2,
+                     reminders=3, days=400, chunk_size=7, prefix='load', stdout=StringIO())
+        users = User.objects.filter(username__startswith='load')
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(Note.objects.filter(user__in=users).count(), 10)
+        self.assertEqual(DailyPlan.objects.filter(user__in=users).count(), 40)
+        self.assertTrue(DailyPlan.objects.filter(planned_date__lt=date.today() - timedelta(days=365)).exists())
+        self.assertEqual(stored_daily_stats(UserDailyStats), dict(compute_daily_stats(StudySession, DailyPlan)))
+        with self.assertRaises(CommandError):
+            call_command('seed_focusmate', users=1, prefix='load', stdout=StringIO())
+
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            call_command('load_test', requests=2, concurrency=1, prefix='load', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['rows_per_user']['notes'], 5)
+        self.assertEqual(len(report['routes']), 70)
+        for route, result in report['routes'].items():
+            self.assertEqual(result['errors'], 0, route)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # The session row, the collection ETag and the page.
+        self.assertEqual(report['routes']['GET notes/']['queries_max'], 3)
+        # Only the seeded rows and users are left.
+        self.assertEqual(Note.objects.count(), 10)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertFalse(AuthToken.objects.exists())
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='export@example.com', password='pw-export-1')
+        other = User.objects.create_user(username='other-export@example.com')
+        Note.objects.create(user=cls.user, title='Résumé, "draft"', content='line one\nline two')
+        Note.objects.create(user=other, title='not mine', content='x')
+        Goal.objects.create(user=cls.user, title='Ship', description='d', target_date=date(2026, 1, 31))
+        StudySession.objects.create(user=cls.user, subject='Maths', duration_minutes=45, rating=4)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn('focusmate-export.ndjson', response['Content-Disposition'])
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['model'] for row in rows], ['notes', 'study_sessions', 'goals'])
+        self.assertEqual(rows[0]['title'], 'Résumé, "draft"')
+        self.assertEqual(rows[0]['content'], 'line one\nline two')
+        self.assertNotIn('user_id', rows[0])
+        self.assertEqual(rows[2]['target_date'], '2026-01-31')
+
+    def test_csv_and_gzip(self):
+        response, body = self.export('?format=csv&models=notes,goals')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = list(csv.reader(body.decode().splitlines(keepends=True)))
+        self.assertEqual(lines[0][:3], ['model', 'id', 'title'])
+        self.assertEqual(lines[1][:3], ['notes', str(Note.objects.get(user=self.user).pk), 'Résumé, "draft"'])
+        self.assertEqual(lines[1][3], 'line one\nline two')
+        self.assertEqual(lines[2][:2], ['model', 'id'])
+        self.assertEqual(lines[3][0], 'goals')
+
+        response, compressed = self.export('?format=csv&models=notes,goals&gzip=1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('focusmate-export.csv.gz', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(compressed), body)
+
+    async def test_asgi_streams_piece_by_piece(self):
+        _, body = await sync_to_async(self.export)()
+        await self.async_client.aforce_login(self.user)
+        with patch('app.export.BUFFER_SIZE', 100):
+            response = await self.async_client.get('/api/export/')
+            self.assertTrue(response.is_async)
+            pieces = [piece async for piece in response.streaming_content]
+        self.assertGreater(len(pieces), 2)
+        self.assertEqual(b''.join(pieces), body)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/api/export/?models=notes,secrets').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/?format=xml').status_code, 404)
+        self.assertEqual(Client().get('/api/export/').status_code, 403)
+
+    @skipUnless(os.path.exists('/proc/self/statm'), 'needs /proc to read resident memory')
+    def test_memory_stays_flat_for_a_million_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000) "
+                "INSERT INTO app_studysession "
+                "(user_id, subject, duration_minutes, notes, rating, session_date, created_at, updated_at) "
+                "SELECT %s, 'Subject ' || i, 25, '', i %% 5 + 1, "
+                "'2026-01-01 09:00:00', '2026-01-01 09:00:00', '2026-01-01 09:00:00' FROM n",
+                [self.user.pk],
+            )
+        page_size = os.sysconf('SC_PAGE_SIZE')
+
+        def resident():
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * page_size
+
+        response = self.client.get('/api/export/?models=study_sessions')
+        lines = pieces = peak = 0
+        baseline = None
+        for piece in response.streaming_content:
+            lines += piece.count(b'\n')
+            pieces += 1
+            if lines >= 100000 and pieces % 50 == 0:
+                baseline = baseline or resident()
+                peak = max(peak, resident())
+        self.assertEqual(lines, 1000001)
+        # Holding the rows would take hundreds of MB; streaming stays within
+        # a few MB of where it was after the first 100k rows.
+        self.assertLess(peak - baseline, 16 * 1024 * 1024)
+
+
+def image_bytes(size=(1500, 1500), format='JPEG', mode='RGB', **options):
+    image = Image.effect_noise(size, 60).convert(mode)
+    buffer = BytesIO()
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+class AvatarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='avatar@example.com')
+        UserProfile.objects.create(user=cls.user)
+        cls.photo = image_bytes(quality=95)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.user)
+
+    def upload(self, content, client=None):
+        return (client or self.client).post('/api/auth/user/avatar/', {'avatar': SimpleUploadedFile('me.jpg', content)})
+
+    def stored(self):
+        return sorted(name for _, _, names in os.walk(self.media) for name in names)
+
+    def test_upload_is_stored_by_hash_and_resized_later(self):
+        response = self.upload(self.photo)
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(response.json()['avatar_variants'])
+        digest = hashlib.sha256(self.photo).hexdigest()
+        self.assertEqual(self.stored(), [f'{digest}.jpg'])
+
+        out = StringIO()
+        call_command('process_avatars', once=True, stdout=out)
+        self.assertIn('Processed 1 avatars.', out.getvalue())
+        self.assertEqual(len(self.stored()), 7)
+        variants = self.client.get('/api/auth/user/').json()['profile']['avatar_variants']
+        self.assertEqual(list(variants), ['64', '128', '256'])
+        self.assertTrue(variants['64']['webp'].endswith(f'{digest}-64.webp'))
+        for size, formats in variants.items():
+            for format, url in formats.items():
+                with open(os.path.join(self.media, url.removeprefix('/media/')), 'rb') as fh:
+                    self.assertEqual(Image.open(fh).size, (int(size), int(size)))
+        header = os.path.getsize(os.path.join(self.media, variants['64']['jpeg'].removeprefix('/media/')))
+        self.assertLess(header * 100, len(self.photo))
+
+    def test_identical_uploads_share_files_and_variants(self):
+        self.upload(self.photo)
+        call_command('process_avatars', once=True, stdout=StringIO())
+        other = User.objects.create_user(username='avatar-twin@example.com')
+        client = Client()
+        client.force_login(other)
+        response = self.upload(self.photo, client)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['avatar_variants']['128'].keys(), {'webp', 'jpeg'})
+        self.assertEqual(len(self.stored()), 7)
+
+    def test_transparent_png(self):
+        self.upload(image_bytes((300, 200), 'PNG', 'RGBA'))
+        avatars.process_pending()
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertTrue(profile.avatar.name.endswith('.png'))
+        with open(os.path.join(self.media, profile.avatar_variants['256']['jpeg']), 'rb') as fh:
+            self.assertEqual(Image.open(fh).mode, 'RGB')
+
+    def test_rejects_non_images_and_removes(self):
+        self.assertEqual(self.upload(b'GIF89a but not really').status_code, 400)
+        self.assertEqual(self.client.post('/api/auth/user/avatar/').status_code, 400)
+        self.upload(self.photo)
+        self.assertEqual(self.client.delete('/api/auth/user/avatar/').status_code, 204)
+        profile = self.client.get('/api/auth/user/').json()['profile']
+        self.assertIsNone(profile['avatar'])
+        self.assertEqual(profile['avatar_variants'], {})
+        self.assertEqual(avatars.process_pending(), 0)
+
+    def test_rejects_huge_dimensions(self):
+        def chunk(kind, data):
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+        # A few dozen bytes declaring the size, with an empty image stream.
+        for side in (8000, 20000):
+            png = (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', side, side, 8, 2, 0, 0, 0))
+                   + chunk(b'IDAT', zlib.compress(b'')))
+            response = self.upload(png)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('megapixels', str(response.json()))
+        self.assertEqual(self.stored(), [])
+
+    def test_unreadable_original_is_not_retried(self):
+        self.upload(self.photo)
+        with patch('app.avatars.make_variants', side_effect=OSError('truncated')), \
+                self.assertLogs('app.avatars', 'ERROR'):
+            self.assertEqual(avatars.process_pending(), 1)
+        self.assertEqual(UserProfile.objects.get(user=self.user).avatar_variants, {})
+        self.assertEqual(avatars.process_pending(), 0)
+
+
+class ImportTests(TestCase):
+    SESSIONS_CSV = (
+        'subject,duration_minutes,rating,session_date,notes\n'
+        'Maths,30,,2025-03-01T09:00:00Z,\n'
+        'Maths,45,5,2025-03-01T09:00:00Z,same key\n'
+        'Physics,-5,9,yesterday,\n'
+        'Physics,50,4,2025-03-02T10:30:00+02:00,wave optics\n'
+    ).encode()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='import@example.com', password='pw-import-1')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, model, name, content, **data):
+        return self.client.post('/api/import/', {'model': model, 'file': SimpleUploadedFile(name, content), **data})
+
+    def test_validates_dedupes_and_reports_rows(self):
+        report = self.upload('study_sessions', 'sessions.csv', self.SESSIONS_CSV).json()
+        self.assertEqual({key: report[key] for key in ('rows', 'created', 'duplicates', 'failed')},
+                         {'rows': 4, 'created': 2, 'duplicates': 1, 'failed': 1})
+        self.assertEqual(report['errors'][0]['line'], 4)
+        self.assertEqual(set(report['errors'][0]['errors']), {'duration_minutes', 'rating', 'session_date'})
+        self.assertIsNone(StudySession.objects.get(subject='Maths').rating)
+        self.assertEqual(stored_daily_stats(UserDailyStats), dict(compute_daily_stats(StudySession, DailyPlan)))
+        self.assertEqual(ChangeLogEntry.objects.filter(user=self.user, model='studysession').count(), 2)
+
+        # Importing the same file again only finds duplicates.
+        report = self.upload('study_sessions', 'sessions.csv', self.SESSIONS_CSV).json()
+        self.assertEqual((report['created'], report['duplicates']), (0, 3))
+        self.assertEqual(StudySession.objects.count(), 2)
+
+    def test_round_trip_from_export(self):
+        Note.objects.create(user=self.user, title='Kept', content='body')
+        StudySession.objects.create(user=self.user, subject='Chemistry', duration_minutes=20)
+        exported = b''.join(self.client.get('/api/export/?gzip=1').streaming_content)
+
+        other = User.objects.create_user(username='import-other@example.com')
+        self.client.force_login(other)
+        for model in ('notes', 'study_sessions'):
+            report = self.upload(model, 'focusmate-export.ndjson.gz', exported).json()
+            self.assertEqual((report['created'], report['skipped'], report['failed']), (1, 1, 0))
+        self.assertEqual(Note.objects.get(user=other).title, 'Kept')
+        self.assertEqual(StudySession.objects.get(user=other).subject, 'Chemistry')
+
+    def test_chunks_cost_constant_queries(self):
+        rows = ''.join(f'{{"subject": "s{i}", "duration_minutes": 25, "session_date": "2025-01-01T{i // 60:02d}:{i % 60:02d}:00Z"}}\n'
+                       for i in range(1000)).encode()
+        with override_settings(IMPORT_CHUNK_SIZE=500), CaptureQueriesContext(connection) as queries:
+            report = self.upload('study_sessions', 'sessions.ndjson', rows + b'not json\n').json()
+        self.assertEqual((report['created'], report['failed']), (1000, 1))
+        self.assertEqual(report['errors'], [{'line': 1001, 'errors': {'non_field_errors': ['Not a JSON object.']}}])
+        self.assertLess(len(queries), 32)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.upload('goals', 'goals.csv', b'title\n').status_code, 400)
+        self.assertEqual(self.upload('notes', 'notes.txt', b'title\n').status_code, 400)
+        self.assertEqual(self.upload('notes', 'notes.txt', b'title,content\na,b\n', format='csv').json()['created'], 1)
+
+    def test_unreadable_files(self):
+        for name, content in (('notes.csv.gz', b'title,content\na,b\n'),
+                              ('notes.csv.gz', gzip.compress(b'title,content\na,b\n')[:-6]),
+                              ('notes.csv', 'title,content\nä,b\n'.encode('latin-1'))):
+            response = self.upload('notes', name, content)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('could not be read', response.json()['error'])
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv.gz') as fh:
+            fh.write(gzip.compress(self.SESSIONS_CSV))
+            fh.flush()
+            out = StringIO()
+            call_command('import_data', fh.name, user='import@example.com', model='study_sessions',
+                         chunk_size=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['created'], report['duplicates'], report['failed']), (2, 1, 1))
+        with self.assertRaises(CommandError):
+            call_command('import_data', 'nowhere.txt', user='import@example.com', model='notes')
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='archive@example.com', password='pw-archive-1')
+        now = timezone.now()
+        cls.old, cls.recent = now - timedelta(days=1000), now - timedelta(days=3)
+        for i in range(6):
+            StudySession.objects.create(user=cls.user, subject=f's{i}', duration_minutes=10 + i, rating=i % 5 + 1,
+                                        session_date=(cls.old if i % 2 else cls.recent) + timedelta(hours=i))
+        for i, (day, done) in enumerate([(cls.old, True), (cls.old, False), (cls.recent, True)]):
+            DailyPlan.objects.create(user=cls.user, title=f'p{i}', planned_date=day.date(), is_completed=done)
+        Reminder.objects.create(user=cls.user, title='sent', message='m', reminder_time=cls.old, is_sent=True)
+        Reminder.objects.create(user=cls.user, title='missed', message='m', reminder_time=cls.old)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_data', days=30, batch_size=2, pause=0, stdout=out)
+        return out.getvalue()
+
+    def hour_of_week(self):
+        start = (self.old - timedelta(days=1)).date()
+        return self.client.get(f'/api/statistics/study/range/?granularity=hour_of_week&start={start}'
+                               f'&end={start + timedelta(days=7)}').json()
+
+    def test_archive_tables_have_the_same_columns(self):
+        for model, (_, archived) in archive.ARCHIVES.items():
+            self.assertEqual([field.column for field in model._meta.concrete_fields],
+                             [field.column for field in archived._meta.concrete_fields])
+
+    def test_moves_old_rows_without_changing_stats_or_sync(self):
+        stats, hours = stored_daily_stats(UserDailyStats), self.hour_of_week()
+        logged = ChangeLogEntry.objects.count()
+        session_ids = set(StudySession.objects.filter(session_date__lt=self.recent).values_list('pk', flat=True))
+
+        self.assertEqual(self.archive(), 'Archived 1 daily plans, 1 reminders, 3 study sessions.\n')
+        self.assertEqual(set(ArchivedStudySession.objects.values_list('pk', flat=True)), session_ids)
+        self.assertEqual(StudySession.objects.count(), 3)
+        self.assertEqual(list(ArchivedDailyPlan.objects.values_list('title', flat=True)), ['p0'])
+        self.assertEqual(list(ArchivedReminder.objects.values_list('title', flat=True)), ['sent'])
+        self.assertEqual(self.archive(), 'Archived 0 daily plans, 0 reminders, 0 study sessions.\n')
+
+        self.assertEqual(stored_daily_stats(UserDailyStats), stats)
+        self.assertEqual(self.hour_of_week(), hours)
+        self.assertEqual(ChangeLogEntry.objects.count(), logged)
+        call_command('rebuild_daily_stats', verify=True, stdout=StringIO())
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        self.assertEqual(stored_daily_stats(UserDailyStats), stats)
+
+    def test_include_archived_lists_both_tables(self):
+        everything = list(StudySession.objects.filter(user=self.user).values_list('pk', flat=True))
+        self.archive()
+        for prefix in ('/api/', '/api/async/'):
+            url = f'{prefix}study-sessions/?include_archived=1&page_size=2'
+            ids = []
+            while url:
+                page = self.client.get(url).json()
+                ids += [row['id'] for row in page['results']]
+                url = page['next']
+            self.assertEqual(ids, everything)
+            # Paging back from the last page reads the same rows.
+            previous = self.client.get(page['previous']).json()
+            self.assertEqual([row['id'] for row in previous['results']], everything[2:4])
+            self.assertEqual(len(self.client.get(f'{prefix}study-sessions/').json()['results']), 3)
+
+        plans = self.client.get('/api/daily-plans/?include_archived=1').json()['results']
+        self.assertEqual(sorted(plan['title'] for plan in plans), ['p0', 'p1', 'p2'])
+        reminders = self.client.get('/api/reminders/?include_archived=1&fields=title').json()['results']
+        self.assertEqual([reminder['title'] for reminder in reminders], ['sent', 'missed'])
+        self.assertNotEqual(self.client.get('/api/reminders/?include_archived=1')['ETag'],
+                            self.client.get('/api/reminders/')['ETag'])
+
+    def test_export_and_import_include_archived_rows(self):
+        self.archive()
+        exported = b''.join(self.client.get('/api/export/?models=study_sessions').streaming_content)
+        self.assertEqual(len(exported.splitlines()), 6)
+        report = self.client.post('/api/import/', {
+            'model': 'study_sessions', 'file': SimpleUploadedFile('sessions.ndjson', exported)}).json()
+        self.assertEqual((report['created'], report['duplicates']), (0, 6))
+
+
+class QueryBudgetMixin:
+    """
+    Every route in app/urls.py, each with a fixed query budget that must
+    hold whatever the number of rows the user owns; subclasses set ``rows``.
+    Requests go through the full middleware stack with a session login.
+    The user is cached after the first request; the session row, read on
+    every request with the default database sessions, is added on top of
+    each budget as ``session_queries``.
+    """
+    rows = None
+    session_queries = 1
+    today = date.today()
+
+    # (method, path, body, queries), run in order; later writes rely on
+    # the rows created by earlier ones being gone or present.
+    ROUTES = [
+        ('get', '/api/csrf-token/', None, 1),
+        ('get', '/api/auth/user/', None, 0),
+        ('get', '/api/auth/tokens/', None, 1),
+        ('get', '/api/dashboard/', None, 8),
+        ('get', '/api/notes/', None, 2),
+        ('get', '/api/notes/?preview=1&fields=title,content', None, 2),
+        ('get', '/api/notes/search/?q=topic', None, 1),
+        ('get', '/api/notes/{note}/', None, 2),
+        ('get', '/api/daily-plans/', None, 2),
+        ('get', '/api/daily-plans/?date={today}', None, 2),
+        ('get', '/api/daily-plans/?include_archived=1', None, 4),
+        ('get', '/api/daily-plans/next/?n=10', None, 1),
+        ('get', '/api/daily-plans/{plan}/', None, 2),
+        ('get', '/api/study-sessions/', None, 2),
+        ('get', '/api/study-sessions/?include_archived=1', None, 4),
+        ('get', '/api/study-sessions/{session}/', None, 2),
+        ('get', '/api/goals/', None, 2),
+        ('get', '/api/goals/{goal}/', None, 2),
+        ('get', '/api/reminders/', None, 2),
+        ('get', '/api/reminders/?include_archived=1', None, 4),
+        ('get', '/api/reminders/{reminder}/', None, 2),
+        ('get', '/api/statistics/study/', None, 1),
+        ('get', '/api/statistics/study/range/?granularity=week', None, 1),
+        ('get', '/api/statistics/productivity/', None, 1),
+        ('get', '/api/statistics/productivity/range/', None, 4),
+        ('get', '/api/calendar/?start={today}&end={today}', None, 4),
+        ('get', '/api/sync/', None, 1),
+        ('get', '/api/sync/?since={token}', None, 1),
+        ('get', '/api/export/', None, 8),
+        ('get', '/api/export/?format=csv&models=notes&gzip=1', None, 1),
+        ('post', '/api/import/', {'model': 'study_sessions', 'file': (
+            'sessions.csv', 'subject,duration_minutes,session_date\nimported,25,{today}T08:00:00Z\n')}, 7),
+        ('get', '/api/async/dashboard/', None, 8),
+        ('get', '/api/async/notes/', None, 2),
+        ('get', '/api/async/daily-plans/?date={today}', None, 2),
+        ('get', '/api/async/study-sessions/', None, 2),
+        ('get', '/api/async/study-sessions/?include_archived=1', None, 4),
+        ('get', '/api/async/goals/', None, 2),
+        ('get', '/api/async/reminders/', None, 2),
+        ('get', '/api/async/statistics/study/', None, 1),
+        ('get', '/api/async/statistics/study/range/?granularity=month', None, 1),
+        ('get', '/api/async/statistics/productivity/', None, 1),
+        ('get', '/api/async/statistics/productivity/range/', None, 4),
+        ('get', '/api/async/calendar/?start={today}&end={today}&include_archived=1', None, 4),
+        ('post', '/api/notes/', {'title': 'new', 'content': 'c'}, 2),
+        ('patch', '/api/notes/{note}/', {'title': 'renamed'}, 5),
+        ('put', '/api/goals/{goal}/', {'title': 'g', 'description': 'd', 'target_date': '{today}'}, 5),
+        ('delete', '/api/reminders/{reminder}/', None, 4),
+        ('post', '/api/daily-plans/', {'title': 'new', 'planned_date': '{today}'}, 3),
+        ('patch', '/api/daily-plans/{plan}/', {'is_completed': True}, 5),
+        ('post', '/api/daily-plans/{plan}/move/', {'before': '{first_plan}'}, 4),
+        ('delete', '/api/study-sessions/{session}/', None, 5),
+        ('post', '/api/daily-plans/bulk/', {'create': [{'title': 'b', 'planned_date': '{today}'}] * 5}, 5),
+        ('post', '/api/study-sessions/bulk/', {'create': [{'subject': 's', 'duration_minutes': 5}] * 5}, 5),
+        ('post', '/api/auth/register/', {
+            'email': 'budget@example.com', 'password': 'long-enough-1',
+            'password_confirm': 'long-enough-1', 'name': 'Budget Test'}, 2),
+        ('post', '/api/auth/tokens/', {'email': '{username}', 'password': 'pw-budget-1'}, 2),
+        ('delete', '/api/auth/tokens/{auth_token}/', None, 2),
+        ('post', '/api/auth/user/avatar/', {'avatar': ('me.png', image_bytes((32, 32), 'PNG'))}, 3),
+        # Saving the profile drops the cached session user, so these reload it.
+        ('delete', '/api/auth/user/avatar/', None, 3),
+        ('post', '/api/auth/login/', {'email': '{username}', 'password': 'pw-budget-1'}, 6),
+        ('post', '/api/auth/logout/', None, 3),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=f'budget{cls.rows}@example.com', password='pw-budget-1')
+        UserProfile.objects.create(user=cls.user)
+        now = timezone.now()
+        days = [cls.today - timedelta(days=i % 60) for i in range(cls.rows)]
+        Note.objects.bulk_create(
+            Note(user=cls.user, title=f'note {i}', content=f'topic {i} ' * 50) for i in range(cls.rows))
+        # Something to move plans before, even with one row.
+        first_plan, = DailyPlan.objects.bulk_create(
+            [DailyPlan(user=cls.user, title='first plan', planned_date=cls.today)])
+        DailyPlan.objects.bulk_create(
+            DailyPlan(user=cls.user, title=f'plan {i}', planned_date=day, is_completed=i % 3 == 0)
+            for i, day in enumerate(days))
+        StudySession.objects.bulk_create(
+            StudySession(user=cls.user, subject=f's{i % 7}', duration_minutes=30, rating=i % 5 + 1,
+                         session_date=now - timedelta(days=i % 60))
+            for i in range(cls.rows))
+        Goal.objects.bulk_create(
+            Goal(user=cls.user, title=f'goal {i}', description='d', target_date=cls.today)
+            for i in range(cls.rows))
+        Reminder.objects.bulk_create(
+            Reminder(user=cls.user, title=f'r{i}', message='m', reminder_time=now + timedelta(minutes=i))
+            for i in range(cls.rows))
+        rebuild_daily_stats(StudySession, DailyPlan, UserDailyStats)
+        cls.ids = {
+            name: model.objects.filter(user=cls.user).order_by('-pk').values_list('pk', flat=True)[0]
+            for name, model in (('note', Note), ('plan', DailyPlan), ('session', StudySession),
+                                ('goal', Goal), ('reminder', Reminder))
+        }
+        cls.ids['first_plan'] = first_plan.pk
+        cls.ids['auth_token'] = tokens.issue_token(cls.user)[0].pk
+
+    def format(self, value):
+        params = dict(self.ids, today=self.today.isoformat(), token=changelog.encode_token(0),
+                      username=self.user.username)
+        if isinstance(value, str):
+            return value.format(**params)
+        if isinstance(value, dict):
+            return {key: self.format(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.format(item) for item in value]
+        return value
+
+    def upload(self, value):
+        name, content = value
+        if isinstance(content, str):
+            content = self.format(content).encode()
+        return SimpleUploadedFile(name, content)
+
+    def test_query_budgets(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client.force_login(self.user)
+        for method, path, body, budget in self.ROUTES:
+            invalidate_dashboard(self.user.pk)
+            with self.subTest(method=method, path=path):
+                request = getattr(self.client, method)
+                if body is None:
+                    kwargs = {}
+                elif any(isinstance(value, tuple) for value in body.values()):
+                    # (name, content) values are sent as files.
+                    kwargs = {'data': {key: self.upload(value) if isinstance(value, tuple) else value
+                                       for key, value in body.items()}}
+                else:
+                    kwargs = {'data': self.format(body), 'content_type': 'application/json'}
+                with self.assertNumQueries(budget + self.session_queries):
+                    response = request(self.format(path), **kwargs)
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                self.assertLess(response.status_code, 400, body[:200])
+
+
+class QueryBudgetOneRowTests(QueryBudgetMixin, TestCase):
+    rows = 1
+
+
+class QueryBudgetHundredRowsTests(QueryBudgetMixin, TestCase):
+    rows = 100
+
+
+class QueryBudgetTenThousandRowsTests(QueryBudgetMixin, TestCase):
+    rows = 10000
@@ -0,0 +1,150 @@
+"""
+Bearer tokens for scripted clients, in place of HTTP Basic.
+
+``Authorization: Bearer <token>`` is checked against the SHA-256 stored in
+AuthToken, never a password hash. Resolved tokens are kept in an
+in-process LRU for AUTH_TOKEN_CACHE_SECONDS, so a client reusing its token
+is authenticated without any query. Revoking a token drops it from this
+process's cache at once; other processes stop accepting it when their
+entry expires.
+"""
+import copy
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from .models import AuthToken
+
+KEYWORD = 'bearer'
+
+
+class TTLCache:
+    """A thread-safe LRU whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TTLCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_SECONDS)
+
+
+def hash_token(raw):
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def issue_token(user, name=''):
+    """Create a token for ``user``; returns ``(token, raw)``, raw being shown once."""
+    raw = secrets.token_urlsafe(32)
+    token = AuthToken.objects.create(
+        user=user, key_hash=hash_token(raw), prefix=raw[:8], name=name,
+        expires_at=timezone.now() + timedelta(days=settings.AUTH_TOKEN_TTL_DAYS),
+    )
+    return token, raw
+
+
+def revoke_token(token):
+    token.delete()
+
+
+def forget_token(sender, instance, **kwargs):
+    """post_delete receiver; also covers tokens deleted with their user."""
+    token_cache.discard(instance.key_hash)
+
+
+post_delete.connect(forget_token, sender=AuthToken, dispatch_uid='forget_token')
+
+
+def _tokens():
+    # UserSerializer nests the profile, so load it with the user.
+    return AuthToken.objects.select_related('user', 'user__profile')
+
+
+def _checked(token):
+    if token is None or token.expires_at <= timezone.now() or not token.user.is_active:
+        return None
+    # Each request gets its own copy of the cached user.
+    return copy.copy(token.user), token
+
+
+def resolve_token(raw):
+    """``(user, token)`` for a valid token, else None."""
+    key_hash = hash_token(raw)
+    token = token_cache.get(key_hash)
+    if token is None:
+        token = _tokens().filter(key_hash=key_hash).first()
+        if token is not None:
+            token_cache.set(key_hash, token)
+    return _checked(token)
+
+
+async def aresolve_token(raw):
+    key_hash = hash_token(raw)
+    token = token_cache.get(key_hash)
+    if token is None:
+        token = await _tokens().filter(key_hash=key_hash).afirst()
+        if token is not None:
+            token_cache.set(key_hash, token)
+    return _checked(token)
+
+
+def bearer_token(header):
+    """The token in an ``Authorization: Bearer`` header value, else None."""
+    keyword, _, raw = header.partition(' ')
+    if keyword.lower() != KEYWORD or not raw.strip():
+        return None
+    return raw.strip()
+
+
+class BearerTokenAuthentication(authentication.BaseAuthentication):
+    """DRF authentication for ``Authorization: Bearer <token>``; ``request.auth`` is the AuthToken."""
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).decode('latin-1')
+        raw = bearer_token(header)
+        if raw is None:
+            return None
+        resolved = resolve_token(raw)
+        if resolved is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        return resolved
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     
@@ -10,20 +10,29 @@ urlpatterns = [
     path('auth/login/', views.UserLoginView.as_view()),
     path('auth/logout/', views.UserLogoutView.as_view()),
     path('auth/user/', views.CurrentUserView.as_view()),
+    path('auth/user/avatar/', views.AvatarView.as_view()),
+    path('auth/tokens/', views.TokenListCreateView.as_view()),
+    path('auth/tokens/rotate/', views.TokenRotateView.as_view()),
+    path('auth/tokens/<int:pk>/', views.TokenRevokeView.as_view()),
     
     
     path('dashboard/', views.DashboardView.as_view()),
     
     
     path('notes/', views.NoteListCreateView.as_view()),
+    path('notes/search/', views.NoteSearchView.as_view()),
     path('notes/<int:pk>/', views.NoteDetailView.as_view()),
     
     
     path('daily-plans/', views.DailyPlanListCreateView.as_view()),
+    path('daily-plans/bulk/', views.DailyPlanBulkView.as_view()),
+    path('daily-plans/next/', views.DailyPlanNextView.as_view()),
     path('daily-plans/<int:pk>/', views.DailyPlanDetailView.as_view()),
+    path('daily-plans/<int:pk>/move/', views.DailyPlanMoveView.as_view()),
     
     
     path('study-sessions/', views.StudySessionListCreateView.as_view()),
+    path('study-sessions/bulk/', views.StudySessionBulkView.as_view()),
     path('study-sessions/<int:pk>/', views.StudySessionDetailView.as_view()),
     
     
@@ -36,5 +45,27 @@ urlpatterns = [
     
     
     path('statistics/study/', views.study_statistics),
+    path('statistics/study/range/', views.study_statistics_range),
     path('statistics/productivity/', views.productivity_summary),
+    path('statistics/productivity/range/', views.productivity_range),
+    path('calendar/', views.calendar),
+
+
+    path('sync/', views.SyncView.as_view()),
+    path('export/', views.ExportView.as_view()),
+    path('import/', views.ImportView.as_view()),
+
+
+    # Async versions of the read-heavy endpoints, for ASGI deployments.
+    path('async/dashboard/', async_views.dashboard),
+    path('async/notes/', async_views.note_list),
+    path('async/daily-plans/', async_views.daily_plan_list),
+    path('async/study-sessions/', async_views.study_session_list),
+    path('async/goals/', async_views.goal_list),
+    path('async/reminders/', async_views.reminder_list),
+    path('async/statistics/study/', async_views.study_statistics),
+    path('async/statistics/study/range/', async_views.study_statistics_range),
+    path('async/statistics/productivity/', async_views.productivity_summary),
+    path('async/statistics/productivity/range/', async_views.productivity_range),
+    path('async/calendar/', async_views.calendar),
 ]
@@ -1,22 +1,44 @@
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
 from django.db.models import Sum, Count
 from django.middleware.csrf import get_token
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from datetime import date, timedelta
-from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder
+from .models import UserProfile, Note, DailyPlan, StudySession, Goal, Reminder, AuthToken
 from .serializers import (
-    UserRegistrationSerializer, UserLoginSerializer, UserSerializer,
+    UserRegistrationSerializer, UserLoginSerializer, UserSerializer, UserProfileSerializer,
+    TokenRequestSerializer, AuthTokenSerializer,
     NoteSerializer, DailyPlanSerializer, StudySessionSerializer,
-    GoalSerializer, ReminderSerializer, DashboardDataSerializer
+    GoalSerializer, ReminderSerializer, DashboardDataSerializer,
+    NoteSearchResultSerializer
 )
+from .archive import ArchiveListMixin, archived_requested
+from .avatars import InvalidAvatar, clear_avatar, set_avatar
+from .bulk import BulkMutationView
+from .calendar import build_calendar, parse_calendar_range
+from .changelog import InvalidToken, changes_since, current_token
+from .conditional import ConditionalDetailMixin, ConditionalListMixin
+from .dashboard import get_dashboard
+from .export import EXPORTED_MODELS, CSVRenderer, NDJSONRenderer, aiterate, gzipped
+from .fieldsets import SparseListMixin
+from .imports import FORMATS, IMPORTERS, UNREADABLE, guess_format, import_rows, read_rows
+from .positions import move_plan
+from .search import search_notes
+from .statistics import (
+    RangeError, last_week_summary, parse_dates, parse_range, productivity, productivity_report, range_summary,
+    study_buckets,
+)
+from .tokens import issue_token, revoke_token
 
 # Create your views here.
 
@@ -60,10 +82,57 @@ class UserLogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
+        # A token client logging out gives up the token it used.
+        if isinstance(request.auth, AuthToken):
+            revoke_token(request.auth)
         logout(request)
         return Response({'message': 'Logout successful'})
 
 
+class TokenListCreateView(APIView):
+    """
+    ``POST`` exchanges an email and password for a bearer token, the only
+    time the token itself is returned; ``GET`` lists the user's tokens.
+    """
+
+    def get_permissions(self):
+        return [AllowAny()] if self.request.method == 'POST' else [IsAuthenticated()]
+
+    def get(self, request):
+        tokens = AuthToken.objects.filter(user=request.user)
+        return Response(AuthTokenSerializer(tokens, many=True, context={'request': request}).data)
+
+    def post(self, request):
+        serializer = TokenRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token, raw = issue_token(serializer.validated_data['user'], serializer.validated_data.get('name', ''))
+        return Response(dict(AuthTokenSerializer(token).data, token=raw), status=status.HTTP_201_CREATED)
+
+
+class TokenRotateView(APIView):
+    """Replace the bearer token the request was made with by a new one."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not isinstance(request.auth, AuthToken):
+            return Response({'error': 'Authenticate with the token to rotate.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        token, raw = issue_token(request.user, request.auth.name)
+        revoke_token(request.auth)
+        return Response(dict(AuthTokenSerializer(token).data, token=raw), status=status.HTTP_201_CREATED)
+
+
+class TokenRevokeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, pk):
+        token = AuthToken.objects.filter(user=request.user, pk=pk).first()
+        if token is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        revoke_token(token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -72,56 +141,119 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 
+class AvatarView(APIView):
+    """
+    ``POST /api/auth/user/avatar/`` with a multipart ``avatar`` image sets the
+    avatar and answers 202 until its variants are made (200 if an identical
+    picture already has them); ``DELETE`` removes it.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def get_profile(self, request):
+        # A fresh copy: request.user.profile may be shared with the session user cache.
+        profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        profile.user = request.user
+        return profile
+
+    def post(self, request):
+        upload = request.FILES.get('avatar')
+        if upload is None:
+            return Response({'error': 'avatar is required'}, status=status.HTTP_400_BAD_REQUEST)
+        profile = self.get_profile(request)
+        try:
+            set_avatar(profile, upload)
+        except InvalidAvatar as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = UserProfileSerializer(profile, context={'request': request}).data
+        pending = profile.avatar_variants is None
+        return Response(data, status=status.HTTP_202_ACCEPTED if pending else status.HTTP_200_OK)
+
+    def delete(self, request):
+        clear_avatar(self.get_profile(request))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        today = date.today()
-        
-        # Calculate dashboard statistics
-        total_notes = Note.objects.filter(user=user).count()
-        total_daily_plans = DailyPlan.objects.filter(user=user, planned_date=today).count()
-        completed_plans_today = DailyPlan.objects.filter(
-            user=user, planned_date=today, is_completed=True
-        ).count()
-        
-        total_study_sessions = StudySession.objects.filter(user=user).count()
-        total_study_time = StudySession.objects.filter(user=user).aggregate(
-            total=Sum('duration_minutes')
-        )['total'] or 0
-        
-        active_goals = Goal.objects.filter(
-            user=user, status__in=['not_started', 'in_progress']
-        ).count()
-        
-        upcoming_reminders = Reminder.objects.filter(
-            user=user, is_sent=False, reminder_time__gte=timezone.now()
-        ).count()
-        
-        #  recent data
-        recent_notes = Note.objects.filter(user=user)[:5]
-        today_plans = DailyPlan.objects.filter(user=user, planned_date=today)
-        recent_study_sessions = StudySession.objects.filter(user=user)[:5]
-        
-        dashboard_data = {
-            'total_notes': total_notes,
-            'total_daily_plans': total_daily_plans,
-            'completed_plans_today': completed_plans_today,
-            'total_study_sessions': total_study_sessions,
-            'total_study_time': total_study_time,
-            'active_goals': active_goals,
-            'upcoming_reminders': upcoming_reminders,
-            'recent_notes': NoteSerializer(recent_notes, many=True).data,
-            'today_plans': DailyPlanSerializer(today_plans, many=True).data,
-            'recent_study_sessions': StudySessionSerializer(recent_study_sessions, many=True).data,
-        }
-        
-        return Response(dashboard_data)
+        return Response(get_dashboard(request.user))
+
+
+class SyncView(APIView):
+    """
+    ``GET /api/sync/`` returns a token for the current position;
+    ``GET /api/sync/?since=<token>`` returns what changed after it.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if not since:
+            return Response({'token': current_token(request.user), 'reset': True})
+        try:
+            return Response(changes_since(request.user, since, request))
+        except InvalidToken as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ExportView(APIView):
+    """
+    ``GET /api/export/?format=ndjson|csv&models=notes,goals&gzip=1`` streams
+    the user's rows; every model unless ``models`` is given.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request):
+        names = [name for name in request.query_params.get('models', '').split(',') if name]
+        unknown = sorted(set(names) - set(EXPORTED_MODELS))
+        if unknown:
+            return Response({'error': f"unknown models: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+        renderer = request.accepted_renderer
+        pieces = renderer.stream(request.user, names or list(EXPORTED_MODELS))
+        filename = f'focusmate-export.{renderer.format}'
+        content_type = f'{renderer.media_type}; charset=utf-8'
+        if request.query_params.get('gzip') in ('1', 'true'):
+            pieces, filename, content_type = gzipped(pieces), filename + '.gz', 'application/gzip'
+        if isinstance(request._request, ASGIRequest):
+            pieces = aiterate(pieces)
+        response = StreamingHttpResponse(pieces, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ImportView(APIView):
+    """
+    ``POST /api/import/`` with a multipart ``file`` (CSV or NDJSON, maybe
+    gzipped) and ``model`` (study_sessions or notes) imports its rows and
+    returns the report. ``format`` is only needed when the file name
+    doesn't tell.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        name = request.data.get('model')
+        if upload is None or name not in IMPORTERS:
+            return Response({'error': f"file and model ({', '.join(IMPORTERS)}) are required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        format, gzipped = guess_format(upload.name)
+        format = request.data.get('format') or format
+        if format not in FORMATS:
+            return Response({'error': f"format must be one of {', '.join(FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = import_rows(request.user, name, read_rows(upload.file, format, gzipped))
+        except UNREADABLE as exc:
+            return Response({'error': f'file could not be read: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
 
 
 # note veiws
-class NoteListCreateView(generics.ListCreateAPIView):
+class NoteListCreateView(ConditionalListMixin, SparseListMixin, generics.ListCreateAPIView):
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
 
@@ -129,7 +261,7 @@ class NoteListCreateView(generics.ListCreateAPIView):
         return Note.objects.filter(user=self.request.user)
 
 
-class NoteDetailView(generics.RetrieveUpdateDestroyAPIView):
+class NoteDetailView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
 
@@ -137,44 +269,123 @@ class NoteDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Note.objects.filter(user=self.request.user)
 
 
+class NoteSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
+        limit = max(1, min(limit, settings.MAX_PAGE_SIZE))
+
+        notes = search_notes(request.user, query, request.query_params.get('category'), limit)
+        return Response({
+            'query': query,
+            'results': NoteSearchResultSerializer(notes, many=True, context={'request': request}).data,
+        })
+
+
 #  plan Views
-class DailyPlanListCreateView(generics.ListCreateAPIView):
+class DailyPlanListCreateView(ArchiveListMixin, ConditionalListMixin, SparseListMixin, generics.ListCreateAPIView):
     serializer_class = DailyPlanSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
+    def get_queryset(self, model=DailyPlan):
         date_param = self.request.query_params.get('date', None)
-        queryset = DailyPlan.objects.filter(user=self.request.user)
+        queryset = model.objects.filter(user=self.request.user)
         if date_param:
             queryset = queryset.filter(planned_date=date_param)
         return queryset
 
 
-class DailyPlanDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DailyPlanDetailView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = DailyPlanSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return DailyPlan.objects.filter(user=self.request.user)
 
-    def patch(self, request, *args, **kwargs):
-        plan = self.get_object()
-        if 'is_completed' in request.data and request.data['is_completed']:
-            plan.completed_at = timezone.now()
-            plan.save()
-        return super().patch(request, *args, **kwargs)
+    def perform_update(self, serializer):
+        # Stamp completed_at in the same UPDATE as the rest of the change.
+        if serializer.validated_data.get('is_completed'):
+            serializer.save(completed_at=timezone.now())
+        else:
+            serializer.save()
+
+
+class DailyPlanNextView(SparseListMixin, generics.ListAPIView):
+    """The user's next ``?n=`` open plans, highest priority first."""
+    serializer_class = DailyPlanSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        # Served from plan_user_open_idx, which holds only open plans.
+        return DailyPlan.objects.filter(user=self.request.user, is_completed=False).order_by(
+            '-priority_rank', 'position', 'id')
+
+    def list(self, request, *args, **kwargs):
+        try:
+            n = int(request.query_params.get('n', 5))
+        except ValueError:
+            n = 5
+        n = max(1, min(n, settings.MAX_PAGE_SIZE))
+        plans = self.filter_queryset(self.get_queryset())[:n]
+        return Response({'results': self.get_serializer(plans, many=True).data})
+
+
+class DailyPlanMoveView(APIView):
+    """Move a plan right after or right before another of the user's plans."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        plans = DailyPlan.objects.filter(user=request.user)
+        targets = {key: request.data[key] for key in ('after', 'before') if request.data.get(key) is not None}
+        if len(targets) != 1:
+            return Response({'error': 'Give exactly one of after or before'}, status=status.HTTP_400_BAD_REQUEST)
+        (key, target_id), = targets.items()
+        try:
+            target_id = int(target_id)
+        except (TypeError, ValueError):
+            return Response({'error': f'{key} must be a plan id'}, status=status.HTTP_400_BAD_REQUEST)
+        if target_id == pk:
+            return Response({'error': 'A plan cannot be moved relative to itself'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        found = plans.in_bulk([pk, target_id])
+        if pk not in found:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if target_id not in found:
+            return Response({'error': f'{key} plan not found'}, status=status.HTTP_400_BAD_REQUEST)
+        plan = move_plan(found[pk], **{key: found[target_id]})
+        return Response(DailyPlanSerializer(plan, context={'request': request}).data)
+
+
+class DailyPlanBulkView(BulkMutationView):
+    serializer_class = DailyPlanSerializer
+
+    def prepare_instance(self, instance, data, created):
+        if data.get('is_completed') and 'completed_at' not in data:
+            instance.completed_at = timezone.now()
+            return ('completed_at',)
+        return ()
 
 
 # session view
-class StudySessionListCreateView(generics.ListCreateAPIView):
+class StudySessionListCreateView(ArchiveListMixin, ConditionalListMixin, SparseListMixin,
+                                 generics.ListCreateAPIView):
     serializer_class = StudySessionSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        return StudySession.objects.filter(user=self.request.user)
+    def get_queryset(self, model=StudySession):
+        return model.objects.filter(user=self.request.user)
 
 
-class StudySessionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class StudySessionDetailView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = StudySessionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -182,8 +393,12 @@ class StudySessionDetailView(generics.RetrieveUpdateDestroyAPIView):
         return StudySession.objects.filter(user=self.request.user)
 
 
+class StudySessionBulkView(BulkMutationView):
+    serializer_class = StudySessionSerializer
+
+
 # goal views
-class GoalListCreateView(generics.ListCreateAPIView):
+class GoalListCreateView(ConditionalListMixin, SparseListMixin, generics.ListCreateAPIView):
     serializer_class = GoalSerializer
     permission_classes = [IsAuthenticated]
 
@@ -191,7 +406,7 @@ class GoalListCreateView(generics.ListCreateAPIView):
         return Goal.objects.filter(user=self.request.user)
 
 
-class GoalDetailView(generics.RetrieveUpdateDestroyAPIView):
+class GoalDetailView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = GoalSerializer
     permission_classes = [IsAuthenticated]
 
@@ -200,15 +415,15 @@ class GoalDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
-class ReminderListCreateView(generics.ListCreateAPIView):
+class ReminderListCreateView(ArchiveListMixin, ConditionalListMixin, SparseListMixin, generics.ListCreateAPIView):
     serializer_class = ReminderSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        return Reminder.objects.filter(user=self.request.user)
+    def get_queryset(self, model=Reminder):
+        return model.objects.filter(user=self.request.user)
 
 
-class ReminderDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ReminderDetailView(ConditionalDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ReminderSerializer
     permission_classes = [IsAuthenticated]
 
@@ -220,68 +435,44 @@ class ReminderDetailView(generics.RetrieveUpdateDestroyAPIView):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def study_statistics(request):
-    user = request.user
-    
-    
-    last_week = timezone.now().date() - timedelta(days=7)
-    sessions = StudySession.objects.filter(
-        user=user, 
-        session_date__date__gte=last_week
-    )
-    
-    daily_stats = {}
-    for i in range(7):
-        day = last_week + timedelta(days=i)
-        day_sessions = sessions.filter(session_date__date=day)
-        daily_stats[str(day)] = {
-            'sessions': day_sessions.count(),
-            'total_minutes': day_sessions.aggregate(total=Sum('duration_minutes'))['total'] or 0
-        }
-    
-    total_sessions = sessions.count()
-    total_minutes = sessions.aggregate(total=Sum('duration_minutes'))['total'] or 0
-    avg_session_length = total_minutes / total_sessions if total_sessions > 0 else 0
-    
-    return Response({
-        'daily_stats': daily_stats,
-        'total_sessions': total_sessions,
-        'total_minutes': total_minutes,
-        'average_session_length': round(avg_session_length, 2)
-    })
+    today = timezone.now().date()
+    buckets = study_buckets(request.user, today - timedelta(days=7), today, 'day')
+    return Response(last_week_summary(buckets))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def study_statistics_range(request):
+    try:
+        start, end, granularity = parse_range(request.query_params, timezone.now().date())
+    except RangeError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    buckets = study_buckets(request.user, start, end, granularity)
+    return Response(range_summary(start, end, granularity, buckets))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def productivity_summary(request):
-    user = request.user
-    today = date.today()
-    
-    
-    today_plans = DailyPlan.objects.filter(user=user, planned_date=today)
-    completed_today = today_plans.filter(is_completed=True).count()
-    total_today = today_plans.count()
-    completion_rate = (completed_today / total_today * 100) if total_today > 0 else 0
-    
-
-    week_start = today - timedelta(days=today.weekday())
-    week_plans = DailyPlan.objects.filter(
-        user=user, 
-        planned_date__gte=week_start,
-        planned_date__lte=today
-    )
-    completed_week = week_plans.filter(is_completed=True).count()
-    total_week = week_plans.count()
-    week_completion_rate = (completed_week / total_week * 100) if total_week > 0 else 0
-    
-    return Response({
-        'today': {
-            'completed': completed_today,
-            'total': total_today,
-            'completion_rate': round(completion_rate, 2)
-        },
-        'this_week': {
-            'completed': completed_week,
-            'total': total_week,
-            'completion_rate': round(week_completion_rate, 2)
-        }
-    })
+    return Response(productivity(request.user, date.today()))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def productivity_range(request):
+    today = timezone.now().date()
+    try:
+        start, end = parse_dates(request.query_params, today)
+    except RangeError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(productivity_report(request.user, start, end, today))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def calendar(request):
+    try:
+        start, end = parse_calendar_range(request.query_params, timezone.now().date())
+    except RangeError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(build_calendar(request.user, start, end, archived_requested(request)))
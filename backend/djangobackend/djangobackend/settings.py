@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,12 +44,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.sessions.CachedAuthenticationMiddleware',
+    'app.database.ReadOnlyRequestMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,6 +79,12 @@ WSGI_APPLICATION = 'djangobackend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# FOCUSMATE_DB_PROFILE=production keeps connections open between requests,
+# tunes SQLite for concurrent writers and sends reads made by GET requests
+# to a separate 'replica' connection of the same file, leaving 'default' as
+# the writer. Other profiles keep SQLite's defaults.
+DATABASE_PROFILE = os.environ.get('FOCUSMATE_DB_PROFILE', 'development')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -83,6 +92,86 @@ DATABASES = {
     }
 }
 
+# Applied to every new SQLite connection by app.database.configure_sqlite.
+SQLITE_PRAGMAS = {}
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update(
+        CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True,
+        OPTIONS={
+            # Take the write lock when a transaction starts, so a writer
+            # waits in busy_timeout instead of failing with "database is
+            # locked" when it upgrades a read transaction.
+            'transaction_mode': 'IMMEDIATE',
+        },
+    )
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': {},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['app.database.ReadWriteRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# FOCUSMATE_REDIS_URL points the cache at a Redis server shared by every
+# worker (needs the redis package); without it each process has its own.
+REDIS_URL = os.environ.get('FOCUSMATE_REDIS_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'focusmate',
+    }
+}
+
+# FOCUSMATE_SESSION_MODE picks where sessions live: 'db' (a query per
+# request), 'cache' (the cache, written through to the database) or 'cookie'
+# (signed cookies, no storage; sessions can't be ended server-side).
+# 'cache' needs a shared cache: app.checks rejects it on LocMemCache, where
+# a session ended on one worker would stay valid on the others.
+SESSION_MODE = os.environ.get('FOCUSMATE_SESSION_MODE', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+# How long and how many session users app.sessions keeps per process
+AUTH_USER_CACHE_SECONDS = 30
+AUTH_USER_CACHE_SIZE = 10000
+
+# Seconds a per-user dashboard snapshot may be kept. It is rebuilt earlier
+# once the user's latest change log id differs from the one it was built at.
+DASHBOARD_CACHE_TIMEOUT = 300
+
+
+# Reminder dispatch (python manage.py dispatch_reminders)
+REMINDER_BACKEND = 'app.reminders.ConsoleBackend'
+REMINDER_FILE_PATH = BASE_DIR / 'reminders.log'
+REMINDER_BATCH_SIZE = 500
+# How far ahead the dispatcher loads reminders into its heap, and how often
+# it looks for reminders created or edited since its last look.
+REMINDER_HORIZON_SECONDS = 600
+REMINDER_POLL_SECONDS = 5
+
+
+# Loads the user's profile with the user on login and session lookups.
+AUTHENTICATION_BACKENDS = ['app.backends.ProfileModelBackend']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,7 +223,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'app.tokens.BearerTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -143,8 +232,58 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'app.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
+# Largest page a client may ask for with ?page_size=
+MAX_PAGE_SIZE = 200
+
+# Characters kept in the *_preview fields of ?preview=1 list responses
+CONTENT_PREVIEW_LENGTH = 200
+
+# Largest batch accepted by the daily-plans/bulk/ and study-sessions/bulk/ endpoints
+BULK_MAX_ITEMS = 500
+
+# api/sync/: log entries returned per request, and how long entries are kept
+# before compact_changelog drops them (older tokens get a reset)
+SYNC_MAX_CHANGES = 1000
+SYNC_RETENTION_DAYS = 30
+
+# archive_data moves completed daily plans, sent reminders and study sessions
+# to the archive tables once their date is this many days old
+ARCHIVE_AFTER_DAYS = {'daily_plans': 90, 'reminders': 30, 'study_sessions': 2 * 365}
+
+# Rows api/export/ fetches from the database at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# api/import/ and import_data: rows validated and written per transaction,
+# and row errors listed in the report (the rest are only counted)
+IMPORT_CHUNK_SIZE = 2000
+IMPORT_MAX_ERRORS = 100
+
+# Bearer tokens (api/auth/tokens/): lifetime, and how long and how many
+# resolved tokens each process keeps in memory
+AUTH_TOKEN_TTL_DAYS = 30
+AUTH_TOKEN_CACHE_SECONDS = 60
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+# Avatars (api/auth/user/avatar/): largest upload in bytes and in pixels, and
+# the square variants process_avatars makes of each, polling for new uploads
+# every AVATAR_POLL_SECONDS
+AVATAR_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+AVATAR_MAX_PIXELS = 40 * 1000 * 1000
+AVATAR_SIZES = (64, 128, 256)
+AVATAR_FORMATS = ('webp', 'jpeg')
+AVATAR_BATCH_SIZE = 50
+AVATAR_POLL_SECONDS = 5
+
+# Fraction of requests ProfilingMiddleware profiles (Server-Timing header and
+# slow request/query log); 0 turns it off. 0.01 is cheap enough for production.
+PROFILING_SAMPLE_RATE = float(os.environ.get('FOCUSMATE_PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SLOW_REQUEST_MS = 500
+PROFILING_SLOW_QUERY_MS = 100
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -50,6 +50,18 @@ function getCookie(name) {
   return cookieValue;
 }
 
+// List endpoints are cursor-paginated; follow `next` links until the collection is complete
+const getAllPages = async (url) => {
+  const results = [];
+  let next = url;
+  while (next) {
+    const response = await api.get(next);
+    results.push(...response.data.results);
+    next = response.data.next;
+  }
+  return results;
+};
+
 // Authentication services
 export const authService = {
   // Register a new user
@@ -112,8 +124,8 @@ export const dashboardService = {
 export const notesService = {
   getAllNotes: async () => {
     try {
-      const response = await api.get('/notes/');
-      return response.data;
+      // The list only shows titles; ?preview=1 leaves the full content out
+      return await getAllPages('/notes/?preview=1');
     } catch (error) {
       throw error.response?.data || error.message;
     }
@@ -160,8 +172,7 @@ export const dailyPlansService = {
   getDailyPlans: async (date = null) => {
     try {
       const url = date ? `/daily-plans/?date=${date}` : '/daily-plans/';
-      const response = await api.get(url);
-      return response.data;
+      return await getAllPages(url);
     } catch (error) {
       throw error.response?.data || error.message;
     }
@@ -208,8 +219,7 @@ export const dailyPlansService = {
 export const studySessionsService = {
   getAllSessions: async () => {
     try {
-      const response = await api.get('/study-sessions/');
-      return response.data;
+      return await getAllPages('/study-sessions/');
     } catch (error) {
       throw error.response?.data || error.message;
     }
@@ -247,8 +257,7 @@ export const studySessionsService = {
 export const goalsService = {
   getAllGoals: async () => {
     try {
-      const response = await api.get('/goals/');
-      return response.data;
+      return await getAllPages('/goals/');
     } catch (error) {
       throw error.response?.data || error.message;
     }
@@ -303,4 +312,18 @@ export const statisticsService = {
   },
 };
 
+// Sync services
+export const syncService = {
+  // Without a token the response only carries one (with reset: true); pass it
+  // back to receive changed objects and deleted ids since then.
+  getChanges: async (token) => {
+    try {
+      const response = await api.get('/sync/', { params: token ? { since: token } : {} });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error.message;
+    }
+  },
+};
+
 export default api;